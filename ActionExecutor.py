@@ -0,0 +1,151 @@
+# This class runs the command line actions of gestures on a fixed number of worker threads.
+# Each worker starts an action's process and waits for it to exit, so no finished process is
+# left behind as a zombie, and no more than max_workers actions run at once.  Actions still
+# running after timeout seconds are killed.  If coalesce is set, triggering a gesture whose
+# action is still waiting or running does nothing, so a burst of the same gesture runs it once.
+# The time from starting each action to its exit is recorded.  How long actions wait for a
+# worker, and how long their processes take to start, are timed in the metrics.
+
+from Metrics import get_metrics
+from Clock import monotonic
+from collections import deque
+import subprocess
+import threading
+import Queue
+import time
+
+# The executor used by LearnedGesture.call_action.
+default_executor = None
+
+
+# Returns the executor used to run gesture actions, creating it the first time.
+def get_executor():
+    global default_executor
+    if default_executor is None:
+        default_executor = ActionExecutor()
+    return default_executor
+
+
+# Sets the executor used to run gesture actions.
+def set_executor(executor):
+    global default_executor
+    default_executor = executor
+
+
+class ActionExecutor:
+
+    # max_workers:  The most actions that run at once.
+    # timeout:  Seconds an action may run before it is killed.  None for no limit.
+    # coalesce:  Whether to ignore a gesture's action while it is already waiting or running.
+    # max_pending:  The most actions that may wait for a worker.  More are dropped.
+    def __init__(self, max_workers=4, timeout=None, coalesce=True, max_pending=32):
+        self.timeout = timeout
+        self.coalesce = coalesce
+        self.jobs = Queue.Queue(max_pending)
+        self.lock = threading.Lock()
+        self.process_lock = threading.Lock()  # Keeps a timed out action from being killed as it is reaped.
+        self.active = set()  # Names of gestures whose actions are waiting or running.
+        self.latencies = deque(maxlen=100)  # Seconds from start to exit of recent actions.
+        self.num_timeouts = 0
+
+        self.workers = []
+        for i in range(0, max_workers):
+            worker = threading.Thread(target=self.work)
+            worker.daemon = True  # Don't keep the program open for long running actions.
+            worker.start()
+            self.workers.append(worker)
+
+    # Runs a gesture's action on a worker.
+    # Returns:  True if the action will be run, False if it was coalesced or dropped.
+    def submit(self, name, action):
+        with self.lock:
+            if self.coalesce and name in self.active:
+                return False
+
+            try:
+                self.jobs.put_nowait((name, action, monotonic()))
+            except Queue.Full:
+                print "Too many actions waiting.  Skipping the action for " + name + "."
+                get_metrics().count('actions_dropped')
+                return False
+
+            self.active.add(name)
+            return True
+
+    # Worker loop:  Runs actions until told to stop.
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+
+            name, action, submitted = job
+            get_metrics().record('action_wait', monotonic() - submitted)
+            try:
+                self.run(name, action)
+            finally:
+                with self.lock:
+                    self.active.discard(name)
+
+    # Runs an action, waits for it to exit (or kills it when it times out), and records how long it took.
+    def run(self, name, action):
+        start = time.time()
+        try:
+            with get_metrics().time('action_start'):
+                process = subprocess.Popen(action)
+        except OSError as e:
+            print "Could not run the action for " + name + ": " + str(e)
+            return
+
+        timer = None
+        if self.timeout is not None:
+            timer = threading.Timer(self.timeout, self.kill, [process])
+            timer.daemon = True
+            timer.start()
+
+        process.wait()  # Reaps the process.
+
+        if timer is not None:
+            with self.process_lock:
+                timer.cancel()
+        self.latencies.append(time.time() - start)
+
+    # Kills an action that has run for too long.  An action that has already been reaped is left
+    # alone, since its process ID may have been reused.  (wait sets returncode as it reaps.)
+    def kill(self, process):
+        with self.process_lock:
+            if process.returncode is not None:
+                return
+            try:
+                process.kill()
+                self.num_timeouts += 1
+            except OSError:
+                pass  # The process already exited.
+
+    # Returns the number of actions waiting or running.
+    def get_num_active(self):
+        with self.lock:
+            return len(self.active)
+
+    # Returns the seconds from start to exit of recent actions, oldest first.
+    def get_latencies(self):
+        return list(self.latencies)
+
+    # Prints the start-to-exit times of recent actions.
+    def print_latencies(self):
+        latencies = sorted(self.get_latencies())
+        print "Actions run:".ljust(30) + str(len(latencies))
+        if latencies:
+            print "Median action time (s):".ljust(30) + "%.3f" % latencies[len(latencies) // 2]
+            print "Longest action time (s):".ljust(30) + "%.3f" % latencies[-1]
+        print "Actions timed out:".ljust(30) + str(self.num_timeouts)
+
+    # Stops the workers once the actions already submitted have been run.
+    # wait:  Whether to wait for those actions to finish.
+    def shutdown(self, wait=False):
+        for worker in self.workers:
+            self.jobs.put(None)
+
+        if wait:
+            for worker in self.workers:
+                worker.join()
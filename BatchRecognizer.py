@@ -0,0 +1,231 @@
+# This class recognizes many performed gestures at once, e.g. every gesture in weeks of recorded
+# sessions after the learned gestures change.  Performed gestures are taken in blocks, and each
+# block is compared against every learned gesture together, in a few matrix products, rather
+# than one gesture at a time.  For each performed gesture, the best few learned gestures are
+# returned, best first, with their scores.
+#
+# Methods:
+#   'resampled':  Squared distance once both gestures are resampled to the same length (lower is better).
+#   'variance':   Total variance over the frames both gestures share (lower is better).
+#   'closest':    Weighted count of closest readings, as greatest_closest_recognition (higher is better).
+#                 The closest gesture at each frame depends on every gesture, so this is worked out for
+#                 one performed gesture at a time, against every learned gesture at once.
+#
+# Performed gestures are read from a log of JSON records, one per line:  either one performed
+# gesture per line, {"frames": [[roll, pitch, x, y, z], ...]}, optionally with a "label", or the
+# records of a trace (see SimulatedDriver), in which each B press is a performed gesture.
+#
+# Usage:  python BatchRecognizer.py <gestures file> <log file> [--method resampled] [--matches 5]
+#                                   [--block-size 256] [--processes N] [--output matches.jsonl]
+
+from PerformedGesture import PerformedGesture
+from TemplateTensor import NUM_CHANNELS
+from SimulatedDriver import SimulatedRemote, apply_record
+from WiimoteDriver import BUTTONS
+from SamplingThread import Sample
+from RemoteSession import RemoteSession
+from FrameReader import FrameReader
+from itertools import islice
+import multiprocessing
+import getopt
+import json
+import sys
+import numpy as np
+
+METHODS = ('resampled', 'variance', 'closest')
+
+
+class BatchRecognizer:
+
+    # matcher:  The GestureMatcher whose learned gestures are matched against.
+    # method:  How gestures are compared (see METHODS).
+    # num_matches:  How many of the best learned gestures to return for each performed gesture.
+    # block_size:  How many performed gestures are compared at once.
+    def __init__(self, matcher, method='resampled', num_matches=5, block_size=256):
+        if method not in METHODS:
+            raise ValueError("BatchRecognizer: No method named " + str(method) + ".")
+
+        self.matcher = matcher
+        self.method = method
+        self.num_matches = num_matches
+        self.block_size = block_size
+
+    # Recognizes performed gestures, a block at a time, so gestures can be read from a log as they are recognized.
+    # performed_gestures:  Any iterable of PerformedGestures.
+    # Returns:  An iterator over the matches of each performed gesture, in order:  a list of (learned gesture,
+    # score) pairs, best first.  Empty if there are no learned gestures.
+    def recognize(self, performed_gestures):
+        performed_gestures = iter(performed_gestures)
+        while True:
+            block = list(islice(performed_gestures, self.block_size))
+            if len(block) == 0:
+                return
+            for matches in self.recognize_block(block):
+                yield matches
+
+    # Recognizes a block of performed gestures together.
+    # Returns:  A list of the matches of each performed gesture (see recognize).
+    def recognize_block(self, block):
+        # Take the learned gestures as they are now, in case they change part way through.
+        template_tensor = self.matcher.template_tensor
+        if template_tensor.get_size() == 0:
+            return [[] for performed_gesture in block]
+
+        lengths = np.array([g.get_length() for g in block], dtype=np.int64)
+        if self.method == 'resampled':
+            resampled = np.array([g.get_resampled()[:, :NUM_CHANNELS] for g in block])
+            scores = template_tensor.batch_resampled_distances(resampled)
+            return self.rank(template_tensor, scores, False)
+
+        if self.method == 'variance':
+            frames = np.zeros((len(block), max(lengths.max(), 1), NUM_CHANNELS))
+            for row, g in enumerate(block):
+                frames[row, :lengths[row]] = g.get_frames()[:, :NUM_CHANNELS]
+            scores = template_tensor.batch_total_variances(frames, lengths)
+            return self.rank(template_tensor, scores, False)
+
+        scores = np.zeros((len(block), template_tensor.get_size()))
+        for row, g in enumerate(block):
+            counts = template_tensor.closest_counts(g.get_frames())
+            scores[row] = (counts * template_tensor.weights).sum(axis=1) - \
+                np.maximum(template_tensor.lengths - lengths[row], 0)
+        return self.rank(template_tensor, scores, True)
+
+    # Returns the best num_matches learned gestures for each row of a (performed x learned) array of scores.
+    # higher_is_better:  Whether the highest score, rather than the lowest, is the best match.
+    def rank(self, template_tensor, scores, higher_is_better):
+        keys = -scores if higher_is_better else scores
+        num_matches = min(self.num_matches, template_tensor.get_size())
+        if num_matches < template_tensor.get_size():
+            best = np.argpartition(keys, num_matches - 1, axis=1)[:, :num_matches]
+        else:
+            best = np.tile(np.arange(template_tensor.get_size()), (len(keys), 1))
+
+        ranked = []
+        for row in range(0, len(keys)):
+            # Sort the best few, with ties going to the earliest gesture, as the other recognitions do.
+            order = best[row][np.lexsort((best[row], keys[row, best[row]]))]
+            ranked.append([(template_tensor.get_gesture(col), float(scores[row, col])) for col in order])
+        return ranked
+
+
+# Returns the performed gestures in a log file (see the top of this file), as (label, PerformedGesture)
+# pairs.  The label is the one recorded with the gesture, or for a trace, the remote that performed it.
+def read_gesture_log(log_file):
+    gestures = []
+    trace_records = []
+    with open(log_file) as log:
+        for line in log:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'frames' in record:
+                gestures.append((record.get('label'), PerformedGesture(record['frames'], record.get('timestamps'))))
+            else:
+                trace_records.append(record)
+
+    return gestures + trace_gestures(trace_records)
+
+
+# Returns the gestures performed in the records of a trace:  the frames while B was held, as when
+# remotes perform gestures in multi-remote mode.
+# Returns:  (label, PerformedGesture) pairs, labelled 'remote 1', 'remote 2', and so on.
+def trace_gestures(records, frame_freq=1):
+    remotes = {}
+    gestures = []
+    for record in sorted(records, key=lambda r: r['time']):
+        remote_index = record.get('remote', 0)
+        if remote_index not in remotes:
+            remote = SimulatedRemote()
+            remotes[remote_index] = (remote, FrameReader(remote), RemoteSession(remote_index, frame_freq, BUTTONS))
+        remote, reader, session = remotes[remote_index]
+
+        apply_record(remote, record)
+        sample = Sample(remote_index, record['time'], remote.btns, remote.btns_held, remote.btns_released,
+                        reader.read())
+        performed_gesture = session.update(sample)
+        if performed_gesture is not None and performed_gesture.get_length() > 0:
+            gestures.append(('remote ' + str(remote_index + 1), performed_gesture))
+    return gestures
+
+
+# The matcher of each worker process, over the gestures file being matched against.
+worker_recognizer = None
+
+
+# Returns a BatchRecognizer over the learned gestures in a gestures file.
+def open_recognizer(gestures_file, method, num_matches, block_size):
+    from GestureStore import open_gesture_store
+    from GestureMatcher import GestureMatcher
+    return BatchRecognizer(GestureMatcher(open_gesture_store(gestures_file)), method, num_matches, block_size)
+
+
+# Worker process initializer:  Loads the learned gestures.
+def load_recognizer(gestures_file, method, num_matches, block_size):
+    global worker_recognizer
+    worker_recognizer = open_recognizer(gestures_file, method, num_matches, block_size)
+
+
+# Recognizes a block of frames in a worker process.
+# Returns:  The matches of each, as lists of (name, score) pairs, best first.
+def recognize_frames(block):
+    matches = worker_recognizer.recognize_block([PerformedGesture(frames) for frames in block])
+    return [[(g.get_name(), score) for g, score in ranked] for ranked in matches]
+
+
+# Recognizes every gesture in a log, and writes the matches of each as a JSON record per line.
+# processes:  Worker processes to shard the blocks of gestures over.  None to recognize them in this process.
+def recognize_log(gestures_file, log_file, output, method='resampled', num_matches=5, block_size=256, processes=None):
+    logged = read_gesture_log(log_file)
+    labels = [label for label, performed_gesture in logged]
+
+    if processes is None:
+        recognizer = open_recognizer(gestures_file, method, num_matches, block_size)
+        matches = [[(g.get_name(), score) for g, score in ranked]
+                   for ranked in recognizer.recognize(performed_gesture for label, performed_gesture in logged)]
+    else:
+        blocks = [[performed_gesture.get_frames() for label, performed_gesture in logged[start:start + block_size]]
+                  for start in range(0, len(logged), block_size)]
+        pool = multiprocessing.Pool(processes, load_recognizer, (gestures_file, method, num_matches, block_size))
+        try:
+            matches = [ranked for block_matches in pool.imap(recognize_frames, blocks) for ranked in block_matches]
+        finally:
+            pool.terminate()
+
+    for index, ranked in enumerate(matches):
+        record = {'index': index, 'label': labels[index], 'method': method,
+                  'matches': [{'name': name, 'score': score} for name, score in ranked]}
+        output.write(json.dumps(record) + '\n')
+    return len(matches)
+
+
+def main(argv):
+    try:
+        options, arguments = getopt.gnu_getopt(argv, '', ['method=', 'matches=', 'block-size=', 'processes=',
+                                                          'output='])
+    except getopt.GetoptError as e:
+        print "Error:  " + str(e)
+        return 1
+    options = dict(options)
+    if len(arguments) != 2 or options.get('--method', 'resampled') not in METHODS:
+        print "Usage: python BatchRecognizer.py <gestures file> <log file> [--method " + '|'.join(METHODS) + "] " \
+              "[--matches 5] [--block-size 256] [--processes N] [--output matches.jsonl]"
+        return 1
+
+    processes = int(options['--processes']) if '--processes' in options else None
+    output = open(options['--output'], 'w') if '--output' in options else sys.stdout
+    try:
+        num_gestures = recognize_log(arguments[0], arguments[1], output, options.get('--method', 'resampled'),
+                                     int(options.get('--matches', 5)), int(options.get('--block-size', 256)),
+                                     processes)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if output is not sys.stdout:
+        print "Recognized " + str(num_gestures) + " gesture(s) into " + options['--output'] + "."
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,135 @@
+# These functions read and write gestures files in a binary format, which can be loaded without
+# parsing any of the sensor readings it holds.  GestureRepository keeps .bin gestures files in this
+# format, as the snapshot its journal of changes is replayed over.
+#
+# The file starts with a header: a magic string, the length of the index, and the index itself
+# (JSON), which lists each gesture's name, action, statistics and channel weights, with the offsets of its frames
+# and iterations among the readings.  The readings follow the header as 32-bit floats, one column per
+# sensor reading (all rolls of a gesture, then all pitches, and so on).  Reading the file maps it
+# into memory, and each gesture's frames are views of the mapped file.
+#
+# A file is written to a temporary file, which is then renamed over the original, so it is never
+# left half written.
+#
+# Run as a script to convert a text gestures file:  python BinaryGestureStore.py gestures.txt gestures.bin
+
+from LearnedGesture import LearnedGesture
+from WriterReader import GestureWriterReader
+import numpy as np
+import struct
+import json
+import mmap
+import sys
+import os
+
+MAGIC = 'WIIBLUE\x01'
+INDEX_LENGTH = struct.Struct('<I')
+READING_TYPE = np.dtype('<f4')
+NUM_READINGS = 5  # Roll, pitch, X, Y, and Z.
+
+
+# Returns the gestures stored in the binary gestures file at path.
+# Frames and iterations are read-only views of the memory-mapped file.
+def read_gesture_store(path):
+    f = open(path, 'rb')
+    try:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise IOError(path + " is not a binary gestures file.")
+
+    return decode_gestures(data)
+
+
+# Returns the gestures encoded in data (a string or memory map in the binary format).
+# Frames and iterations are read-only views of data.
+def decode_gestures(data):
+    index_start = len(MAGIC) + INDEX_LENGTH.size
+    index_length = INDEX_LENGTH.unpack_from(data, len(MAGIC))[0]
+    index = json.loads(data[index_start:index_start + index_length])
+    start = data_start(index_start + index_length)
+
+    known_gestures = []
+    for entry in index:
+        frames = read_frames(data, start, entry['frames'])
+        iterations = [read_frames(data, start, location) for location in entry['iterations']]
+        action = [arg.encode('utf-8') for arg in entry['action']]
+
+        # Append a gesture with name, frames, action, attempts, successes, iterations, and channel weights.
+        known_gestures.append(LearnedGesture(entry['name'].encode('utf-8'), frames, action,
+                                             entry['attempts'], entry['successes'], iterations, entry.get('weights')))
+
+    return known_gestures
+
+
+# Returns a (frames x readings) view of the frames stored at location = [offset, length]
+# in data, where offset is from the start of the readings.
+def read_frames(data, start, location):
+    offset, length = location
+    if length == 0:
+        return np.zeros((0, NUM_READINGS), dtype=READING_TYPE)
+    columns = np.frombuffer(data, dtype=READING_TYPE, count=length * NUM_READINGS, offset=start + offset)
+    return columns.reshape(NUM_READINGS, length).T
+
+
+# Returns where the readings start, given the length of the header.
+# Readings are aligned to the size of a reading.
+def data_start(header_length):
+    return header_length + (-header_length % READING_TYPE.itemsize)
+
+
+# Returns the gestures encoded in the binary format, as a string.
+def encode_gestures(gestures):
+    index = []
+    blocks = []
+    offset = 0
+
+    # Lay out the readings of every gesture, recording where each set of frames will be.
+    for g in gestures:
+        locations = []
+        for frames in [g.get_frames()] + list(g.get_iterations()):
+            columns = np.ascontiguousarray(np.asarray(frames, dtype=READING_TYPE).reshape(-1, NUM_READINGS).T)
+            locations.append([offset, columns.shape[1]])
+            blocks.append(columns.tostring())
+            offset += columns.nbytes
+
+        index.append({'name': g.get_name(), 'action': list(g.get_action()), 'attempts': g.get_attempts(),
+                      'successes': g.get_successes(), 'weights': [float(w) for w in g.get_weights()],
+                      'frames': locations[0], 'iterations': locations[1:]})
+
+    index_str = json.dumps(index)
+    header_length = len(MAGIC) + INDEX_LENGTH.size + len(index_str)
+    padding = '\0' * (data_start(header_length) - header_length)
+
+    return ''.join([MAGIC, INDEX_LENGTH.pack(len(index_str)), index_str, padding] + blocks)
+
+
+# Writes gestures to the binary gestures file at path, replacing its contents.
+def write_gesture_store(path, gestures):
+    temp_path = path + '.tmp'
+    f = open(temp_path, 'wb')
+    f.write(encode_gestures(gestures))
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+    os.rename(temp_path, path)
+
+
+# Converts a text gestures file into a binary gestures file.
+# Returns:  The number of gestures converted.
+def migrate_text_gestures(text_file, binary_file):
+    known_gestures = GestureWriterReader(text_file).get_learned_gestures()
+    write_gesture_store(binary_file, known_gestures)
+    return len(known_gestures)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print "Usage: python BinaryGestureStore.py <text gestures file> <binary gestures file>"
+        sys.exit(1)
+
+    num_gestures = migrate_text_gestures(sys.argv[1], sys.argv[2])
+    print "Converted " + str(num_gestures) + " gesture(s) from " + sys.argv[1] + " to " + sys.argv[2] + "."
@@ -1,29 +1,60 @@
-import wiiuse
+from WiimoteDriver import get_driver
+from Clock import monotonic
 
 
 class ButtonHandler:
 
-    def __init__(self, wiimotes, first_wm, num_motes):
+    # sampler:  The SamplingThread polling the remotes, which next_press waits on.
+    def __init__(self, wiimotes, first_wm, num_motes, sampler=None):
         self.wiimotes = wiimotes
         self.first_wm = first_wm
         self.num_motes = num_motes
-
-    def press_event(self):
-        remote = self.first_wm[0]
-        for btn_name, btn in wiiuse.button.items():
-            if wiiuse.is_just_pressed(remote, btn):
+        self.sampler = sampler
+
+    # Waits for a button to be pressed on the given remote.
+    # remote_index:  Which remote to read, or None for any remote.
+    # timeout:  Seconds to wait.  None to wait until a button is pressed.
+    # Returns:  The sample the button was pressed in, or None if the time ran out or a replayed trace has ended.
+    # Presses sampled before the call, e.g. while a prompt was being answered, are ignored, unless the
+    # driver keeps them (see WiimoteDriver.drops_stale_presses).
+    def next_press(self, remote_index=0, timeout=None):
+        start = monotonic()
+        deadline = None if timeout is None else start + timeout
+        drop_stale = get_driver().drops_stale_presses()
+        while True:
+            remaining = None if deadline is None else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+
+            sample = self.sampler.get(remaining)
+            if sample is None:
+                return None
+            if drop_stale and sample.get_timestamp() < start:
+                continue
+            if remote_index is not None and sample.get_remote_index() != remote_index:
+                continue
+            if sample.get_pressed_button() is not None:
+                return sample
+
+    # remote_index:  Which remote to read (0 for the first remote).
+    def press_event(self, remote_index=0):
+        remote = self.wiimotes[remote_index][0]
+        driver = get_driver()
+        for btn_name, btn in driver.button.items():
+            if driver.is_just_pressed(remote, btn):
                 return btn
 
-    def release_event(self):
-        remote = self.first_wm[0]
+    def release_event(self, remote_index=0):
+        remote = self.wiimotes[remote_index][0]
+        driver = get_driver()
 
-        for btn_name, btn in wiiuse.button.items():
-            if wiiuse.is_released(remote, btn):
+        for btn_name, btn in driver.button.items():
+            if driver.is_released(remote, btn):
                 return btn_name
 
-    def motion_event(self):
-        remote = self.first_wm[0]
+    def motion_event(self, remote_index=0):
+        remote = self.wiimotes[remote_index][0]
 
-        if wiiuse.using_acc(remote):
-            print self.press_event()
+        if get_driver().using_acc(remote):
+            print self.press_event(remote_index)
             return (remote.orient.roll, remote.orient.pitch, remote.orient.yaw)
@@ -0,0 +1,56 @@
+# This class captures frames of sensor readings into a preallocated ring buffer, along with the
+# time each frame was read.  Frames are appended as they arrive from the sampling thread.
+#
+# Every frame is written twice, capacity rows apart, so the frames captured since reset are always
+# one contiguous slice of the buffer, and can be handed out as a view without copying.  A capture
+# longer than capacity keeps only its latest capacity frames.  Views are overwritten by later
+# captures:  copy them before keeping them.
+
+import numpy as np
+from TemplateTensor import NUM_CHANNELS
+
+
+class CaptureBuffer:
+
+    # capacity:  The most frames a capture can hold.
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+
+        self.frames = np.zeros((2 * capacity, NUM_CHANNELS), dtype=np.float32)
+        self.timestamps = np.zeros(2 * capacity)  # Seconds on the monotonic clock when each frame was read.
+        self.head = 0  # The row the next frame is written to.
+        self.length = 0  # Frames captured since the last reset.
+
+    # Starts a new capture.
+    def reset(self):
+        self.length = 0
+
+    # Copies a frame into the buffer as the next frame.
+    # timestamp:  When the frame was read.
+    # Returns:  A view of the frame in the buffer.
+    def append(self, frame, timestamp=0.0):
+        self.frames[self.head] = frame
+        return self.store(self.frames[self.head], timestamp)
+
+    # Mirrors the frame just written at the head, and moves the head on.
+    def store(self, frame, timestamp):
+        self.frames[self.head + self.capacity] = frame
+        self.timestamps[self.head] = timestamp
+        self.timestamps[self.head + self.capacity] = timestamp
+        self.head = (self.head + 1) % self.capacity
+        self.length += 1
+        return frame
+
+    # Returns the number of frames in the current capture (at most capacity).
+    def get_length(self):
+        return min(self.length, self.capacity)
+
+    # Returns a (frames x channels) view of the frames captured since the last reset, oldest first.
+    def get_frames(self):
+        end = self.head + self.capacity
+        return self.frames[end - self.get_length():end]
+
+    # Returns a view of the times the frames captured since the last reset were read, oldest first.
+    def get_timestamps(self):
+        end = self.head + self.capacity
+        return self.timestamps[end - self.get_length():end]
@@ -0,0 +1,34 @@
+# Functions for weighting sensor readings by how much they change within a gesture.
+# Readings that change a lot define the gesture; readings that barely change may only be
+# moving by accident.  (E.g., X-accelerometer in an up-down gesture.)
+
+import numpy as np
+
+NUM_CHANNELS = 5  # Roll, pitch, X, Y and Z readings in every frame.
+LENGTH_WEIGHT = 0.2
+
+
+# Returns the total variation of each of roll, pitch, X, Y, and Z within a gesture's frames:
+# the sum of the squared changes between consecutive frames.  All five in a single pass.
+def self_variances(frames):
+    frames = np.asarray(frames, dtype=np.float64).reshape(-1, NUM_CHANNELS)
+    if len(frames) < 2:
+        return np.zeros(NUM_CHANNELS)
+    return (np.diff(frames, axis=0) ** 2).sum(axis=0)
+
+
+# Returns the weights for the given total variations of roll, pitch, X, Y, and Z within a gesture.
+# Roll and pitch are normalized relative to each other, as are X, Y and Z.  A group that doesn't
+# change at all is weighted evenly.
+# Returns:  An array of weights for roll, pitch, X, Y, and Z.
+def channel_weights(variances):
+    variances = np.asarray(variances, dtype=np.float64)[:NUM_CHANNELS]
+    weights = np.empty(NUM_CHANNELS)
+    for group in (slice(0, 2), slice(2, 5)):
+        total = variances[group].sum()
+        if total > 0:
+            weights[group] = variances[group] / total
+        else:
+            weights[group] = 1.0 / len(variances[group])
+
+    return weights
@@ -0,0 +1,48 @@
+# The monotonic clock that samples and timings are measured with.  Unlike the system time, it never
+# jumps when the system time is changed, so differences between its readings are always true.
+
+import ctypes.util
+import ctypes
+import time
+import sys
+import os
+
+
+# Returns seconds on a monotonic clock, which never jumps when the system time is changed.
+# Falls back to the system time where there is no monotonic clock to be had.
+def monotonic():
+    return clock()
+
+
+class timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+# Returns a function that reads CLOCK_MONOTONIC through clock_gettime, or time.time if it can't be
+# loaded or read.  The clock is chosen once, so every reading in a run is on the same clock.
+def monotonic_clock():
+    CLOCK_MONOTONIC = 1  # As defined on Linux.
+    if not sys.platform.startswith('linux'):
+        return time.time
+
+    try:
+        library = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = library.clock_gettime
+    except (OSError, AttributeError):
+        return time.time
+
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+    if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(timespec())) != 0:
+        return time.time
+
+    def read_clock():
+        t = timespec()
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, "clock_gettime: " + os.strerror(errno))
+        return t.tv_sec + t.tv_nsec * 1e-9
+
+    return read_clock
+
+
+clock = monotonic_clock()
@@ -0,0 +1,192 @@
+# This class matches a performed gesture to the learned gestures using Dynamic Time Warping (DTW),
+# so that a gesture performed faster or slower than it was taught still lines up with its template.
+#
+# Frame i of the performed gesture may only be matched to frames of a learned gesture within
+# `band` frames of the point i falls on proportionally (a Sakoe-Chiba band around the diagonal).
+# Most learned gestures are rejected by cheap lower bounds (LB_Kim, then LB_Keogh envelopes
+# precomputed for each learned gesture) before the full DTW is run, and the full DTW is
+# abandoned as soon as it can no longer beat the best match so far.
+
+import numpy as np
+from TemplateTensor import NUM_CHANNELS
+
+
+class DTWMatcher:
+
+    def __init__(self, gestures, band):
+        self.band = max(int(band), 0)  # Radius of the Sakoe-Chiba band, in frames.
+        self.gestures = []
+        self.frames = []  # Frames of each gesture, as (frames x channels) arrays.
+        self.upper = []   # Upper LB_Keogh envelope of each gesture.
+        self.lower = []   # Lower LB_Keogh envelope of each gesture.
+
+        for g in gestures:
+            self.add_gesture(g)
+        self.update_bounds()
+
+    # Adds a gesture, with its envelopes, to the end of the gestures.
+    def add_gesture(self, gesture):
+        if gesture.get_length() == 0:
+            return
+        frames = np.asarray(gesture.get_frames(), dtype=np.float64)[:, :NUM_CHANNELS]
+        upper, lower = self.envelope(frames, self.band)
+        self.gestures.append(gesture)
+        self.frames.append(frames)
+        self.upper.append(upper)
+        self.lower.append(lower)
+
+    # Gathers the lengths, first frames, and last frames of all gestures for LB_Kim.
+    def update_bounds(self):
+        self.lengths = np.array([len(frames) for frames in self.frames], dtype=np.int64)
+        self.first_frames = np.array([frames[0] for frames in self.frames]).reshape(-1, NUM_CHANNELS)
+        self.last_frames = np.array([frames[-1] for frames in self.frames]).reshape(-1, NUM_CHANNELS)
+
+    # Returns a matcher with the given gesture in place of the gesture of the same name, or
+    # added at the end if there is none.  Only that gesture's envelopes are computed again.
+    # This matcher is left as it is.
+    def with_gesture(self, gesture):
+        matcher = self.without_gesture(gesture.get_name(), False)
+        matcher.add_gesture(gesture)
+        matcher.update_bounds()
+        return matcher
+
+    # Returns a matcher without the gesture by the given name.  This matcher is left as it is.
+    def without_gesture(self, g_name, update_bounds=True):
+        matcher = DTWMatcher([], self.band)
+        for g, frames, upper, lower in zip(self.gestures, self.frames, self.upper, self.lower):
+            if g.get_name() != g_name:
+                matcher.gestures.append(g)
+                matcher.frames.append(frames)
+                matcher.upper.append(upper)
+                matcher.lower.append(lower)
+
+        if update_bounds:
+            matcher.update_bounds()
+        return matcher
+
+    # Returns the learned gesture with the smallest DTW distance from the performed frames,
+    # or None if no learned gesture can be aligned with them inside the band.
+    def recognize(self, performed_frames):
+        query = np.asarray(performed_frames, dtype=np.float64).reshape(-1, NUM_CHANNELS)
+        if len(query) == 0 or len(self.gestures) == 0:
+            return None
+
+        # Distances are divided by the combined length of both gestures, so that
+        # long gestures are not penalized simply for having more frames.
+        norms = len(query) + self.lengths
+        lb_kim = self.lb_kim(query) / norms
+
+        best_distance = float('inf')
+        best_gesture = None
+
+        # Visit gestures from the most to the least promising, so the best match so far
+        # tightens quickly and prunes as much as possible.
+        for index in np.argsort(lb_kim, kind='mergesort'):
+            if lb_kim[index] >= best_distance:
+                break  # No remaining gesture can beat the best match.
+
+            if self.lb_keogh(query, index) / norms[index] >= best_distance:
+                continue
+
+            distance = self.distance(query, self.frames[index], best_distance * norms[index]) / norms[index]
+            if distance < best_distance:
+                best_distance = distance
+                best_gesture = self.gestures[index]
+
+        return best_gesture
+
+    # LB_Kim lower bound for every gesture: every warping path pairs the first frames
+    # together, and the last frames together.
+    def lb_kim(self, query):
+        first = ((self.first_frames - query[0]) ** 2).sum(axis=1)
+        last = ((self.last_frames - query[-1]) ** 2).sum(axis=1)
+
+        # A one-frame gesture against a one-frame gesture is a single pairing.
+        single = (self.lengths == 1) & (len(query) == 1)
+        return np.where(single, first, first + last)
+
+    # LB_Keogh lower bound for the gesture at index: every performed frame is paired with
+    # at least one frame inside its band, so it is at least as far as the band's envelope.
+    def lb_keogh(self, query, index):
+        centres = self.band_centres(len(query), self.lengths[index])
+        upper = self.upper[index][centres]
+        lower = self.lower[index][centres]
+        excess = np.maximum(query - upper, 0) + np.maximum(lower - query, 0)
+        return (excess ** 2).sum()
+
+    # Returns the DTW distance between the query and template frames, or infinity
+    # as soon as every partial alignment is already worse than threshold.
+    def distance(self, query, template, threshold=float('inf')):
+        n = len(query)
+        m = len(template)
+        centres = self.band_centres(n, m)
+        lows = np.maximum(centres - self.band, 0)
+        highs = np.minimum(centres + self.band, m - 1)
+
+        # The band must leave a connected path from the first frames to the last.
+        if highs[-1] != m - 1 or np.any(lows[1:] > highs[:-1] + 1):
+            return float('inf')
+
+        previous = None
+        previous_low = 0
+        for i in range(0, n):
+            low = lows[i]
+            high = highs[i]
+            costs = ((template[low:high + 1] - query[i]) ** 2).sum(axis=1)
+
+            if previous is None:
+                # The first frames are always paired together.
+                reachable = np.full(len(costs), np.inf)
+                reachable[0] = 0.0
+            else:
+                # Best of the diagonal (i-1, j-1) and vertical (i-1, j) predecessors.
+                window = self.row_values(previous, previous_low, low - 1, high + 1)
+                reachable = np.minimum(window[:-1], window[1:])
+
+            # Horizontal steps (i, j-1) form a running minimum along the row:
+            # row[j] = costs[j] + min(reachable[j], row[j-1])
+            sums = np.cumsum(costs)
+            row = sums + np.minimum.accumulate(reachable - (sums - costs))
+
+            # Early abandoning: the path only gets more expensive from here.
+            if row.min() > threshold:
+                return float('inf')
+
+            previous = row
+            previous_low = low
+
+        return previous[-1]
+
+    # Returns the frame of a template of length m that frame i of a query of
+    # length n falls on proportionally, for every i.
+    @staticmethod
+    def band_centres(n, m):
+        if n == 1:
+            return np.zeros(1, dtype=np.int64)
+        return np.rint(np.arange(n) * (m - 1) / float(n - 1)).astype(np.int64)
+
+    # Returns the upper and lower envelopes of the frames: the max and min
+    # of each reading within radius frames of every frame.
+    @staticmethod
+    def envelope(frames, radius):
+        upper = frames.copy()
+        lower = frames.copy()
+        for offset in range(1, min(radius, len(frames) - 1) + 1):
+            upper[:-offset] = np.maximum(upper[:-offset], frames[offset:])
+            upper[offset:] = np.maximum(upper[offset:], frames[:-offset])
+            lower[:-offset] = np.minimum(lower[:-offset], frames[offset:])
+            lower[offset:] = np.minimum(lower[offset:], frames[:-offset])
+
+        return upper, lower
+
+    # Returns the values of a DP row (starting at frame row_low) for the frames start to stop - 1.
+    # Frames outside the row are unreachable.
+    @staticmethod
+    def row_values(row, row_low, start, stop):
+        values = np.full(stop - start, np.inf)
+        first = max(start, row_low)
+        last = min(stop, row_low + len(row))
+        if first < last:
+            values[first - start:last - start] = row[first - row_low:last - row_low]
+
+        return values
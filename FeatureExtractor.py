@@ -0,0 +1,48 @@
+# This class turns a gesture into a fixed-length feature vector, so that gestures can be looked
+# up by how close their vectors are, in a spatial index, rather than compared one by one.
+#
+# For each sensor reading, the vector holds its mean, its variance, its motion energy (the mean
+# squared change between frames), and the magnitudes of the lowest few Fourier coefficients of
+# the gesture resampled to a common length.  The last feature is the gesture's duration.
+# Readings are divided by their sensor ranges first, so that no sensor outweighs the others.
+
+import numpy as np
+from TemplateTensor import NUM_CHANNELS
+
+
+class FeatureExtractor:
+
+    # channel_ranges:  The largest magnitude of each of roll, pitch, X, Y, and Z.
+    # num_coefficients:  How many Fourier coefficients (after the constant one) to keep per reading.
+    # duration_scale:  The number of frames that counts as much as a full sensor range.
+    def __init__(self, channel_ranges, num_coefficients=3, duration_scale=100.0):
+        self.channel_ranges = np.asarray(channel_ranges, dtype=np.float64)
+        self.num_coefficients = num_coefficients
+        self.duration_scale = duration_scale
+
+    # Returns the number of features in every vector.
+    def get_num_features(self):
+        return NUM_CHANNELS * (3 + self.num_coefficients) + 1
+
+    # Returns the feature vector of a gesture (a LearnedGesture or PerformedGesture).
+    def extract(self, gesture):
+        frames = np.asarray(gesture.get_frames(), dtype=np.float64)[:, :NUM_CHANNELS] / self.channel_ranges
+        resampled = np.asarray(gesture.get_resampled(), dtype=np.float64)[:, :NUM_CHANNELS] / self.channel_ranges
+
+        if len(frames) > 0:
+            means = frames.mean(axis=0)
+            variances = frames.var(axis=0)
+        else:
+            means = variances = np.zeros(NUM_CHANNELS)
+
+        if len(frames) > 1:
+            energies = (np.diff(frames, axis=0) ** 2).mean(axis=0)
+        else:
+            energies = np.zeros(NUM_CHANNELS)
+
+        spectrum = np.abs(np.fft.rfft(resampled, axis=0)) / len(resampled)
+        coefficients = spectrum[1:self.num_coefficients + 1].T.ravel()
+
+        duration = [len(frames) / self.duration_scale]
+
+        return np.concatenate([means, variances, energies, coefficients, duration])
@@ -0,0 +1,65 @@
+# This class reads frames of sensor readings out of a remote's wiiuse struct.  The remote's
+# orientation and gforce structs are mapped as NumPy arrays once, when the reader is created,
+# so reading a frame is two bulk copies instead of five ctypes attribute lookups and a new tuple.
+
+import ctypes
+import numpy as np
+from TemplateTensor import NUM_CHANNELS
+
+
+class FrameReader:
+
+    # remote:  The remote's wiimote struct, e.g. wiimotes[0][0].
+    def __init__(self, remote):
+        self.remote = remote
+
+        # Live views of the readings in the remote's structs, or None for a remote that isn't a ctypes struct.
+        self.orient, self.orient_fields = struct_view(remote.orient, ('roll', 'pitch'))
+        self.gforce, self.gforce_fields = struct_view(remote.gforce, ('x', 'y', 'z'))
+
+        self.dtype = np.dtype(np.float32)
+        if self.orient is not None and self.gforce is not None:
+            self.dtype = np.result_type(self.orient.dtype, self.gforce.dtype)
+
+    # Returns the type of the readings.
+    def get_dtype(self):
+        return self.dtype
+
+    # Copies the remote's current readings into frame (roll, pitch, x, y, z).
+    # frame:  The array to copy into.  A new array if not given.
+    def read(self, frame=None):
+        if frame is None:
+            frame = np.empty(NUM_CHANNELS, dtype=self.dtype)
+
+        if self.orient is not None and self.gforce is not None:
+            frame[0:2] = self.orient[self.orient_fields]
+            frame[2:5] = self.gforce[self.gforce_fields]
+        else:
+            orient = self.remote.orient
+            gforce = self.remote.gforce
+            frame[:] = (orient.roll, orient.pitch, gforce.x, gforce.y, gforce.z)
+
+        return frame
+
+
+# Returns a NumPy view of a ctypes struct whose named fields all have the same type,
+# and the index (a slice when the fields are next to each other) of those fields in the view.
+# Returns (None, None) if the struct isn't a ctypes struct that can be viewed this way.
+def struct_view(struct, names):
+    if not isinstance(struct, ctypes.Structure):
+        return None, None
+
+    field_types = dict(struct._fields_)
+    ctype = field_types[names[0]]
+    size = ctypes.sizeof(ctype)
+    offsets = [getattr(type(struct), name).offset for name in names]
+    if any(field_types[name] is not ctype for name in names) or any(offset % size for offset in offsets):
+        return None, None
+
+    pointer = ctypes.cast(ctypes.addressof(struct), ctypes.POINTER(ctype))
+    view = np.ctypeslib.as_array(pointer, shape=(ctypes.sizeof(struct) // size,))
+
+    indices = [offset // size for offset in offsets]
+    if indices == range(indices[0], indices[0] + len(indices)):
+        return view, slice(indices[0], indices[-1] + 1)
+    return view, np.array(indices)
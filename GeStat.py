@@ -1,19 +1,25 @@
 # This class defines a GeStats object, which keeps track of statistics regarding BlueWand.
 from WriterReader import StatWR
-from WriterReader import GestureWriterReader
+from GestureRegistry import get_registry
+from PersistenceWorker import get_persistence_worker
+from Metrics import get_metrics
+import os
 
 
 class GeStat:
 
     def __init__(self, stat_file, gesture_file):
         self.stat_wr = StatWR(stat_file)
-        self.gesture_writer_reader = GestureWriterReader(gesture_file)
+        self.persistence = get_persistence_worker()
+        self.gesture_writer_reader = get_registry(gesture_file)
         self.total_attempts = self.stat_wr.get_attempts()
         self.total_successes = self.stat_wr.get_successes()
 
     # Updates a gesture's statistics according to whether or not
     # a gesture was performed successfully.
-    def confirm(self, gesture, was_successful):
+    # persist:  Whether to write the gesture to the gestures file.  Pass False when
+    # the caller writes the gesture itself straight afterwards.
+    def confirm(self, gesture, was_successful, persist=True):
 
         # Increment the gesture attempts, and the total attempts
         gesture.incr_attempts()
@@ -25,7 +31,8 @@ class GeStat:
             gesture.incr_successes()
             self.incr_total_successes()
 
-        self.gesture_writer_reader.update_gesture(gesture)
+        if persist:
+            self.gesture_writer_reader.update_gesture(gesture)
 
     # Returns the success rate of a gesture.
     # If the gesture has never been recognized, returns a success rate of 0.
@@ -51,31 +58,36 @@ class GeStat:
         else:
             return 0
 
+    # Hands the total statistics to the persistence worker, to be written to the stats file.
+    def save_stats(self):
+        self.persistence.submit((os.path.abspath(self.stat_wr.stat_file),), self.stat_wr.update_stats,
+                                self.total_attempts, self.total_successes)
+
     # Increments successes, and updates the stats file.
     def incr_total_successes(self):
         self.total_successes += 1
-        self.stat_wr.update_stats(self.total_attempts, self.total_successes)
+        self.save_stats()
 
     # Increments attempts. Also updates the stats file.
     def incr_total_attempts(self):
         self.total_attempts += 1
-        self.stat_wr.update_stats(self.total_attempts, self.total_successes)
+        self.save_stats()
 
     # Sets total successes to the given number.  Updates stats file.
     def set_total_successes(self, num_successes):
         self.total_successes = num_successes
-        self.stat_wr.update_stats(self.total_attempts, self.total_successes)
+        self.save_stats()
 
     # Sets total attempts to the given number.  Updates stats file.
     def set_total_attempts(self, num_attempts):
         self.total_attempts = num_attempts
-        self.stat_wr.update_stats(self.total_attempts, self.total_successes)
+        self.save_stats()
 
     # Resets the total statistics to 0 attempts and 0 successes.
     def reset_total_stats(self):
-        self.stat_wr.reset_stats()
-        self.set_total_attempts(0)
-        self.set_total_successes(0)
+        self.total_attempts = 0
+        self.total_successes = 0
+        self.save_stats()
 
     # Resets all gesture statistics to 0 attempts and 0 successes
     def reset_gesture_stats(self):
@@ -106,3 +118,8 @@ class GeStat:
         print "   " + str(self.get_total_success_rate()).ljust(25) + str(self.total_successes).ljust(20) \
         + str(self.total_attempts).ljust(20) + "\n\n"
 
+        if get_metrics().is_enabled():
+            print "Timings:\n"
+            get_metrics().print_metrics()
+            print "\n"
+
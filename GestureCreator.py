@@ -1,53 +1,42 @@
 # This class defines a GestureCreator, which performs tasks necessary to learning and maintaining gestures.
 from PerformedGesture import PerformedGesture
 from LearnedGesture import LearnedGesture
-from WriterReader import GestureWriterReader
-import shlex, wiiuse
+from GestureRegistry import get_registry
+from CaptureBuffer import CaptureBuffer
+from Resampling import average_frames
+from WiimoteDriver import get_driver
+from Metrics import get_metrics
+from Clock import monotonic
+import shlex
 
 
 
 class GestureCreator:
 
-    def __init__(self, gestures_file, wiimotes, first_wm, num_motes, frame_freq):
-        self.writer_reader = GestureWriterReader(gestures_file)
+    # sampler:  The SamplingThread polling the remotes.  Gestures are captured from the first remote's samples.
+    def __init__(self, gestures_file, wiimotes, first_wm, num_motes, frame_freq, sampler):
+        self.writer_reader = get_registry(gestures_file)
+        self.writer_reader.subscribe(self)
         self.wiimotes = wiimotes
         self.first_wm = first_wm
         self.num_motes = num_motes
         self.frame_freq = frame_freq
+        self.sampler = sampler
+        self.capture_buffer = CaptureBuffer()  # Frames of the gesture being performed.
+        self.release_time = None  # When B was released to end the last gesture performed, on the monotonic clock.
         self.known_gestures = self.writer_reader.get_learned_gestures()
         # self.full_gestures = self.writer_reader.get_full_gestures()
 
     # Takes iterations of a gesture, and averages them frame-by-frame.
+    # Each iteration is resampled to their average length first, so none are cut short.
     def average_gesture(self, frame_arr):
-        min_length = float('inf')
-
-        # Find the shortest of the gestures for indexing purposes.
-        for frames in frame_arr:
-            if len(frames) < min_length:
-                min_length = len(frames)
+        min_length = min(len(frames) for frames in frame_arr)
 
         if min_length == 0:
             print "Error:  A gesture had no length.  Exiting."
             exit(1)
 
-        avg_frames = []
-
-        for i in range(0, min_length):
-            roll_sum = 0.0
-            pitch_sum = 0.0
-            acc_x_sum = 0.0
-            acc_y_sum = 0.0
-            acc_z_sum = 0.0
-            for j in range (0, len(frame_arr)):
-                roll_sum += frame_arr[j][i][0]   # Roll reading for this frame
-                pitch_sum += frame_arr[j][i][1]  # Pitch reading for this frame
-                acc_x_sum += frame_arr[j][i][2]  # X accelerometer
-                acc_y_sum += frame_arr[j][i][3]  # Y accelerometer
-                acc_z_sum += frame_arr[j][i][4]  # Z accelerometer
-            avg_frames.append((roll_sum/len(frame_arr), pitch_sum/len(frame_arr), acc_x_sum/len(frame_arr),
-                               acc_y_sum/len(frame_arr), acc_z_sum/len(frame_arr)))
-
-        return avg_frames
+        return average_frames(frame_arr)
 
     # Prompts the user to go through the process of learning a gesture,
     # (Repeating the gesture several times, averaging these repetitions,
@@ -76,85 +65,126 @@ class GestureCreator:
 
         i = 0
         while not done:
-            r = wiiuse.poll(self.wiimotes, self.num_motes)
-            if r != 0:
-
-                if wiiuse.is_just_pressed(self.first_wm[0], wiiuse.button['B']):
-                    print "Learning gesture, round " + str(repetitions+1) + "."
-
-                    frames = []
+            sample = self.next_sample()
+            if sample is None:
+                print "The remote stopped before the gesture was learned.  Nothing was saved."
+                return
 
-                if wiiuse.is_held(self.first_wm[0], wiiuse.button['B']):
-                    roll = self.first_wm[0].orient.roll
-                    pitch = self.first_wm[0].orient.pitch
-                    acc_x = self.first_wm[0].gforce.x
-                    acc_y = self.first_wm[0].gforce.y
-                    acc_z = self.first_wm[0].gforce.z
+            if sample.is_just_pressed(get_driver().button['B']):
+                print "Learning gesture, round " + str(repetitions+1) + "."
 
-                    frame = (roll, pitch, acc_x, acc_y, acc_z)
+                self.capture_buffer.reset()
 
-                    # Only add every nth frame to the list.
-                    if i%self.frame_freq == 0:
-                        frames.append(frame)
+            if sample.is_held(get_driver().button['B']):
+                # Only add every nth frame to the list.
+                if i%self.frame_freq == 0:
+                    self.capture_buffer.append(sample.get_frame(), sample.get_timestamp())
 
-                if repetitions >= rep_limit:
-                    done = True
-                    print "Good! Press A to see your gesture added to the list of known gestures."
-                    continue
+            if repetitions >= rep_limit:
+                done = True
+                print "Good! Press A to see your gesture added to the list of known gestures."
+                continue
 
-                if wiiuse.is_released(self.first_wm[0], wiiuse.button['B']):
-                    repetitions += 1
-                    frame_arr.append(frames)
-                    print str(rep_limit-repetitions) + " repetition(s) remaining."
+            if sample.is_released(get_driver().button['B']):
+                repetitions += 1
+                # Copy the frames out of the buffer, which the next round overwrites.
+                frame_arr.append(self.capture_buffer.get_frames().copy())
+                print str(rep_limit-repetitions) + " repetition(s) remaining."
 
-                i += 1
+            i += 1
 
         # Creating the average of the repetitions to create the learned gesture.
         gesture_average = self.average_gesture(frame_arr)
 
-        # Writing Gesture to the gesture file.
+        # Writing Gesture to the gesture file.  (The registry updates the known gestures.)
         gesture = LearnedGesture(gest_name, gesture_average, gest_arg_arr, 0, 0, frame_arr)
         self.writer_reader.write_gesture(gesture)
 
-        # Update the current known gestures.
-        self.update_gestures()
-
     # Collects the data of a gesture to be compared to known gestures.
-    def perform_gesture(self):
+    # gesture_matcher:  If given, each frame is also scored by the matcher as it is
+    # collected, so recognition is ready as soon as B is released.
+    # Returns:  The PerformedGesture, or None if no gestures are known or a replayed trace ended first.
+    def perform_gesture(self, gesture_matcher=None):
         done = False
 
         if len(self.known_gestures) == 0:
             return
+        if gesture_matcher is not None:
+            gesture_matcher.start_incremental()
+
         i = 0
-        frames = []
+        self.capture_buffer.reset()
         while not done:
-            r = wiiuse.poll(self.wiimotes, self.num_motes)
-            if r != 0:
-
-                if wiiuse.is_held(self.first_wm[0], wiiuse.button['B']):
-                    roll = self.first_wm[0].orient.roll
-                    pitch = self.first_wm[0].orient.pitch
-                    acc_x = self.first_wm[0].gforce.x
-                    acc_y = self.first_wm[0].gforce.y
-                    acc_z = self.first_wm[0].gforce.z
-
-                    frame = (roll, pitch, acc_x, acc_y, acc_z)
-
-                    # Only add every nth frame to the list.
-                    if i % self.frame_freq == 0:
-                        frames.append(frame)
-
-                if wiiuse.is_released(self.first_wm[0], wiiuse.button['B']):
-                    done = True
-                i += 1
-
-        gesture = PerformedGesture(frames)
+            sample = self.next_sample()
+            if sample is None:
+                return None
+
+            if sample.is_held(get_driver().button['B']):
+                # Only add every nth frame to the list.
+                if i % self.frame_freq == 0:
+                    with get_metrics().time('capture'):
+                        frame = self.capture_buffer.append(sample.get_frame(), sample.get_timestamp())
+                        if gesture_matcher is not None:
+                            gesture_matcher.add_frame(frame)
+
+            if sample.is_released(get_driver().button['B']):
+                self.release_time = sample.get_timestamp()
+                done = True
+            i += 1
+
+        # The frames are views of the capture buffer, valid until the next gesture is performed.
+        gesture = PerformedGesture(self.capture_buffer.get_frames(), self.capture_buffer.get_timestamps())
         return gesture
 
+    # Recognizes gestures continuously, without B being held, until one is spotted.
+    # spotter:  The GestureSpotter that segments and scores the stream of frames.
+    # Returns:  The matched learned gesture, or None if 1 was pressed to stop, or a replayed trace ended.
+    def spot_gesture(self, spotter):
+        i = 0
+        while True:
+            sample = self.next_sample()
+            if sample is None or sample.is_just_pressed(get_driver().button['1']):
+                return None
+
+            # Only add every nth frame, as when performing with B held.
+            if i % self.frame_freq == 0:
+                matched_gesture = spotter.add_frame(sample.get_frame())
+                if matched_gesture is not None:
+                    return matched_gesture
+            i += 1
+
+    # Returns when B was released to end the last gesture performed, on the monotonic clock.
+    def get_release_time(self):
+        return self.release_time
+
+    # Waits for the next sample from the first remote.  Samples from other remotes are dropped.
+    # How long each sample waited to be taken is timed as 'sample_delay'.
+    # Returns:  The sample, or None if there will be no more (a replayed trace has ended).
+    def next_sample(self):
+        metrics = get_metrics()
+        while True:
+            sample = self.sampler.get()
+            if sample is None:
+                return None
+            if sample.get_remote_index() == 0:
+                if metrics.is_enabled():
+                    metrics.record('sample_delay', monotonic() - sample.get_timestamp())
+                return sample
+
     def update_gestures(self):
         self.known_gestures = self.writer_reader.get_learned_gestures()
         # self.full_gestures = self.writer_reader.get_full_gestures()
 
+    # Registry listeners:  Keep the known gestures up to date.
+    def gesture_changed(self, gesture):
+        self.update_gestures()
+
+    def gesture_removed(self, g_name):
+        self.update_gestures()
+
+    def gestures_reloaded(self, gestures):
+        self.update_gestures()
+
     def get_gesture_names(self):
         names = []
         for g in self.known_gestures:
@@ -0,0 +1,20 @@
+# Holds gestures in memory where a GestureMatcher expects a gestures file, e.g. gestures made up
+# for a benchmark, or rebuilt from some of their iterations for an evaluation.
+
+
+class GestureList:
+
+    def __init__(self, gestures):
+        self.gestures = gestures
+
+    def get_learned_gestures(self):
+        return self.gestures
+
+    def get_gesture_names(self):
+        return [g.get_name() for g in self.gestures]
+
+    def get_gesture_from_name(self, g_name):
+        for g in self.gestures:
+            if g.get_name() == g_name:
+                return g
+        return None
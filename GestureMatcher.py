@@ -1,336 +1,217 @@
 # This class performs the gesture recognition for BlueMote
 
-import wiiuse
-import math
+import numpy as np
 from LearnedGesture import LearnedGesture
 from PerformedGesture import PerformedGesture
-import operator
+from TemplateTensor import TemplateTensor
+from DTWMatcher import DTWMatcher
+from IncrementalScorer import IncrementalScorer
+from FeatureExtractor import FeatureExtractor
+from KDTree import KDTree
+from BatchRecognizer import BatchRecognizer
+from Metrics import timed
+from ChannelWeights import self_variances, channel_weights, LENGTH_WEIGHT
 
 
 class GestureMatcher:
 
-    def __init__(self, writer_reader):
+    # writer_reader:  Where the known gestures come from.  If it is a GestureRegistry, the
+    # matcher follows changes to the gestures without reading them all again.
+    # dtw_band:  How many frames either side of the diagonal DTW may warp a gesture by.
+    def __init__(self, writer_reader, dtw_band=10):
         self.writer_reader = writer_reader
+        if hasattr(self.writer_reader, 'subscribe'):
+            self.writer_reader.subscribe(self)
+        self.dtw_band = dtw_band
         self.known_gestures = self.writer_reader.get_learned_gestures()
+        # Known gestures packed into one array, for comparing against all of them at once.
+        self.template_tensor = TemplateTensor(self.known_gestures)
+        # Known gestures with their DTW envelopes.
+        self.dtw_matcher = DTWMatcher(self.known_gestures, self.dtw_band)
+        # Running scores of the gesture currently being performed.
+        self.incremental_scorer = IncrementalScorer(self.template_tensor)
         self.SENSOR_MAX_ROLL = 180
         self.SENSOR_MAX_PITCH = 180
         self.SENSOR_MAX_ACC_X = 26
         self.SENSOR_MAX_ACC_Y = 26
         self.SENSOR_MAX_ACC_Z = 26
+        # Known gestures' feature vectors, indexed by gesture name, for finding candidates quickly.
+        self.feature_extractor = FeatureExtractor([self.SENSOR_MAX_ROLL, self.SENSOR_MAX_PITCH, self.SENSOR_MAX_ACC_X,
+                                                   self.SENSOR_MAX_ACC_Y, self.SENSOR_MAX_ACC_Z])
+        self.feature_index = KDTree(self.feature_extractor.get_num_features())
+        self.indexed_gestures = {}  # Gesture name -> the gesture as it was indexed.
+        self.index_gestures()
 
     # Returns a gesture based on which has the smallest variance from the given gesture.
     # Fast, but adds the variances of all sensor readings together indiscriminately,
     # Which may not be entirely representative of the gesture.
+    # Each gesture is compared over the length of the shorter of the two gestures.
     def variance_recognition(self, gesture):
-        all_gestures_variances = []
+        if self.template_tensor.get_size() == 0:
+            return None
 
-        for g in self.known_gestures:
-            total_roll_variance = 0.0
-            total_pitch_variance = 0.0
-            total_x_variance = 0.0
-            total_y_variance = 0.0
-            total_z_variance = 0.0
-
-            # Use length of the shorter gesture to avoid indexing errors.
-            shorter_gesture_length = min(gesture.get_length(), g.get_length())
-
-            for i in range(0, shorter_gesture_length): # From 0 to the length of the shorter gesture.
-                total_roll_variance += (gesture.get_roll(i)-g.get_roll(i))**2
-                total_pitch_variance += (gesture.get_pitch(i)-g.get_pitch(i))**2
-                total_x_variance += (gesture.get_X(i)-g.get_X(i))**2
-                total_y_variance += (gesture.get_Y(i)-g.get_Y(i))**2
-                total_z_variance += (gesture.get_Z(i)-g.get_Z(i))**2
-                # frame_variances = (roll_variance, pitch_variance, x_variance, y_variance, z_variance)
-                # gesture_variances.append(frame_variances)
-
-            total_gesture_variances = (total_roll_variance, total_pitch_variance, total_x_variance,
-                                       total_y_variance, total_z_variance)
-
-            # Store the gesture name and its total variances from the performed gesture.
-            all_gestures_variances.append((g.get_name(), total_gesture_variances))
-
-        # Find the gesture with the lowest variance from the performed gesture.
-        compound_gesture_variances = []
-        for v in all_gestures_variances:
-            # Append gesture name, and its standard deviation from the performed gesture
-            compound_gesture_variances.append((v[0], math.sqrt(sum(v[1]))/shorter_gesture_length))
-            # print "Average variance: ", v[0], math.sqrt(sum(v[1]))/shorter_gesture_length
+        # Total variance of every known gesture from the performed gesture.
+        total_variances = self.template_tensor.total_variances(gesture.get_frames())
 
         # Find gesture with the lowest variance.
-        closest = min(compound_gesture_variances, key=lambda tup: tup[1])
-
-        matched_gesture = self.get_gesture_from_name(closest[0])
-
-        if matched_gesture is None:
-            print "variance_recognition, Error: No matched gesture by name "+closest[0]
-
-        return matched_gesture
+        return self.template_tensor.get_gesture(int(total_variances.argmin()))
+
+    # Returns a gesture based on the smallest distance from the given gesture once both are
+    # resampled to the same number of frames.  How long B was held, and how many frames were
+    # skipped while capturing, make no difference, so no gesture is cut short or penalized for length.
+    def resampled_recognition(self, gesture):
+        if self.template_tensor.get_size() == 0:
+            return None
+
+        distances = self.template_tensor.resampled_distances(gesture.get_resampled())
+        return self.template_tensor.get_gesture(int(distances.argmin()))
+
+    # Returns a gesture based on its features (the mean, variance, motion and low frequencies of each
+    # sensor reading, and the duration).  The learned gestures with the nearest features are looked up
+    # in the feature index without comparing against every gesture, and the one of those candidates
+    # nearest the given gesture when both are resampled is returned.
+    # num_candidates:  How many of the nearest gestures by feature to compare.
+    def feature_recognition(self, gesture, num_candidates=5):
+        candidates = self.feature_index.nearest(self.feature_extractor.extract(gesture), num_candidates)
+        if not candidates:
+            return None
+
+        resampled = np.asarray(gesture.get_resampled(), dtype=np.float64)
+        distances = [((self.indexed_gestures[name].get_resampled() - resampled) ** 2).sum() for _, name in candidates]
+        return self.indexed_gestures[candidates[int(np.argmin(distances))][1]]
+
+    # Brings the feature index up to date with the known gestures.  Only gestures that were added,
+    # changed or removed since the index was last updated are inserted into or removed from it.
+    def index_gestures(self):
+        gestures = dict((g.get_name(), g) for g in self.known_gestures)
+        for name in list(self.indexed_gestures.keys()):
+            if name not in gestures:
+                self.unindex_gesture(name)
+
+        for name, g in gestures.items():
+            indexed = self.indexed_gestures.get(name)
+            # Frames are replaced, not changed in place, when a gesture changes.
+            if indexed is None or indexed.get_frames() is not g.get_frames():
+                self.index_gesture(g)
+            else:
+                self.indexed_gestures[name] = g
+
+    # Inserts a gesture's features into the feature index, replacing any of the same name.
+    def index_gesture(self, gesture):
+        self.feature_index.insert(gesture.get_name(), self.feature_extractor.extract(gesture))
+        self.indexed_gestures[gesture.get_name()] = gesture
+
+    # Removes the gesture by the given name from the feature index.
+    def unindex_gesture(self, g_name):
+        self.feature_index.remove(g_name)
+        self.indexed_gestures.pop(g_name, None)
+
+    # Returns the same gesture as variance_recognition, comparing fewer gestures in full.  Gestures
+    # are first compared coarsely (averaged over blocks of frames), which gives a lower bound on
+    # each gesture's variance.  Gestures are then compared in full in order of their bounds,
+    # num_survivors at a time, until the next bound is above the lowest variance found.
+    def cascade_variance_recognition(self, gesture, num_survivors=8):
+        if self.template_tensor.get_size() == 0:
+            return None
+
+        frames = gesture.get_frames()
+        bounds = self.template_tensor.coarse_lower_bounds(frames)
+        order = np.argsort(bounds, kind='mergesort')
+        sorted_bounds = bounds[order]
+
+        best_row = None
+        best_variance = float('inf')
+        start = 0
+        while start < len(order):
+            if sorted_bounds[start] > best_variance:
+                break
+
+            # Compare the num_survivors lowest bounds first, then every gesture whose bound is
+            # below the lowest variance found among them.
+            end = start + num_survivors
+            if best_row is not None:
+                end = max(end, np.searchsorted(sorted_bounds, best_variance, 'right'))
+            rows = order[start:end]
+            start = end
+
+            variances = self.template_tensor.total_variances(frames, rows)
+            for row, variance in zip(rows, variances):
+                # Ties go to the earliest gesture, as in variance_recognition.
+                if variance < best_variance or (variance == best_variance and row < best_row):
+                    best_row = row
+                    best_variance = variance
+
+        return self.template_tensor.get_gesture(int(best_row))
+
+    # Returns a gesture based on the smallest Dynamic Time Warping distance from the given gesture.
+    # Unlike variance_recognition, frames are not compared strictly index to index, so a gesture
+    # performed faster or slower than it was taught is still matched to it.
+    # Returns None if no known gesture can be warped onto the given gesture within the band.
+    def dtw_recognition(self, gesture):
+        return self.dtw_matcher.recognize(gesture.get_frames())
+
+    # Recognizes many performed gestures at once, comparing blocks of them against every known
+    # gesture together.  (See BatchRecognizer.)
+    # method:  'resampled', 'variance', or 'closest'.
+    # num_matches:  How many of the best known gestures to return for each performed gesture.
+    # Returns:  For each performed gesture, in order, a list of (learned gesture, score) pairs, best first.
+    def batch_recognition(self, performed_gestures, method='resampled', num_matches=5):
+        return list(BatchRecognizer(self, method, num_matches).recognize(performed_gestures))
 
     # Returns a gesture based on which has the greatest amount of closest sensor
     # readings to the performed gesture
+    @timed('greatest_closest_recognition')
     def greatest_closest_recognition(self, performed_gesture):
-        weights = [1,1,1,1,1,1]
-        weights = self.evaluation_function(performed_gesture)
-        gesture_dict = {}
-        length_differences = {}
+        if self.template_tensor.get_size() == 0:
+            return None
 
-        for g in self.known_gestures:
-            # Initialize each gesture's closest reading count to 0.
-            gesture_dict.update({g.get_name() : 0})
-
-            # If the gesture is longer than the performed gesture, record its name
-            # and penalize for the difference of their lengths (a gesture is guaranteed
-            # not to be closest to nonexistent frames)
-            if g.get_length() > performed_gesture.get_length():
-                diff = g.get_length() - performed_gesture.get_length()
-                gesture_dict[g.get_name()] -= diff
-
-        closest_gesture_roll=None
-        closest_gesture_pitch=None
-        closest_gesture_X=None
-        closest_gesture_Y=None
-        closest_gesture_Z = None
-
-        for i in range(0, len(performed_gesture.get_frames())):
-            closest_gesture_roll = self.closest_roll(performed_gesture.get_frame(i), i)
-            closest_gesture_pitch = self.closest_pitch(performed_gesture.get_frame(i), i)
-            closest_gesture_X = self.closest_x(performed_gesture.get_frame(i), i)
-            closest_gesture_Y = self.closest_y(performed_gesture.get_frame(i), i)
-            closest_gesture_Z = self.closest_z(performed_gesture.get_frame(i), i)
-            # closest_gesture_length = self.closest_length(performed_gesture)
-
-            if closest_gesture_roll is not None:
-                gesture_dict[closest_gesture_roll.get_name()] += 1*weights[0]
-            if closest_gesture_pitch is not None:
-                gesture_dict[closest_gesture_pitch.get_name()] += 1*weights[1]
-            if closest_gesture_X is not None:
-                gesture_dict[closest_gesture_X.get_name()] += 1*weights[2]
-            if closest_gesture_Y is not None:
-                gesture_dict[closest_gesture_Y.get_name()] += 1*weights[3]
-            if closest_gesture_Z is not None:
-                gesture_dict[closest_gesture_Z.get_name()] += 1*weights[4]
-            # if closest_gesture_length is not None:
-            #     gesture_dict[closest_gesture_length.get_name()] += 1
+        # Count, per sensor reading, how many frames each gesture was the closest for, and weight
+        # the counts by how important each reading is to that gesture.  (Each learned gesture's
+        # weights are worked out when it is taught or averaged, not on every recognition.)
+        closest_counts = self.template_tensor.closest_counts(performed_gesture.get_frames())
+        scores = (closest_counts * self.template_tensor.weights).sum(axis=1)
+
+        # If a gesture is longer than the performed gesture, penalize for the difference
+        # of their lengths (a gesture is guaranteed not to be closest to nonexistent frames)
+        scores -= np.maximum(self.template_tensor.lengths - performed_gesture.get_length(), 0)
 
         # Return the gesture that has the greatest amount of closest frames
-        name = max(gesture_dict.iteritems(), key=operator.itemgetter(1))[0]
-        sorted_gesture_dict = sorted(gesture_dict.items(), key=operator.itemgetter(1))
-        sorted_gesture_dict.reverse()
-        return self.get_gesture_from_name(name)
+        return self.template_tensor.get_gesture(int(scores.argmax()))
 
     # An evaluation function that weights sensor readings based on how much they change within the gesture.
     # This allows prioritization of sensor readings in the model, and it allows us to assign less weight
     # to sensor readings that don't define the gesture, but that may be done accidentally.
     #  (E.g., X-accelerometer in an up-down gesture.)
-    # Returns:  A list of weights for roll, pitch, X, Y, and Z sensor readings.
+    # The variations of all five readings are found in a single pass over the frames.
+    # Returns:  A list of weights for roll, pitch, X, Y, and Z sensor readings, and the length weight.
+    @timed('evaluation_function')
     def evaluation_function(self, performed_gesture):
-        self_roll_var = self.self_variance_roll(performed_gesture)
-        self_pitch_var = self.self_variance_pitch(performed_gesture)
-        self_x_var = self.self_variance_x(performed_gesture)
-        self_y_var = self.self_variance_y(performed_gesture)
-        self_z_var = self.self_variance_z(performed_gesture)
-
-        raw_variances_rp = [self_roll_var, self_pitch_var]
-        raw_variances_acc = [self_x_var, self_y_var, self_z_var]
-        if sum(raw_variances_rp) != 0:
-
-            # Normalize Roll and pitch relative to each other
-            normalized_variances_rp = [float(num)/sum(raw_variances_rp) for num in raw_variances_rp]
-            # Normalize X,Y, and Z relative to each other.
-            normalized_variances_acc = [float(num)/sum(raw_variances_acc) for num in raw_variances_acc]
-
-            length_weight = 0.2
-            normalized_variances_acc.append(length_weight)
-
-            # Normalized values, in order:  Roll, pitch, x, y, z.
-            weights = normalized_variances_rp + normalized_variances_acc
-
-            return weights
-        # Penalize being longer or shorter than the performed gesture.
-
-    # Returns the gesture that has the lowest total variance from the given frame at time = index.
-    # If index is out of range, moves on to the next gesture.
-    def get_closest_gesture(self, frame, index):
-        min_variance = float('inf')
-        closest_gesture = None
-        for g in self.known_gestures:
-
-            if index > len(g.get_frames()):
-                continue
-
-            roll_variance = 0.0
-            pitch_variance = 0.0
-            x_variance = 0.0
-            y_variance = 0.0
-            z_variance = 0.0
-
-            roll_variance += (frame[0]-g.get_roll(index))**2
-            pitch_variance += (frame[1]-g.get_pitch(index))**2
-            x_variance += (frame[2]-g.get_X(index))**2
-            y_variance += (frame[3]-g.get_Y(index))**2
-            z_variance += (frame[4]-g.get_Z(index))**2
-            frame_variances = (roll_variance, pitch_variance, x_variance, y_variance, z_variance)
-
-            # The sum of all of the variances in the frame.
-            total_variance = sum(frame_variances)
-            # print "get_closest_gesture: ", g, total_variance
-            if total_variance < min_variance:
-                closest_gesture = g
-                min_variance = total_variance
-
-        return closest_gesture
-
-    # Returns the gesture that has the lowest roll variance from the given frame
-    # at time = index
-    def closest_roll(self, frame, index):
-        min_variance = float('inf')
-        closest_gesture = None
-        for g in self.known_gestures:
-            if index >= len(g.get_frames()):
-                continue
-            roll_variance = 0.0
-            roll_variance += (frame[0]-g.get_roll(index))**2
-
-            # If the roll variance of the current frame is less
-            # than the current minimum, replace it
-            if roll_variance < min_variance:
-                closest_gesture = g
-                min_variance = roll_variance
-
-        return closest_gesture
-
-    # Returns the gesture that has the lowest pitch variance from the given frame
-    # at time = index
-    def closest_pitch(self, frame, index):
-        min_variance = float('inf')
-        closest_gesture = None
-        for g in self.known_gestures:
-            if index >= len(g.get_frames()):
-                continue
-            pitch_variance = 0.0
-            pitch_variance += (frame[1]-g.get_pitch(index))**2
-
-            # Keep track minimum pitch variance
-            if pitch_variance < min_variance:
-                closest_gesture = g
-                min_variance = pitch_variance
-
-        return closest_gesture
-
-    # Returns the gesture that has the lowest X-coordinate variance from the given frame
-    # at time = index
-    def closest_x(self, frame, index):
-        min_variance = float('inf')
-        closest_gesture = None
-        for g in self.known_gestures:
-            if index >= len(g.get_frames()):
-                continue
-            x_variance = 0.0
-            x_variance += (frame[2]-g.get_X(index))**2
-
-            # Keep track of minimum x variance
-            if x_variance < min_variance:
-                closest_gesture = g
-                min_variance = x_variance
-
-        return closest_gesture
-
-    # Returns the gesture that has the lowest Y-coordinate variance from the given frame
-    # at time = index
-    def closest_y(self, frame, index):
-        min_variance = float('inf')
-        closest_gesture = None
-        for g in self.known_gestures:
-            if index >= len(g.get_frames()):
-                continue
-            y_variance = 0.0
-            y_variance += (frame[3]-g.get_Y(index))**2
-
-            # Keep track of minimum x variance
-            if y_variance < min_variance:
-                closest_gesture = g
-                min_variance = y_variance
-
-        return closest_gesture
-
-    # Returns the gesture that has the lowest Y-coordinate variance from the given frame
-    # at time = index
-    def closest_z(self, frame, index):
-        min_variance = float('inf')
-        closest_gesture = None
-
-        for g in self.known_gestures:
-            if index >= len(g.get_frames()):
-                continue
-            z_variance = 0.0
-            z_variance += (frame[4]-g.get_Z(index))**2
-
-            # Keep track of minimum x variance
-            if z_variance < min_variance:
-                closest_gesture = g
-                min_variance = z_variance
+        return self.channel_weights(self_variances(performed_gesture.get_frames()))
 
-        return closest_gesture
-
-    def closest_length(self, gesture):
-        closest_gesture = None
-        min_difference = float('inf')
-        for g in self.known_gestures:
-            if abs(len(g.get_frames())-len(gesture.get_frames())) < min_difference:
-                min_difference = abs(len(g.get_frames())-len(gesture.get_frames()))
-                closest_gesture = g
-
-        return closest_gesture
-
-    # Returns the total variation of roll within a single gesture.
-    # Used to determine how much the roll sensor reading is changing over time.
-    @staticmethod
-    def self_variance_roll(gesture):
-        total_roll_variance = 0
-        for i in range(0, gesture.get_length()-1):
-            total_roll_variance += (gesture.get_roll(i)-gesture.get_roll(i+1))**2
-
-        return total_roll_variance
-
-    # Returns the total variation of pitch within a single gesture.
-    # Used to determine how much the pitch sensor reading is changing over time.
-    @staticmethod
-    def self_variance_pitch(gesture):
-        total_pitch_variance = 0
-        for i in range(0, gesture.get_length()-1):
-            total_pitch_variance += (gesture.get_pitch(i)-gesture.get_pitch(i+1))**2
-
-        return total_pitch_variance
-
-    # Returns the total variation of x accelerometer within a single gesture.
-    # Used to determine how much the x accelerometer reading is changing over time.
+    # Returns the weights for the given total variations of roll, pitch, X, Y, and Z within a gesture.
+    # (See evaluation_function.)  If roll and pitch (or X, Y, and Z) never change, they are weighted evenly.
     @staticmethod
-    def self_variance_x(gesture):
-        total_x_variance = 0
-        for i in range(0, gesture.get_length()-1):
-            total_x_variance += (gesture.get_X(i)-gesture.get_X(i+1))**2
+    def channel_weights(variances):
+        return list(channel_weights(variances)) + [LENGTH_WEIGHT]
 
-        return total_x_variance
+    # Starts scoring a new gesture one frame at a time, as it is performed.
+    # Frames are given with add_frame, and the result read with the incremental_* recognitions.
+    def start_incremental(self):
+        self.incremental_scorer = IncrementalScorer(self.template_tensor)
 
-    # Returns the total variation of y accelerometer within a single gesture.
-    # Used to determine how much the y accelerometer reading is changing over time.
-    @staticmethod
-    def self_variance_y(gesture):
-        total_y_variance = 0
-        for i in range(0, gesture.get_length()-1):
-            total_y_variance += (gesture.get_Y(i)-gesture.get_Y(i+1))**2
+    # Scores the next frame of the gesture being performed.
+    def add_frame(self, frame):
+        self.incremental_scorer.add_frame(frame)
 
-        return total_y_variance
+    # Returns the same gesture as variance_recognition would for the frames added since
+    # start_incremental, without comparing them again.
+    def incremental_variance_recognition(self):
+        return self.incremental_scorer.variance_recognition()
 
-    # Returns the total variation of z accelerometer within a single gesture.
-    # Used to determine how much the z accelerometer  reading is changing over time.
-    @staticmethod
-    def self_variance_z(gesture):
-        total_z_variance = 0
-        for i in range(0, gesture.get_length()-1):
-            total_z_variance += (gesture.get_Z(i)-gesture.get_Z(i+1))**2
-
-        return total_z_variance
+    # Returns the same gesture as greatest_closest_recognition would for the frames added since
+    # start_incremental, without comparing them again.
+    def incremental_closest_recognition(self):
+        return self.incremental_scorer.closest_recognition()
 
     def sensor_update(self):
         print "update sensor."
@@ -354,3 +235,24 @@ class GestureMatcher:
     # Updates the known gestures from the gestures file.
     def update_known_gestures(self):
         self.known_gestures = self.writer_reader.get_learned_gestures()
+        self.template_tensor = TemplateTensor(self.known_gestures)
+        self.dtw_matcher = DTWMatcher(self.known_gestures, self.dtw_band)
+        self.index_gestures()
+
+    # Registry listener:  Repacks only the gesture that was added or changed.
+    def gesture_changed(self, gesture):
+        self.known_gestures = self.writer_reader.get_learned_gestures()
+        self.template_tensor = self.template_tensor.with_gesture(gesture)
+        self.dtw_matcher = self.dtw_matcher.with_gesture(gesture)
+        self.index_gesture(gesture)
+
+    # Registry listener:  Drops the deleted gesture.
+    def gesture_removed(self, g_name):
+        self.known_gestures = self.writer_reader.get_learned_gestures()
+        self.template_tensor = self.template_tensor.without_gesture(g_name)
+        self.dtw_matcher = self.dtw_matcher.without_gesture(g_name)
+        self.unindex_gesture(g_name)
+
+    # Registry listener:  Every gesture was replaced, so repack them all.
+    def gestures_reloaded(self, gestures):
+        self.update_known_gestures()
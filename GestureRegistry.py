@@ -0,0 +1,120 @@
+# This class describes the gesture registry: the one set of LearnedGestures shared by every part
+# of the program that works with a gestures file.  The gestures file is read once, when the
+# registry is created, and every change is made through the registry, which tells its listeners
+# straight away and hands the write to the persistence worker, to be saved in the background.
+#
+# The registry can be used anywhere a GestureWriterReader is.  Listeners are notified with:
+#   gesture_changed(gesture):    A gesture was added, or changed and written.
+#   gesture_removed(g_name):     The gesture by the given name was deleted.
+#   gestures_reloaded(gestures): All gestures were replaced (or deleted).
+
+from collections import OrderedDict
+from GestureStore import open_gesture_store
+from Metrics import timed
+from PersistenceWorker import get_persistence_worker
+import os
+
+# The registry of each gestures file, by absolute path.
+registries = {}
+
+
+# Returns the registry for the given gestures file, creating it the first time.
+def get_registry(gesture_file):
+    path = os.path.abspath(gesture_file)
+    if path not in registries:
+        registries[path] = GestureRegistry(gesture_file)
+
+    return registries[path]
+
+
+class GestureRegistry:
+
+    def __init__(self, gesture_file):
+        self.gesture_file = gesture_file
+        self.writer_reader = open_gesture_store(gesture_file)
+        self.persistence = get_persistence_worker()
+        self.gestures = OrderedDict((g.get_name(), g) for g in self.writer_reader.get_learned_gestures())
+        self.listeners = []
+
+    # Adds a listener to be told about changes to the gestures.
+    def subscribe(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    # Stops telling a listener about changes to the gestures.
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # Returns the known gestures.  These are the registry's own gestures: write any change
+    # back with update_gesture, so that it is saved and every listener sees it.
+    def get_learned_gestures(self):
+        return list(self.gestures.values())
+
+    # Returns a list of gesture names currently known.
+    def get_gesture_names(self):
+        return list(self.gestures.keys())
+
+    # Returns the gesture by the name g_name, or None if there is no such gesture.
+    def get_gesture_from_name(self, g_name):
+        return self.gestures.get(g_name)
+
+    # Adds a gesture.
+    def write_gesture(self, gesture):
+        self.write_gestures([gesture])
+
+    # Adds a list of gestures.
+    def write_gestures(self, gestures):
+        for g in gestures:
+            self.update_gesture(g)
+
+    # Saves a changed gesture, or adds it if it isn't known yet.
+    @timed('update_gesture')
+    def update_gesture(self, gesture):
+        self.save(gesture.get_name(), self.writer_reader.update_gesture, gesture.copy())
+        self.gestures[gesture.get_name()] = gesture
+        self.notify('gesture_changed', gesture)
+
+    # Deletes a gesture by the name g_name.
+    def delete_gesture(self, g_name):
+        if g_name not in self.gestures:
+            print "Delete_gesture: Gesture doesn't exist!"
+            return
+
+        self.save(g_name, self.writer_reader.delete_gesture, g_name)
+        del self.gestures[g_name]
+        self.notify('gesture_removed', g_name)
+
+    # Deletes all gestures.
+    def delete_gestures(self):
+        self.save(None, self.writer_reader.delete_gestures)
+        self.gestures = OrderedDict()
+        self.notify('gestures_reloaded', [])
+
+    # Replaces all gestures with a new list of gestures.
+    def overwrite_gestures(self, gestures):
+        self.save(None, self.writer_reader.overwrite_gestures, [g.copy() for g in gestures])
+        self.gestures = OrderedDict((g.get_name(), g) for g in gestures)
+        self.notify('gestures_reloaded', self.get_learned_gestures())
+
+    # Reads the gestures from the gestures file again, once every change has been saved.
+    def reload(self):
+        self.persistence.flush()
+        self.gestures = OrderedDict((g.get_name(), g) for g in self.writer_reader.get_learned_gestures())
+        self.notify('gestures_reloaded', self.get_learned_gestures())
+
+    # Prints all currently known gestures.
+    def print_gestures(self):
+        self.persistence.flush()
+        self.writer_reader.print_gestures()
+
+    # Hands a write of the gestures file to the persistence worker.  A later write of the same
+    # gesture replaces it, if it hasn't run yet.
+    # g_name:  The gesture written, or None for a write of every gesture.
+    def save(self, g_name, function, *arguments):
+        self.persistence.submit((os.path.abspath(self.gesture_file), g_name), function, *arguments)
+
+    # Calls the named method of every listener with the given argument.
+    def notify(self, method_name, argument):
+        for listener in list(self.listeners):
+            getattr(listener, method_name)(argument)
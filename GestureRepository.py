@@ -0,0 +1,220 @@
+# This class describes a gestures repository: a binary gestures file (the snapshot), plus a
+# journal of every change made since the snapshot was written.  Changing a gesture appends one
+# small record to the journal instead of rewriting the gestures file.  Loading reads the
+# snapshot and replays the journal over it.
+#
+# Once the journal grows past compact_threshold bytes, it is compacted in the background:
+# the journal is set aside, the current gestures are written to a new snapshot, which is
+# renamed over the old one, and the old journal is removed.  If the program stops part way
+# through, the old journal is replayed on the next load, so no change is lost.
+#
+# Repositories on the same gestures file within one process share a lock, and each picks
+# up changes made by the others before reading or writing.
+
+from collections import OrderedDict
+from WriterReader import GestureWriterReader
+from BinaryGestureStore import read_gesture_store, write_gesture_store, encode_gestures, decode_gestures
+import threading
+import struct
+import os
+
+RECORD_HEADER = struct.Struct('<cI')  # Record type and payload length.
+PUT_RECORD = 'P'  # Payload:  Gestures in the binary format, which replace any of the same name.
+DELETE_RECORD = 'D'  # Payload:  The name of the gesture to delete.
+CLEAR_RECORD = 'C'  # Deletes all gestures.  No payload.
+
+# Locks shared by every repository on the same gestures file.
+file_locks = {}
+file_locks_lock = threading.Lock()
+
+
+class GestureRepository(GestureWriterReader):
+
+    # compact_threshold:  Size of the journal, in bytes, past which it is compacted into the snapshot.
+    def __init__(self, gesture_file, compact_threshold=1024 * 1024):
+        self.gesture_file = gesture_file
+        self.journal_file = gesture_file + '.journal'
+        self.old_journal_file = gesture_file + '.journal.old'
+        self.compact_threshold = compact_threshold
+        self.lock = get_file_lock(gesture_file)
+        self.compaction = None  # The background compaction thread, while one is running.
+
+        self.gestures = OrderedDict()  # Gesture name -> LearnedGesture, in the order they were added.
+        self.snapshot_stamp = None  # The snapshot and old journal files that were loaded.
+        self.old_journal_stamp = None
+        self.journal_inode = None  # The journal that was loaded, and how far it was read.
+        self.journal_offset = 0
+
+        with self.lock:
+            if not os.path.isfile(self.gesture_file):
+                write_gesture_store(self.gesture_file, [])
+            self.reload()
+
+    #  Writes a gesture to the end of the gestures file.
+    def write_gesture(self, gesture):
+        self.write_gestures([gesture])
+
+    # Returns the known gestures by name, in the order they were added.
+    def get_index(self):
+        with self.lock:
+            self.refresh()
+            return self.gestures
+
+    #  Deletes all gestures.
+    def delete_gestures(self):
+        self.append([(CLEAR_RECORD, '')])
+
+    # Deletes a gesture by the name g_name.  Does not update currently known gestures.
+    def delete_gesture(self, g_name):
+        with self.lock:
+            self.refresh()
+            # Make sure the gesture is actually known before trying to remove it.
+            if g_name not in self.gestures:
+                print "Delete_gesture: Gesture doesn't exist!"
+                return
+
+            self.append([(DELETE_RECORD, g_name)])
+
+    # Appends a list of gestures to the gestures file.
+    def write_gestures(self, gestures):
+        self.append([(PUT_RECORD, encode_gestures(gestures))])
+
+    # Overwrites the current gestures file to contain a new list of gestures.
+    def overwrite_gestures(self, gestures):
+        self.append([(CLEAR_RECORD, ''), (PUT_RECORD, encode_gestures(gestures))])
+
+    # Replaces the stored gesture of the same name, or adds it if it isn't stored yet.
+    def update_gesture(self, gesture):
+        self.write_gestures([gesture])
+
+    # Appends records to the journal, and applies them to the gestures in memory.
+    # records:  A list of (record type, payload) tuples.
+    def append(self, records):
+        data = ''.join(RECORD_HEADER.pack(record_type, len(payload)) + payload for record_type, payload in records)
+
+        with self.lock:
+            self.refresh()
+
+            f = open(self.journal_file, 'ab')
+            # Drop a partly written record left by a crash, which could not be replayed.
+            if os.fstat(f.fileno()).st_size != self.journal_offset:
+                f.truncate(self.journal_offset)
+            f.write(data)
+            f.flush()
+            self.journal_inode = os.fstat(f.fileno()).st_ino
+            f.close()
+
+            self.journal_offset += len(data)
+            for record_type, payload in records:
+                self.apply(record_type, payload)
+
+            if self.journal_offset >= self.compact_threshold:
+                self.start_compaction()
+
+    # Applies a journal record to the gestures in memory.
+    def apply(self, record_type, payload):
+        if record_type == PUT_RECORD:
+            for g in decode_gestures(payload):
+                self.gestures[g.get_name()] = g
+        elif record_type == DELETE_RECORD:
+            self.gestures.pop(payload, None)
+        elif record_type == CLEAR_RECORD:
+            self.gestures.clear()
+
+    # Replays the complete records of a journal file, starting at offset.
+    # Returns:  The offset just past the last complete record.
+    def replay(self, journal_file, offset):
+        if not os.path.isfile(journal_file):
+            return offset
+
+        f = open(journal_file, 'rb')
+        f.seek(offset)
+        data = f.read()
+        f.close()
+
+        position = 0
+        while position + RECORD_HEADER.size <= len(data):
+            record_type, length = RECORD_HEADER.unpack_from(data, position)
+            payload_start = position + RECORD_HEADER.size
+            if payload_start + length > len(data):
+                break  # A partly written record.
+            self.apply(record_type, data[payload_start:payload_start + length])
+            position = payload_start + length
+
+        return offset + position
+
+    # Loads the gestures from the snapshot, and replays the journals over them.  Call with the lock held.
+    def reload(self):
+        self.snapshot_stamp = file_stamp(self.gesture_file)
+        self.old_journal_stamp = file_stamp(self.old_journal_file)
+        journal_stamp = file_stamp(self.journal_file)
+        self.journal_inode = journal_stamp and journal_stamp[0]
+
+        self.gestures = OrderedDict((g.get_name(), g) for g in read_gesture_store(self.gesture_file))
+        self.replay(self.old_journal_file, 0)
+        self.journal_offset = self.replay(self.journal_file, 0)
+
+    # Picks up changes made to the gestures file since it was last read.  Call with the lock held.
+    # Records appended to the same journal are replayed; anything else reloads the gestures.
+    def refresh(self):
+        journal_stamp = file_stamp(self.journal_file)
+        journal_inode = journal_stamp and journal_stamp[0]
+
+        if (file_stamp(self.gesture_file) != self.snapshot_stamp or
+                file_stamp(self.old_journal_file) != self.old_journal_stamp or
+                journal_inode != self.journal_inode or
+                (journal_stamp is not None and journal_stamp[2] < self.journal_offset)):
+            self.reload()
+        elif journal_stamp is not None and journal_stamp[2] > self.journal_offset:
+            self.journal_offset = self.replay(self.journal_file, self.journal_offset)
+
+    # Sets the journal aside, and writes the current gestures to a new snapshot in the background.
+    # Call with the lock held.
+    def start_compaction(self):
+        # A compaction is already under way, here or in another repository.
+        if os.path.exists(self.old_journal_file):
+            return
+
+        os.rename(self.journal_file, self.old_journal_file)
+        self.old_journal_stamp = file_stamp(self.old_journal_file)
+        self.journal_inode = None
+        self.journal_offset = 0
+
+        # Not a daemon, so the program finishes the snapshot before exiting.
+        self.compaction = threading.Thread(target=self.compact, args=(list(self.gestures.values()),))
+        self.compaction.start()
+
+    # Writes gestures to a new snapshot, then removes the old journal they include.
+    def compact(self, gestures):
+        write_gesture_store(self.gesture_file, gestures)
+
+        with self.lock:
+            os.remove(self.old_journal_file)
+            # The gestures in memory already include everything in the new snapshot.
+            self.snapshot_stamp = file_stamp(self.gesture_file)
+            self.old_journal_stamp = None
+            self.compaction = None
+
+    # Waits for a background compaction, if one is running.
+    def wait_for_compaction(self):
+        compaction = self.compaction
+        if compaction is not None:
+            compaction.join()
+
+
+# Returns the lock shared by every repository on the given gestures file.
+def get_file_lock(gesture_file):
+    path = os.path.abspath(gesture_file)
+    with file_locks_lock:
+        if path not in file_locks:
+            file_locks[path] = threading.RLock()
+        return file_locks[path]
+
+
+# Returns (inode, modification time, size) of a file, or None if it does not exist.
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime, stat.st_size
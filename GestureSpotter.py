@@ -0,0 +1,157 @@
+# This class spots gestures in a continuous stream of frames, so gestures can be
+# recognized without holding B.  Frames are fed in one at a time as they are polled.
+#
+# A candidate gesture starts when the motion energy (the smoothed change in acceleration
+# between frames) rises above start_energy, and ends once it has stayed below stop_energy
+# for quiet_frames frames.  Still frames at either end of a candidate (the pre-roll before the
+# motion, and the frames while the motion energy dies away) are trimmed off, and the rest is
+# scored against every known gesture at once.
+#
+# The candidate matches the known gesture with the least variance per frame they share, as
+# long as that is within the gesture's threshold; otherwise the motion is ignored.  A gesture's
+# threshold is the smallest of:
+#   tolerance times the variance per frame of its stored iterations from it, so gestures that
+#   are always performed the same way must be performed closely (with two or more iterations);
+#   motion_fraction times its own motion (the variance per frame of its readings from their
+#   mean), so a remote that is only jiggled never comes close enough to a gesture that moves;
+#   max_variance, if given.
+
+from collections import deque
+import numpy as np
+from PerformedGesture import PerformedGesture
+from TemplateTensor import NUM_CHANNELS
+
+
+class GestureSpotter:
+
+    def __init__(self, gesture_matcher, window_size=500, start_energy=0.05, stop_energy=0.01,
+                 quiet_frames=15, pre_roll=5, min_length=10, max_variance=None, tolerance=3.0,
+                 motion_fraction=0.5, smoothing=0.3):
+        self.gesture_matcher = gesture_matcher
+        self.window = deque(maxlen=window_size)  # The most recent frames of the stream.
+        self.start_energy = start_energy  # Motion energy that starts a candidate gesture.
+        self.stop_energy = stop_energy  # Motion energy under which a candidate gesture is quiet.
+        self.quiet_frames = quiet_frames  # Quiet frames in a row that end a candidate gesture.
+        self.pre_roll = pre_roll  # Frames before the start of motion to include in a candidate.
+        self.min_length = min_length  # Candidates shorter than this, once trimmed, are ignored.
+        self.max_variance = max_variance  # Matches further than this (per shared frame) are ignored. None for no limit.
+        self.tolerance = tolerance  # Times its iterations' variance a match may be from a gesture.
+        self.motion_fraction = motion_fraction  # Fraction of a gesture's own motion a match may be from it.
+        self.smoothing = smoothing  # Weight of the newest frame in the motion energy.
+
+        self.energy = 0.0
+        self.last_frame = None
+        self.last_gesture = None  # The most recently spotted PerformedGesture.
+        self.thresholds = None  # Each known gesture's threshold, and the templates they were worked out for.
+        self.threshold_templates = None
+        self.reset_candidate()
+
+    # Forgets the candidate gesture in progress.
+    def reset_candidate(self):
+        self.in_gesture = False
+        self.quiet_count = 0
+        self.length = 0  # Frames in the candidate gesture, including the pre-roll.
+
+    # Adds a frame from the stream.
+    # frame:  The readings.  Copied, since the window keeps frames after the sampler reuses them.
+    # Returns: The learned gesture matched when a candidate gesture ends, otherwise None.
+    def add_frame(self, frame):
+        frame = np.array(frame, dtype=np.float64)[:NUM_CHANNELS]
+        self.window.append(frame)
+        self.update_energy(frame)
+
+        if not self.in_gesture:
+            if self.energy > self.start_energy:
+                self.start_candidate()
+            return None
+
+        self.length += 1
+
+        if self.length >= self.window.maxlen:
+            # Too long to be a gesture; the user is just moving around.
+            self.reset_candidate()
+            return None
+
+        if self.energy < self.stop_energy:
+            self.quiet_count += 1
+        else:
+            self.quiet_count = 0
+
+        if self.quiet_count >= self.quiet_frames:
+            return self.end_candidate()
+
+        return None
+
+    # Updates the motion energy with the change in acceleration since the last frame.
+    def update_energy(self, frame):
+        if self.last_frame is not None:
+            change = ((frame[2:5] - self.last_frame[2:5]) ** 2).sum()
+            self.energy += self.smoothing * (change - self.energy)
+        self.last_frame = frame
+
+    # Starts a candidate gesture, including the frames just before the motion started.
+    def start_candidate(self):
+        self.in_gesture = True
+        self.length = min(len(self.window), self.pre_roll + 1)
+
+    # Ends the candidate gesture, and returns the known gesture it is closest to per shared
+    # frame, if that is within the gesture's threshold.
+    def end_candidate(self):
+        frames = self.trim(np.array(list(self.window)[-self.length:]))
+        self.reset_candidate()
+
+        templates = self.gesture_matcher.template_tensor
+        if len(frames) < self.min_length or templates.get_size() == 0:
+            return None
+        self.last_gesture = PerformedGesture([tuple(frame) for frame in frames])
+
+        shared_lengths = np.maximum(np.minimum(templates.lengths, len(frames)), 1)
+        variances = templates.total_variances(frames) / shared_lengths
+        row = int(variances.argmin())
+        if variances[row] > self.get_thresholds(templates)[row]:
+            return None
+
+        return templates.get_gesture(row)
+
+    # Returns a candidate's frames without the still frames at either end:  those whose change in
+    # acceleration from the frame next to them is below stop_energy.
+    def trim(self, frames):
+        changes = ((frames[1:, 2:5] - frames[:-1, 2:5]) ** 2).sum(axis=1)
+        moving = np.flatnonzero(changes >= self.stop_energy)
+        if len(moving) == 0:
+            return frames[:0]
+        return frames[moving[0]:moving[-1] + 2]
+
+    # Returns the threshold of each gesture in a TemplateTensor, working them out the first time.
+    def get_thresholds(self, templates):
+        if self.threshold_templates is not templates:
+            self.thresholds = np.array([self.calibrate(templates.get_gesture(row))
+                                        for row in range(0, templates.get_size())])
+            self.threshold_templates = templates
+        return self.thresholds
+
+    # Returns a gesture's threshold, in variance per shared frame (see the top of this file).
+    def calibrate(self, gesture):
+        frames = np.asarray(gesture.get_frames(), dtype=np.float64)[:, :NUM_CHANNELS]
+        if len(frames) == 0:
+            return 0.0
+
+        thresholds = [self.motion_fraction * ((frames - frames.mean(axis=0)) ** 2).sum(axis=1).mean()]
+        if self.max_variance is not None:
+            thresholds.append(self.max_variance)
+
+        iterations = [iteration for iteration in gesture.get_iterations() if len(iteration) > 0]
+        if len(iterations) >= 2:
+            spreads = []
+            for iteration in iterations:
+                shared_length = min(len(iteration), len(frames))
+                differences = np.asarray(iteration, dtype=np.float64)[:shared_length, :NUM_CHANNELS] - \
+                    frames[:shared_length]
+                spreads.append((differences ** 2).sum() / shared_length)
+            thresholds.append(self.tolerance * np.mean(spreads))
+
+        return min(thresholds)
+
+    # Returns the most recently spotted gesture's frames, as a PerformedGesture.
+    def get_last_gesture(self):
+        return self.last_gesture
@@ -0,0 +1,28 @@
+# Opens gestures files with the writer-reader that matches their format.
+
+from WriterReader import GestureWriterReader
+from BinaryGestureStore import migrate_text_gestures
+from GestureRepository import GestureRepository
+import os
+
+BINARY_EXTENSION = '.bin'
+
+
+# Returns a writer-reader for the given gestures file: a journaled repository
+# over a binary gestures file for .bin files, text otherwise.
+def open_gesture_store(gesture_file):
+    if gesture_file.endswith(BINARY_EXTENSION):
+        return GestureRepository(gesture_file)
+
+    return GestureWriterReader(gesture_file)
+
+
+# Converts the text gestures file to the binary gestures file, once.
+# Nothing is done if the binary file already exists or there is no text file.
+# Returns:  True if the gestures were converted.
+def migrate_if_needed(text_file, binary_file):
+    if os.path.isfile(binary_file) or not os.path.isfile(text_file):
+        return False
+
+    migrate_text_gestures(text_file, binary_file)
+    return True
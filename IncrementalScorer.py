@@ -0,0 +1,77 @@
+# This class scores a gesture against every known gesture one frame at a time, while the
+# gesture is still being performed.  It keeps running totals for both the variance and the
+# closest-count recognition, so either result is ready as soon as the last frame arrives,
+# no matter how long the gesture was.
+
+import numpy as np
+from TemplateTensor import NUM_CHANNELS
+
+
+class IncrementalScorer:
+
+    # template_tensor:  The known gestures to score against, packed into a TemplateTensor.
+    def __init__(self, template_tensor):
+        self.templates = template_tensor
+        self.length = 0  # Frames added so far.
+        self.last_frame = None
+        # Total variance of each known gesture from the frames so far.
+        self.total_variances = np.zeros(self.templates.get_size())
+        # Frames each known gesture was the closest for, per sensor reading.
+        self.closest_counts = np.zeros((self.templates.get_size(), NUM_CHANNELS))
+        # Total variation of each sensor reading within the frames so far.
+        self.self_variances = np.zeros(NUM_CHANNELS)
+
+    # Scores the next frame of the gesture.
+    def add_frame(self, frame):
+        frame = np.asarray(frame, dtype=np.float64)[:NUM_CHANNELS]
+        index = self.length
+        self.length += 1
+
+        if self.last_frame is not None:
+            self.self_variances += (frame - self.last_frame) ** 2
+        self.last_frame = frame
+
+        if index >= self.templates.get_max_length():
+            return  # Every known gesture has ended.
+
+        mask = self.templates.mask[:, index]
+        differences = (self.templates.frames[:, index, :] - frame) ** 2
+        self.total_variances += differences.sum(axis=1) * mask
+
+        # Gestures that have already ended are never closest.
+        differences[~mask] = np.inf
+        closest = differences.argmin(axis=0)
+        self.closest_counts[closest, np.arange(NUM_CHANNELS)] += 1
+
+    # Returns the number of frames scored so far.
+    def get_length(self):
+        return self.length
+
+    # Returns the total variance of each known gesture from the frames so far.
+    def get_total_variances(self):
+        return self.total_variances
+
+    # Returns the total variation of roll, pitch, X, Y and Z within the frames so far.
+    def get_self_variances(self):
+        return self.self_variances
+
+    # Returns the known gesture with the smallest total variance from the frames so far,
+    # as variance_recognition would.  None if no gestures are known.
+    def variance_recognition(self):
+        if self.templates.get_size() == 0:
+            return None
+
+        return self.templates.get_gesture(int(self.total_variances.argmin()))
+
+    # Returns the known gesture with the greatest weighted amount of closest readings,
+    # as greatest_closest_recognition would.  None if no gestures are known.
+    # Counts are weighted by each gesture's own channel weights.
+    def closest_recognition(self):
+        if self.templates.get_size() == 0:
+            return None
+
+        scores = (self.closest_counts * self.templates.weights).sum(axis=1)
+        # Penalize gestures longer than the frames so far for the frames they could not be closest for.
+        scores -= np.maximum(self.templates.lengths - self.length, 0)
+
+        return self.templates.get_gesture(int(scores.argmax()))
@@ -0,0 +1,157 @@
+# This class describes a KD-tree:  a spatial index over keyed points (feature vectors), which
+# finds the points nearest a query without measuring the distance to every point.
+#
+# Each branch of the tree splits its points in two at the median of the dimension they are most
+# spread along, until at most leaf_size points are left in a leaf.  Points can be inserted and
+# removed one at a time:  an insert goes to the leaf it falls in, which is split once it grows
+# too big, and a removal just takes the point out of its leaf.  Once the tree has changed by
+# as many points as it holds, it is rebuilt from scratch, so it stays balanced.
+
+import heapq
+import numpy as np
+
+
+class KDNode(object):
+    __slots__ = ('axis', 'split', 'left', 'right', 'keys')
+
+    # A leaf holding the given keys.  Branches have keys set to None.
+    def __init__(self, keys):
+        self.axis = None  # The dimension the node splits its points along.
+        self.split = None  # Points below split go left, the rest go right.
+        self.left = None
+        self.right = None
+        self.keys = keys
+
+
+class KDTree:
+
+    # dimensions:  The number of dimensions of every point.
+    # leaf_size:  The most points a leaf holds after it is split.
+    def __init__(self, dimensions, leaf_size=16):
+        self.dimensions = dimensions
+        self.leaf_size = leaf_size
+        self.points = {}  # Key -> point.
+        self.leaves = {}  # Key -> the leaf holding it.
+        self.root = KDNode([])
+        self.changes = 0  # Points inserted or removed since the tree was last built.
+
+    # Returns the number of points in the tree.
+    def get_size(self):
+        return len(self.points)
+
+    # Returns whether a point with the given key is in the tree.
+    def contains(self, key):
+        return key in self.points
+
+    # Replaces every point in the tree with the given points, and builds a balanced tree over them.
+    # items:  A list of (key, point) pairs.
+    def build(self, items):
+        self.points = dict((key, np.asarray(point, dtype=np.float64)) for key, point in items)
+        self.rebuild()
+
+    # Builds a balanced tree over the points already in the tree.
+    def rebuild(self):
+        self.leaves = {}
+        self.root = self.build_node(list(self.points.keys()))
+        self.changes = 0
+
+    # Returns a node holding the given keys, split until its leaves are small enough.
+    def build_node(self, keys):
+        node = KDNode(keys)
+        for key in keys:
+            self.leaves[key] = node
+
+        if len(keys) > self.leaf_size:
+            self.split_leaf(node)
+            if node.keys is None:
+                node.left = self.build_node(node.left.keys)
+                node.right = self.build_node(node.right.keys)
+
+        return node
+
+    # Splits a leaf into two leaves at the median of the dimension its points are most spread along.
+    # The leaf is left as it is if all of its points are the same.
+    def split_leaf(self, node):
+        points = np.array([self.points[key] for key in node.keys])
+        spreads = points.max(axis=0) - points.min(axis=0)
+        axis = int(spreads.argmax())
+        if spreads[axis] == 0:
+            return
+
+        values = points[:, axis]
+        split = float(np.median(values))
+        if not (values < split).any():
+            # Too many points at the median:  split just above it instead.
+            split = float(values[values > split].min())
+
+        node.axis = axis
+        node.split = split
+        node.left = KDNode([key for key, value in zip(node.keys, values) if value < split])
+        node.right = KDNode([key for key, value in zip(node.keys, values) if value >= split])
+        node.keys = None
+
+        for child in (node.left, node.right):
+            for key in child.keys:
+                self.leaves[key] = child
+
+    # Inserts a point, replacing any point with the same key.
+    def insert(self, key, point):
+        if key in self.points:
+            self.remove(key)
+
+        self.points[key] = np.asarray(point, dtype=np.float64)
+        node = self.root
+        while node.keys is None:
+            node = node.left if self.points[key][node.axis] < node.split else node.right
+        node.keys.append(key)
+        self.leaves[key] = node
+
+        if len(node.keys) > 2 * self.leaf_size:
+            self.split_leaf(node)
+        self.record_change()
+
+    # Removes the point with the given key, if there is one.
+    def remove(self, key):
+        if key not in self.points:
+            return
+
+        self.leaves.pop(key).keys.remove(key)
+        del self.points[key]
+        self.record_change()
+
+    # Counts a change to the tree, and rebuilds it once it has changed by as many points as it holds.
+    def record_change(self):
+        self.changes += 1
+        if self.changes > max(len(self.points), self.leaf_size):
+            self.rebuild()
+
+    # Returns the k points nearest the query point, nearest first.
+    # Returns:  A list of up to k (distance, key) pairs.
+    def nearest(self, query, k=1):
+        query = np.asarray(query, dtype=np.float64)
+        best = []  # Heap of (-squared distance, key) of the nearest points found so far.
+        self.search(self.root, query, k, best)
+
+        return [(np.sqrt(-distance), key) for distance, key in sorted(best, reverse=True)]
+
+    # Adds the points under node that are nearer the query than the furthest of the best k found so far.
+    def search(self, node, query, k, best):
+        if node.keys is not None:
+            if not node.keys:
+                return
+            points = np.array([self.points[key] for key in node.keys])
+            distances = ((points - query) ** 2).sum(axis=1)
+            for distance, key in zip(distances, node.keys):
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, key))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, key))
+            return
+
+        difference = query[node.axis] - node.split
+        near, far = (node.left, node.right) if difference < 0 else (node.right, node.left)
+        self.search(near, query, k, best)
+
+        # Points across the split are at least this far away.
+        if len(best) < k or difference ** 2 < -best[0][0]:
+            self.search(far, query, k, best)
@@ -1,52 +1,70 @@
 # A class defining a learned gesture for BlueMote.
 # A LearnedGesture is one that is stored on the system.
-import subprocess
-
-class LearnedGesture:
-
-    def __init__(self, name, frames, action, attempts, successes, iterations):
-        self.frames = frames # Readings defining the gesture
+# Frames are kept as a single (frames x readings) array of 32-bit floats, rather than a list of
+# tuples, and __slots__ leaves out the per-object dictionary, so thousands of gestures and their
+# iterations can be loaded without much memory.
+from ActionExecutor import get_executor
+from Resampling import resample_frames, average_frames, RESAMPLED_LENGTH
+from ChannelWeights import self_variances, channel_weights
+from Metrics import timed
+import numpy as np
+
+FRAME_TYPE = np.float32  # Type of a sensor reading.
+NUM_READINGS = 5  # Roll, pitch, X, Y, and Z in every frame.
+MAX_ITERATIONS = 10  # The most past iterations kept for each gesture.
+
+
+class LearnedGesture(object):
+    __slots__ = ('name', 'frames', 'action', 'attempts', 'successes', 'iterations', 'resampled', 'weights')
+
+    # weights:  The gesture's channel weights, if already known.  Worked out from the frames if not.
+    def __init__(self, name, frames, action, attempts, successes, iterations, weights=None):
+        self.frames = as_frames(frames) # Readings defining the gesture
         self.name = name  # Human readable name for identification.
         self.action = action  # The action to be taken when this gesture is performed.
         self.attempts = attempts       # The number of times this gesture was recognized.
         self.successes = successes      # The number of times this gesture was successfully attempted.
-        self.iterations = iterations # Past frames of iterations of the gesture.
-        self.gesture = (self.name, self.frames, self.action, self.attempts, self.successes, self.iterations)
+        self.iterations = [as_frames(frames) for frames in iterations] # Past frames of iterations of the gesture.
+        self.resampled = None  # The frames resampled to RESAMPLED_LENGTH frames, once worked out.
+        # How much each of roll, pitch, X, Y, and Z matters to the gesture.  (See ChannelWeights.)
+        if weights is None:
+            weights = channel_weights(self_variances(self.frames))
+        self.weights = np.asarray(weights, dtype=np.float64)
 
     # Returns the roll at the given frame index.
     def get_roll(self, index):
         if index >= len(self.frames):
             print "LearnedGesture.get_roll: Error.  Index out of bounds."
             return
-        return self.frames[index][0]
+        return self.frames[index, 0]
 
     # Returns the pitch at the given frame index.
     def get_pitch(self, index):
         if index >= len(self.frames):
             print "LearnedGesture.get_pitch: Error.  Index out of bounds."
             return
-        return self.frames[index][1]
+        return self.frames[index, 1]
 
     # Returns the x coordinate at the given frame index.
     def get_X(self, index):
         if index >= len(self.frames):
             print "LearnedGesture.get_x: Error.  Index out of bounds."
             return
-        return self.frames[index][2]
+        return self.frames[index, 2]
 
     # Returns the y coordinate at the given frame index.
     def get_Y(self, index):
         if index >= len(self.frames):
             print "LearnedGesture.get_y: Error.  Index out of bounds."
             return
-        return self.frames[index][3]
+        return self.frames[index, 3]
 
     # Returns the z coordinate at the given frame index.
     def get_Z(self, index):
         if index >= len(self.frames):
             print "LearnedGesture.get_z: Error.  Index out of bounds."
             return
-        return self.frames[index][4]
+        return self.frames[index, 4]
 
     # Returns the name of the gesture.
     def get_name(self):
@@ -74,46 +92,61 @@ class LearnedGesture:
     def get_iterations(self):
         return self.iterations
 
-    # Returns the tuple that contains the gesture name and frames.
+    # Returns the weights of roll, pitch, X, Y, and Z, by how much each changes within the gesture.
+    def get_weights(self):
+        return self.weights
+
+    # Returns the frames resampled to RESAMPLED_LENGTH frames, the length every gesture is compared at
+    # in resampled recognition.  Worked out once, and again only after the frames change.
+    def get_resampled(self):
+        if self.resampled is None:
+            self.resampled = as_frames(resample_frames(self.frames, RESAMPLED_LENGTH))
+        return self.resampled
+
+    # Returns the tuple that contains the gesture name and frames, as it is written to a gestures file.
+    # Built when asked for, rather than every time the gesture changes.
     def get_gesture(self):
-        return self.gesture
+        return self.name, self.frames, self.action, self.attempts, self.successes, self.iterations
+
+    # Returns a copy of this gesture that can be changed without changing this one.
+    # Frames are shared, since they are replaced rather than changed in place.
+    def copy(self):
+        gesture = LearnedGesture(self.name, self.frames, list(self.action), self.attempts, self.successes,
+                                 list(self.iterations), self.weights)
+        gesture.resampled = self.resampled
+        return gesture
 
     # Sets the action for this gesture.
     def set_action(self, action):
         self.action = action
-        self.gesture = (self.name, self.frames, self.action, self.attempts, self.successes, self.iterations)
 
-    # Calls the action assigned with this Gesture.
+    # Calls the action assigned with this Gesture.  The action runs on the action executor,
+    # which waits for it to finish, so this returns right away.
     def call_action(self):
         if self.action == ['None'] or self.action == []:
             return
         else:
-            subprocess.Popen(self.action)
+            get_executor().submit(self.name, self.action)
 
     # Increments the amount of attempts for this gesture
     def incr_attempts(self):
         self.attempts += 1
-        self.gesture = (self.name, self.frames, self.action, self.attempts, self.successes, self.iterations)
 
     # Increments the amount of successes for this gesture
     def incr_successes(self):
         self.successes += 1
-        self.gesture = (self.name, self.frames, self.action, self.attempts, self.successes, self.iterations)
 
     # Sets the number of attempts to num_attempts for this gesture
     def set_attempts(self, num_attempts):
         self.attempts = num_attempts
-        self.gesture = (self.name, self.frames, self.action, self.attempts, self.successes, self.iterations)
 
     # Sets the number of successes to num_successes for this gesture.
     def set_successes(self, num_successes):
         self.successes = num_successes
-        self.gesture = (self.name, self.frames, self.action, self.attempts, self.successes, self.iterations)
 
     def reset_stats(self):
         self.set_attempts(0)
         self.set_successes(0)
-        self.gesture = (self.name, self.frames, self.action, self.attempts, self.successes, self.iterations)
 
     def get_attempts(self):
         return self.attempts
@@ -121,56 +154,69 @@ class LearnedGesture:
     def get_successes(self):
         return self.successes
 
-    # Appends an array of frames to the list of iterations, up to 20.
-    # removes first iteration at 20th iteration.
+    # Appends an array of frames to the list of iterations, up to MAX_ITERATIONS.
+    # removes first iteration once there are MAX_ITERATIONS iterations.
     def append_iteration(self, frames):
-        # If 20 iterations in the list, remove the first
-        if len(self.iterations) >= 10:
+        # If MAX_ITERATIONS iterations in the list, remove the first
+        if len(self.iterations) >= MAX_ITERATIONS:
             self.iterations.pop(0)
-        # Append the new frames to the end of the list.
-        self.iterations.append(frames)
+        # Append a copy of the new frames to the end of the list, since performed
+        # frames may be a view of a capture buffer that is reused.
+        self.iterations.append(np.array(frames, dtype=FRAME_TYPE).reshape(-1, NUM_READINGS))
 
     # Takes iterations of a gesture, and averages them frame-by-frame.
     # i.e., average first frame readings, average second frame readings, etc.
+    # Every iteration is first resampled to the length of the gesture, so none are cut short.
     def average_gesture(self):
-        min_length = float('inf')
-
-        # Find the shortest of the gestures for indexing purposes.
-        for frames in self.iterations:
-            if len(frames) < min_length:
-                min_length = len(frames)
+        min_length = min(len(frames) for frames in self.iterations)
 
         if min_length == 0:
             print "Error:  A gesture had no length.  Exiting."
             exit(1)
 
-        avg_frames = []
-
-        for i in range(0, min_length):
-            roll_sum = 0.0
-            pitch_sum = 0.0
-            acc_x_sum = 0.0
-            acc_y_sum = 0.0
-            acc_z_sum = 0.0
-            for j in range (0, len(self.iterations)):
-                # Sum the sensor readings at t = i
-                roll_sum += self.iterations[j][i][0]   # Roll reading for this frame
-                pitch_sum += self.iterations[j][i][1]  # Pitch reading for this frame
-                acc_x_sum += self.iterations[j][i][2]  # X accelerometer
-                acc_y_sum += self.iterations[j][i][3]  # Y accelerometer
-                acc_z_sum += self.iterations[j][i][4]  # Z accelerometer
-
-            # Append the average of each of these to the gesture average.
-            avg_frames.append( (roll_sum/len(self.iterations),
-                               pitch_sum/len(self.iterations),
-                               acc_x_sum/len(self.iterations),
-                               acc_y_sum/len(self.iterations),
-                               acc_z_sum/len(self.iterations) ))
-
         # Return the point-by-point average of the frames.
-        return avg_frames
+        return average_frames(self.iterations, self.get_length() or None)
+
+    # Adds a new iteration of the gesture, and updates the gesture's frames to the average of its
+    # iterations.  The frames are taken to be the average of the stored iterations already, so only
+    # the new iteration, and the iteration it replaces, are resampled to the gesture's length and
+    # added to (or taken from) the average.  Takes time linear in the gesture's length, however
+    # many iterations are stored.
+    # decay:  If given, the frames become an exponential moving average instead, moving this
+    # fraction of the way towards the new iteration.
+    @timed('update_and_average')
+    def update_and_average(self, frames, decay=None):
+        if len(frames) == 0:
+            print "LearnedGesture.update_and_average: Error.  The iteration has no length."
+            return
+        if self.get_length() == 0:
+            self.append_iteration(frames)
+            self.set_frames(self.iterations[-1])  # The copy, not the capture buffer's view.
+            return
+
+        average = self.frames.astype(np.float64)
+        new_frames = resample_frames(frames, self.get_length())
+        num_iterations = len(self.iterations)
+
+        if decay is not None:
+            average += decay * (new_frames - average)
+        elif num_iterations >= MAX_ITERATIONS:
+            # The new iteration replaces the oldest one in the average.
+            average += (new_frames - resample_frames(self.iterations[0], self.get_length())) / num_iterations
+        else:
+            average += (new_frames - average) / (num_iterations + 1)
 
-    #
-    def update_and_average(self, frames):
         self.append_iteration(frames)
-        self.frames = self.average_gesture()
\ No newline at end of file
+        self.set_frames(average)
+
+    # Replaces the gesture's frames, and works out its channel weights again.
+    def set_frames(self, frames):
+        self.frames = as_frames(frames)
+        self.resampled = None
+        self.weights = channel_weights(self_variances(self.frames))
+
+
+# Returns frames as a (frames x readings) array of readings.  Frames that are already
+# such an array (e.g. a view of a gestures file) are used as they are, without copying.
+def as_frames(frames):
+    return np.asarray(frames, dtype=FRAME_TYPE).reshape(-1, NUM_READINGS)
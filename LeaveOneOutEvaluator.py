@@ -0,0 +1,191 @@
+# This class measures how well each way of recognizing gestures recognizes the gestures in a
+# gestures file, using the iterations stored with every gesture as labelled performances.
+#
+# Each iteration is held out in turn:  its gesture is averaged again from its other iterations,
+# as when it was taught, and the held-out iteration is recognized among that gesture and every
+# other known gesture, by every matcher.  Gestures with fewer than two iterations are still known,
+# but none of their iterations are held out.  The held-out iterations are spread across a pool of
+# processes, so the evaluation uses every core.
+#
+# Usage:  python LeaveOneOutEvaluator.py <gestures file> [--methods variance,...] [--processes N]
+#                                        [--output results.json]
+
+from RecognitionBenchmark import MATCHERS
+from GestureStore import open_gesture_store
+from GestureMatcher import GestureMatcher
+from GestureList import GestureList
+from LearnedGesture import LearnedGesture
+from PerformedGesture import PerformedGesture
+from Clock import monotonic
+from collections import OrderedDict
+import multiprocessing
+import getopt
+import json
+import sys
+
+# Every matcher that recognizes a gesture.  (The evaluation function only weights one.)
+METHODS = [name for name in MATCHERS if name != 'evaluation']
+NO_MATCH = '(none)'  # Recorded when a matcher recognizes nothing.
+
+# The gestures of the file being evaluated, loaded once in each worker process.
+worker_gestures = None
+
+
+# Worker process initializer:  Loads the gestures to evaluate.
+def load_gestures(gestures_file):
+    global worker_gestures
+    worker_gestures = open_gesture_store(gestures_file).get_learned_gestures()
+
+
+# Holds out one iteration of one gesture, and recognizes it with each method.  Run in a worker process.
+# fold:  (index of the gesture, index of its iteration to hold out, names of the methods).
+# Returns:  (the gesture's name, [(method, name of the gesture recognized, seconds taken)], seconds to build the matcher).
+def evaluate_fold(fold):
+    gesture_index, iteration_index, methods = fold
+    held_out = worker_gestures[gesture_index]
+    iterations = held_out.get_iterations()
+
+    # Average the gesture again without the held-out iteration.
+    others = [frames for i, frames in enumerate(iterations) if i != iteration_index]
+    template = LearnedGesture(held_out.get_name(), held_out.get_frames(), held_out.get_action(), 0, 0, others)
+    template.set_frames(template.average_gesture())
+    vocabulary = worker_gestures[:gesture_index] + [template] + worker_gestures[gesture_index + 1:]
+
+    start = monotonic()
+    matcher = GestureMatcher(GestureList(vocabulary))
+    build_seconds = monotonic() - start
+
+    performed_gesture = PerformedGesture(iterations[iteration_index])
+    recognitions = []
+    for method in methods:
+        start = monotonic()
+        matched_gesture = MATCHERS[method](matcher, performed_gesture)
+        seconds = monotonic() - start
+        recognitions.append((method, NO_MATCH if matched_gesture is None else matched_gesture.get_name(), seconds))
+
+    return held_out.get_name(), recognitions, build_seconds
+
+
+class LeaveOneOutEvaluator:
+
+    # methods:  Names of the matchers to evaluate (see RecognitionBenchmark.MATCHERS).
+    # processes:  Worker processes to spread the evaluation over.  One per core if not given.
+    def __init__(self, gestures_file, methods=None, processes=None):
+        self.gestures_file = gestures_file
+        self.methods = methods if methods is not None else METHODS
+        self.processes = processes if processes is not None else multiprocessing.cpu_count()
+        self.gestures = open_gesture_store(gestures_file).get_learned_gestures()
+
+    # Returns every (gesture index, iteration index) that can be held out.
+    def get_folds(self):
+        folds = []
+        for g_index, g in enumerate(self.gestures):
+            if len(g.get_iterations()) < 2:
+                continue
+            for i in range(0, len(g.get_iterations())):
+                folds.append((g_index, i))
+        return folds
+
+    # Holds out every iteration, and recognizes it with every method.
+    # Returns:  A dict of, per method, the number held out and recognized correctly, the seconds spent
+    # recognizing, and the confusion matrix (gesture performed -> gesture recognized -> count),
+    # along with the number of iterations held out and the time the evaluation took.
+    def evaluate(self):
+        folds = [(g_index, i, self.methods) for g_index, i in self.get_folds()]
+        names = [g.get_name() for g in self.gestures]
+
+        results = OrderedDict()
+        for method in self.methods:
+            results[method] = {'correct': 0, 'total': 0, 'seconds': 0.0,
+                               'confusion': OrderedDict((name, {}) for name in names)}
+
+        start = monotonic()
+        build_seconds = 0.0
+        if len(folds) > 0:
+            pool = multiprocessing.Pool(self.processes, load_gestures, (self.gestures_file,))
+            try:
+                chunk_size = max(1, len(folds) // (self.processes * 4))
+                for name, recognitions, seconds in pool.imap_unordered(evaluate_fold, folds, chunk_size):
+                    build_seconds += seconds
+                    for method, matched_name, seconds in recognitions:
+                        result = results[method]
+                        result['total'] += 1
+                        result['seconds'] += seconds
+                        if matched_name == name:
+                            result['correct'] += 1
+                        confusion = result['confusion'][name]
+                        confusion[matched_name] = confusion.get(matched_name, 0) + 1
+            finally:
+                pool.terminate()
+
+        return {'gestures_file': self.gestures_file, 'held_out': len(folds), 'processes': self.processes,
+                'wall_seconds': monotonic() - start, 'build_seconds': build_seconds, 'methods': results}
+
+    # Prints the accuracy and time of every method, and its confusion matrix.
+    def print_results(self, evaluation):
+        print "Held out " + str(evaluation['held_out']) + " iteration(s) of " + str(len(self.gestures)) + \
+              " gesture(s) on " + str(evaluation['processes']) + " process(es) in " + \
+              "%.2f" % evaluation['wall_seconds'] + "s."
+        if evaluation['held_out'] == 0:
+            print "No gesture has two or more iterations to hold out."
+            return
+
+        print "\n" + "Method".ljust(18) + "Accuracy".rjust(10) + "Correct".rjust(9) + "Seconds".rjust(10) + \
+              "Mean (ms)".rjust(11)
+        for method, result in evaluation['methods'].items():
+            print method.ljust(18) + ("%.3f" % (result['correct'] / float(result['total']))).rjust(10) + \
+                  (str(result['correct']) + "/" + str(result['total'])).rjust(9) + \
+                  ("%.3f" % result['seconds']).rjust(10) + ("%.3f" % (result['seconds'] / result['total'] * 1000)).rjust(11)
+
+        for method, result in evaluation['methods'].items():
+            self.print_confusion(method, result['confusion'])
+
+    # Prints a confusion matrix:  a row per gesture performed, a column per gesture recognized.
+    def print_confusion(self, method, confusion):
+        columns = list(confusion.keys())
+        if any(NO_MATCH in row for row in confusion.values()):
+            columns.append(NO_MATCH)
+        width = max(8, min(15, max(len(name) for name in columns) + 1))
+
+        print "\n" + method + " (rows:  performed, columns:  recognized)"
+        print "".ljust(width) + "".join(name[:width - 1].rjust(width) for name in columns)
+        for name, row in confusion.items():
+            if sum(row.values()) == 0:
+                continue
+            print name[:width - 1].ljust(width) + "".join(str(row.get(column, 0)).rjust(width) for column in columns)
+
+
+def main(argv):
+    try:
+        options, arguments = getopt.gnu_getopt(argv, '', ['methods=', 'processes=', 'output='])
+    except getopt.GetoptError as e:
+        print "Error:  " + str(e)
+        return 1
+    options = dict(options)
+    if len(arguments) != 1:
+        print "Usage: python LeaveOneOutEvaluator.py <gestures file> [--methods variance,...] [--processes N] " \
+              "[--output results.json]"
+        return 1
+
+    methods = None
+    if '--methods' in options:
+        methods = [name for name in options['--methods'].split(',') if name]
+        for name in methods:
+            if name not in METHODS:
+                print "Error:  No method named " + name + ".  Choose from " + ', '.join(METHODS) + "."
+                return 1
+    processes = int(options['--processes']) if '--processes' in options else None
+
+    evaluator = LeaveOneOutEvaluator(arguments[0], methods, processes)
+    evaluation = evaluator.evaluate()
+    evaluator.print_results(evaluation)
+
+    if '--output' in options:
+        with open(options['--output'], 'w') as f:
+            json.dump(evaluation, f, indent=1)
+        print "\nSaved results to " + options['--output'] + "."
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
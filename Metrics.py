@@ -0,0 +1,216 @@
+# This class times the stages of the program that stand between releasing B and a gesture's action
+# starting, and counts how often things happen, so it can be seen where the time goes.
+#
+# Each stage's times are kept in a rolling histogram of its latest window times, from which its
+# median, 95th and 99th percentiles are read.  Stages are timed with a with-block:
+#
+#     with get_metrics().time('recognition'):
+#         ...
+#
+# or, for a whole method, with the timed decorator:
+#
+#     @timed('update_and_average')
+#     def update_and_average(self, frames, decay=None):
+#
+# Metrics are off unless turned on.  When off, time hands back one shared timer that does
+# nothing, and count and record return straight away, so the timers cost next to nothing.
+# When on, the metrics can be written to a file every few seconds by a background thread.
+
+from Clock import monotonic
+from collections import deque
+import threading
+import json
+import time
+
+# The metrics every stage is timed with.
+default_metrics = None
+
+
+# Returns the metrics every stage is timed with, creating them (off) the first time.
+def get_metrics():
+    global default_metrics
+    if default_metrics is None:
+        default_metrics = Metrics(False)
+    return default_metrics
+
+
+# Sets the metrics every stage is timed with.
+def set_metrics(metrics):
+    global default_metrics
+    default_metrics = metrics
+
+
+# Returns a decorator that times every call of a function as the given stage.
+def timed(name):
+    def decorator(function):
+        def timed_function(*arguments, **keywords):
+            metrics = get_metrics()
+            if not metrics.enabled:
+                return function(*arguments, **keywords)
+            with Timer(metrics, name):
+                return function(*arguments, **keywords)
+
+        timed_function.__name__ = function.__name__
+        timed_function.__doc__ = function.__doc__
+        return timed_function
+    return decorator
+
+
+class Metrics:
+
+    # enabled:  Whether to keep metrics at all.
+    # window:  How many of each stage's latest times its histogram keeps.
+    def __init__(self, enabled=True, window=1000):
+        self.enabled = enabled
+        self.window = window
+        self.histograms = {}  # Stage name -> RollingHistogram.
+        self.counters = {}  # Counter name -> count.
+        self.lock = threading.Lock()
+        self.dump_thread = None
+        self.stopping = threading.Event()
+
+    def is_enabled(self):
+        return self.enabled
+
+    # Returns a timer for a with-block, which records how long the block took under the stage's name.
+    def time(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name)
+
+    # Records that a stage took the given number of seconds.
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, RollingHistogram(self.window))
+        histogram.add(seconds)
+
+    # Adds to a counter.
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    # Returns every stage's times and every counter, as a dict that can be saved as JSON.
+    def snapshot(self):
+        with self.lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+
+        stages = {}
+        for name, histogram in histograms.items():
+            stages[name] = histogram.summary()
+        return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'stages': stages, 'counters': counters}
+
+    # Prints every stage's times, in milliseconds, and every counter.
+    def print_metrics(self):
+        if not self.enabled:
+            return
+
+        snapshot = self.snapshot()
+        print "   Stage".ljust(34) + "Count".ljust(9) + "p50 (ms)".ljust(11) + "p95 (ms)".ljust(11) + \
+              "p99 (ms)".ljust(11) + "Max (ms)".ljust(11)
+        for name, summary in sorted(snapshot['stages'].items()):
+            print "   " + name.ljust(31) + str(summary['count']).ljust(9) + \
+                  ("%.3f" % (summary['p50'] * 1000)).ljust(11) + ("%.3f" % (summary['p95'] * 1000)).ljust(11) + \
+                  ("%.3f" % (summary['p99'] * 1000)).ljust(11) + ("%.3f" % (summary['max'] * 1000)).ljust(11)
+
+        if len(snapshot['counters']) > 0:
+            print "\n   Counter".ljust(34) + "Count"
+            for name, count in sorted(snapshot['counters'].items()):
+                print "   " + name.ljust(31) + str(count)
+
+    # Appends the metrics to a file, as one JSON record per line.
+    def dump(self, metrics_file):
+        try:
+            with open(metrics_file, 'a') as f:
+                f.write(json.dumps(self.snapshot(), sort_keys=True) + '\n')
+        except (IOError, OSError) as e:
+            print "Metrics.dump: Error.  Could not write metrics: " + str(e)
+
+    # Appends the metrics to a file every interval seconds, until stopped.
+    def start_dumping(self, metrics_file, interval=60.0):
+        if not self.enabled or self.dump_thread is not None:
+            return
+
+        self.stopping.clear()
+        self.dump_thread = threading.Thread(target=self.dump_loop, args=(metrics_file, interval))
+        self.dump_thread.daemon = True
+        self.dump_thread.start()
+
+    # Dump loop:  Dumps every interval until stopped, and once more when stopped.
+    def dump_loop(self, metrics_file, interval):
+        while not self.stopping.is_set():
+            self.stopping.wait(interval)
+            self.dump(metrics_file)
+
+    # Stops dumping the metrics, after dumping them one last time.
+    def stop_dumping(self):
+        if self.dump_thread is None:
+            return
+        self.stopping.set()
+        self.dump_thread.join()
+        self.dump_thread = None
+
+
+# Keeps the latest window times of a stage.
+class RollingHistogram:
+
+    def __init__(self, window):
+        self.times = deque(maxlen=window)
+        self.count = 0  # Times ever added, including ones since rolled out of the window.
+
+    def add(self, seconds):
+        self.times.append(seconds)
+        self.count += 1
+
+    # Returns the time below which the given percentage of the times in the window fall.
+    def percentile(self, times, q):
+        if len(times) == 0:
+            return 0.0
+        index = min(len(times) - 1, int(round(q / 100.0 * (len(times) - 1))))
+        return times[index]
+
+    # Returns the number of times added, and the median, 95th and 99th percentile, and largest time in the window.
+    def summary(self):
+        times = sorted(self.times)
+        return {'count': self.count, 'p50': self.percentile(times, 50), 'p95': self.percentile(times, 95),
+                'p99': self.percentile(times, 99), 'max': times[-1] if len(times) > 0 else 0.0}
+
+
+# Times a with-block.
+class Timer(object):
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = monotonic()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.metrics.record(self.name, monotonic() - self.start)
+        return False
+
+
+# A timer that does nothing, handed out while metrics are off.
+class NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        return False
+
+
+NULL_TIMER = NullTimer()
@@ -1,47 +1,52 @@
 # A class defining a performed gesture for BlueMote
 # Differs from a LearnedGesture in that it has no name or action --
 # just movement data.
+from LearnedGesture import as_frames
+from Resampling import resample_frames, RESAMPLED_LENGTH
 
 
-class PerformedGesture:
-    def __init__(self, frames):
-        self.frames = frames  # Readings defining the gesture
-        self.gesture = self.frames
+class PerformedGesture(object):
+    __slots__ = ('frames', 'timestamps')
+
+    # timestamps:  Seconds on the monotonic clock when each frame was read, if known.
+    def __init__(self, frames, timestamps=None):
+        self.frames = as_frames(frames)  # Readings defining the gesture.  May be a view of a CaptureBuffer.
+        self.timestamps = timestamps
 
     # Returns the roll at the given frame index.
     def get_roll(self, index):
         if index >= len(self.frames):
             print "PerformedGesture.get_roll: Error.  Index out of bounds."
             return
-        return self.frames[index][0]
+        return self.frames[index, 0]
 
     # Returns the pitch at the given frame index.
     def get_pitch(self, index):
         if index >= len(self.frames):
             print "PerformedGesture.get_pitch: Error.  Index out of bounds."
             return
-        return self.frames[index][1]
+        return self.frames[index, 1]
 
     # Returns the x coordinate at the given frame index.
     def get_X(self, index):
         if index >= len(self.frames):
             print "PerformedGesture.get_x: Error.  Index out of bounds."
             return
-        return self.frames[index][2]
+        return self.frames[index, 2]
 
     # Returns the y coordinate at the given frame index.
     def get_Y(self, index):
         if index >= len(self.frames):
             print "PerformedGesture.get_y: Error.  Index out of bounds."
             return
-        return self.frames[index][3]
+        return self.frames[index, 3]
 
     # Returns the z coordinate at the given frame index.
     def get_Z(self, index):
         if index >= len(self.frames):
             print "PerformedGesture.get_z: Error.  Index out of bounds."
             return
-        return self.frames[index][4]
+        return self.frames[index, 4]
 
     # Returns a full frame
     def get_frame(self, index):
@@ -58,6 +63,21 @@ class PerformedGesture:
     def get_length(self):
         return len(self.frames)
 
+    # Returns the times each frame was read, or None if they aren't known.
+    def get_timestamps(self):
+        return self.timestamps
+
+    # Returns the seconds from the first frame to the last, or None if the frames weren't timed.
+    def get_duration(self):
+        if self.timestamps is None or len(self.timestamps) == 0:
+            return None
+        return self.timestamps[-1] - self.timestamps[0]
+
+    # Returns the frames resampled to RESAMPLED_LENGTH frames, the length every gesture is
+    # compared at in resampled recognition.
+    def get_resampled(self):
+        return as_frames(resample_frames(self.frames, RESAMPLED_LENGTH))
+
     # Returns the tuple that contains the gesture name and frames.
     def get_gesture(self):
-        return self.gesture
+        return self.frames
@@ -0,0 +1,76 @@
+# This class writes changes to disk on a background thread, so that the program never waits on
+# a file while reading the Wiimote.  Each change is submitted as a write to run later, under a key
+# naming what it writes (a gesture, or the statistics file).  A write submitted under a key that
+# already has one waiting replaces it, so a gesture changed many times between flushes is only
+# written once.  Writes run in the order their keys were last submitted, every interval seconds,
+# when flush is called, and at shutdown.
+
+from Metrics import get_metrics
+from collections import OrderedDict
+import threading
+import atexit
+
+# The worker used by the gesture registry and GeStat.
+default_worker = None
+
+
+# Returns the worker used to save gestures and statistics, creating it the first time.
+def get_persistence_worker():
+    global default_worker
+    if default_worker is None:
+        default_worker = PersistenceWorker()
+        # Save anything still waiting if the program exits without shutting the worker down.
+        atexit.register(default_worker.shutdown)
+    return default_worker
+
+
+class PersistenceWorker:
+
+    # interval:  Seconds between flushes.
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.pending = OrderedDict()  # Key -> (function, arguments) of the writes waiting to run.
+        self.lock = threading.Lock()  # Guards pending.
+        self.flush_lock = threading.Lock()  # Held while writes run, so they never overlap.
+        self.stopping = threading.Event()
+
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    # Submits a write to run later.  Replaces any write waiting under the same key.
+    def submit(self, key, function, *arguments):
+        with self.lock:
+            self.pending.pop(key, None)
+            self.pending[key] = (function, arguments)
+
+    # Returns whether any writes are waiting.
+    def has_pending(self):
+        with self.lock:
+            return len(self.pending) > 0
+
+    # Runs every write waiting, and returns once they are done.
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                writes = self.pending.values()
+                self.pending = OrderedDict()
+
+            for function, arguments in writes:
+                try:
+                    with get_metrics().time('persist'):
+                        function(*arguments)
+                except (IOError, OSError) as e:
+                    print "PersistenceWorker.flush: Error.  Could not save changes: " + str(e)
+
+    # Worker loop:  Flushes every interval until shut down.
+    def run(self):
+        while not self.stopping.is_set():
+            self.stopping.wait(self.interval)
+            self.flush()
+
+    # Stops the worker, and saves anything still waiting.
+    def shutdown(self):
+        self.stopping.set()
+        self.thread.join()
+        self.flush()
@@ -0,0 +1,209 @@
+# Measures how each way of recognizing gestures scales with the number of known gestures and their
+# length, on made-up gestures (see SyntheticGestures).  For every matcher, vocabulary size, and
+# gesture length, it times each call, and reports latency percentiles, throughput, how often the
+# performed gesture was recognized, and the process's peak memory.  Every case runs in a process
+# of its own, so one case's memory doesn't count against the next.
+#
+# Results are saved as JSON, along with the commit and settings they were measured with, so runs
+# on different commits can be compared with --compare.
+#
+# Usage:  python RecognitionBenchmark.py [options]
+#   --sizes 10,100,1000,10000   Numbers of known gestures.
+#   --lengths 20,200,2000       Gesture lengths, in frames.
+#   --matchers variance,...     Matchers to measure (see MATCHERS).  All but dtw by default.
+#   --calls 50                  Gestures recognized per case.
+#   --max-frames 2000000        Cases with more known frames than this (size x length) are skipped.
+#   --noise 0.05 --time-warp 0.2 --amplitude 0.2 --seed 0   How the gestures are made up.
+#   --output benchmark.json     Where to save the results.
+#   --compare old.json          Results to compare against.
+
+from SyntheticGestures import SyntheticGestures
+from GestureList import GestureList
+from GestureMatcher import GestureMatcher
+from Clock import monotonic
+from collections import OrderedDict
+import multiprocessing
+import subprocess
+import resource
+import platform
+import getopt
+import json
+import time
+import sys
+import os
+import numpy as np
+
+# Each matcher, as a function of the GestureMatcher and a performed gesture.
+MATCHERS = OrderedDict([
+    ('variance', lambda matcher, gesture: matcher.variance_recognition(gesture)),
+    ('closest', lambda matcher, gesture: matcher.greatest_closest_recognition(gesture)),
+    ('evaluation', lambda matcher, gesture: matcher.evaluation_function(gesture)),
+    ('resampled', lambda matcher, gesture: matcher.resampled_recognition(gesture)),
+    ('features', lambda matcher, gesture: matcher.feature_recognition(gesture)),
+    ('cascade_variance', lambda matcher, gesture: matcher.cascade_variance_recognition(gesture)),
+    ('dtw', lambda matcher, gesture: matcher.dtw_recognition(gesture)),
+])
+DEFAULT_MATCHERS = [name for name in MATCHERS if name != 'dtw']  # DTW is much slower than the rest:  only when asked for.
+PERCENTILES = (50, 90, 99)
+
+
+# Returns the highest memory the process has used so far, in kilobytes.
+def peak_memory():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Measures one matcher on one vocabulary.  Run in a process of its own.
+# case:  A dict of the matcher's name, the vocabulary size and gesture length, the number of calls,
+# and the settings of the made-up gestures.
+# Returns:  A dict of the case and its measurements.
+def run_case(case):
+    start_memory = peak_memory()
+    generator = SyntheticGestures(case['noise'], case['time_warp'], case['amplitude'], case['seed'])
+    vocabulary = generator.make_vocabulary(case['size'], case['length'])
+    performances = generator.make_performances(vocabulary, case['calls'])
+
+    start = monotonic()
+    matcher = GestureMatcher(GestureList(vocabulary))
+    build_seconds = monotonic() - start
+
+    recognize = MATCHERS[case['matcher']]
+    recognize(matcher, performances[0][1])  # Once first, so the timings leave out one-off setup.
+
+    latencies = []
+    num_correct = 0
+    for name, performed_gesture in performances:
+        start = monotonic()
+        matched = recognize(matcher, performed_gesture)
+        latencies.append(monotonic() - start)
+        if getattr(matched, 'get_name', None) is not None and matched.get_name() == name:
+            num_correct += 1
+
+    result = dict(case)
+    result['build_seconds'] = build_seconds
+    result['mean_seconds'] = float(np.mean(latencies))
+    result['max_seconds'] = float(np.max(latencies))
+    for q in PERCENTILES:
+        result['p' + str(q) + '_seconds'] = float(np.percentile(latencies, q))
+    result['calls_per_second'] = len(latencies) / sum(latencies) if sum(latencies) > 0 else None
+    # The evaluation function only weights a gesture, so it has no accuracy.
+    result['accuracy'] = None if case['matcher'] == 'evaluation' else num_correct / float(len(performances))
+    result['peak_memory_kb'] = peak_memory()
+    result['added_memory_kb'] = peak_memory() - start_memory
+    return result
+
+
+# Runs every case, each in a new process.
+# Returns:  The results of the cases, in order.
+def run_cases(cases):
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    results = []
+    try:
+        for case in cases:
+            result = pool.apply(run_case, (case,))
+            print_result(result)
+            results.append(result)
+    finally:
+        pool.terminate()
+    return results
+
+
+# Returns the cases for every matcher, vocabulary size, and gesture length, and the (size, length)
+# pairs skipped for having more than max_frames known frames.
+def make_cases(matchers, sizes, lengths, calls, max_frames, settings):
+    cases = []
+    skipped = []
+    for size in sizes:
+        for length in lengths:
+            if size * length > max_frames:
+                skipped.append((size, length))
+                continue
+            for name in matchers:
+                case = {'matcher': name, 'size': size, 'length': length, 'calls': calls}
+                case.update(settings)
+                cases.append(case)
+    return cases, skipped
+
+
+# Returns the commit of the code being measured, or None if it can't be found.
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_header():
+    print "Matcher".ljust(18) + "Gestures".rjust(9) + "Frames".rjust(8) + "p50 (ms)".rjust(11) + \
+          "p99 (ms)".rjust(11) + "Calls/s".rjust(10) + "Accuracy".rjust(10) + "Peak MB".rjust(9)
+
+
+def print_result(result):
+    accuracy = "-" if result['accuracy'] is None else "%.2f" % result['accuracy']
+    calls_per_second = "-" if result['calls_per_second'] is None else "%.1f" % result['calls_per_second']
+    print result['matcher'].ljust(18) + str(result['size']).rjust(9) + str(result['length']).rjust(8) + \
+          ("%.3f" % (result['p50_seconds'] * 1000)).rjust(11) + ("%.3f" % (result['p99_seconds'] * 1000)).rjust(11) + \
+          calls_per_second.rjust(10) + accuracy.rjust(10) + ("%.1f" % (result['peak_memory_kb'] / 1024.0)).rjust(9)
+
+
+# Prints how the median latency of every case changed since an earlier run.
+def compare_results(results, old_run):
+    old_results = dict(((r['matcher'], r['size'], r['length']), r) for r in old_run['results'])
+    print "\nCompared with " + str(old_run.get('commit')) + " (new p50 / old p50):"
+    for result in results:
+        old_result = old_results.get((result['matcher'], result['size'], result['length']))
+        if old_result is None or old_result['p50_seconds'] == 0:
+            continue
+        print result['matcher'].ljust(18) + str(result['size']).rjust(9) + str(result['length']).rjust(8) + \
+              ("%.2fx" % (result['p50_seconds'] / old_result['p50_seconds'])).rjust(11)
+
+
+def parse_list(value, convert):
+    return [convert(item) for item in value.split(',') if item]
+
+
+def main(argv):
+    try:
+        options, arguments = getopt.gnu_getopt(argv, '', ['sizes=', 'lengths=', 'matchers=', 'calls=', 'max-frames=',
+                                                          'noise=', 'time-warp=', 'amplitude=', 'seed=', 'output=',
+                                                          'compare='])
+    except getopt.GetoptError as e:
+        print "Error:  " + str(e)
+        return 1
+    options = dict(options)
+
+    sizes = parse_list(options.get('--sizes', '10,100,1000,10000'), int)
+    lengths = parse_list(options.get('--lengths', '20,200,2000'), int)
+    matchers = parse_list(options.get('--matchers', ','.join(DEFAULT_MATCHERS)), str)
+    for name in matchers:
+        if name not in MATCHERS:
+            print "Error:  No matcher named " + name + ".  Choose from " + ', '.join(MATCHERS) + "."
+            return 1
+    calls = int(options.get('--calls', 50))
+    max_frames = int(options.get('--max-frames', 2000000))
+    settings = {'noise': float(options.get('--noise', 0.05)), 'time_warp': float(options.get('--time-warp', 0.2)),
+                'amplitude': float(options.get('--amplitude', 0.2)), 'seed': int(options.get('--seed', 0))}
+    output_file = options.get('--output', 'benchmark.json')
+
+    cases, skipped = make_cases(matchers, sizes, lengths, calls, max_frames, settings)
+    for size, length in skipped:
+        print "Skipping " + str(size) + " gestures of " + str(length) + " frames (more than --max-frames)."
+
+    print_header()
+    results = run_cases(cases)
+
+    run = {'commit': current_commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+           'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.platform(),
+           'settings': settings, 'max_frames': max_frames, 'skipped': skipped, 'results': results}
+    with open(output_file, 'w') as f:
+        json.dump(run, f, indent=1, sort_keys=True)
+    print "\nSaved results to " + output_file + "."
+
+    if '--compare' in options:
+        with open(options['--compare']) as f:
+            compare_results(results, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+# This class recognizes performed gestures on a pool of worker threads, so that when several
+# remotes are in use, one remote's slow match never holds up another's.  Gestures are submitted
+# with the remote that performed them, and the results are collected with get_results, which
+# never waits.
+#
+# The GestureMatcher replaces its packed gestures rather than changing them when gestures change,
+# so a recognition already under way keeps working on the gestures it started with.
+
+from Clock import monotonic
+import threading
+import Queue
+
+
+class RecognitionPool:
+
+    # recognize:  A function that takes a PerformedGesture and returns the matched gesture, or None.
+    # num_workers:  How many gestures may be recognized at once.
+    def __init__(self, recognize, num_workers=4):
+        self.recognize = recognize
+        self.jobs = Queue.Queue()
+        self.results = Queue.Queue()
+
+        self.workers = []
+        for i in range(0, num_workers):
+            worker = threading.Thread(target=self.work)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    # Recognizes a gesture performed on the given remote, on a worker.
+    def submit(self, remote_index, performed_gesture):
+        self.jobs.put((remote_index, performed_gesture))
+
+    # Worker loop:  Recognizes gestures until told to stop.
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+
+            remote_index, performed_gesture = job
+            start = monotonic()
+            try:
+                matched_gesture = self.recognize(performed_gesture)
+            except Exception as e:
+                print "RecognitionPool: Error.  Could not recognize a gesture from remote " + \
+                      str(remote_index + 1) + ": " + str(e)
+                matched_gesture = None
+            self.results.put((remote_index, performed_gesture, matched_gesture, monotonic() - start))
+
+    # Returns the gestures recognized since the last call, without waiting for any still being recognized.
+    # Returns:  A list of (remote index, performed gesture, matched gesture or None, seconds taken) tuples.
+    def get_results(self):
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except Queue.Empty:
+                return results
+
+    # Stops the workers once the gestures already submitted have been recognized.
+    # wait:  Whether to wait for those gestures to be recognized.
+    def shutdown(self, wait=False):
+        for worker in self.workers:
+            self.jobs.put(None)
+
+        if wait:
+            for worker in self.workers:
+                worker.join()
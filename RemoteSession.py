@@ -0,0 +1,53 @@
+# This class keeps the capture state of one connected remote, so that several remotes can each
+# perform gestures at the same time.  update is given each of the remote's samples from the
+# sampling thread:  holding B captures a gesture into the remote's own capture buffer, and
+# releasing B hands back the captured gesture.
+
+from WiimoteDriver import get_driver
+from CaptureBuffer import CaptureBuffer
+from PerformedGesture import PerformedGesture
+
+
+class RemoteSession:
+
+    # remote_index:  The remote's position in the array of remotes.
+    # frame_freq:  Only every frame_freq-th frame is captured.
+    # button:  The bitmask of each button, by name.  The driver's if not given.
+    def __init__(self, remote_index, frame_freq, button=None):
+        self.remote_index = remote_index
+        self.frame_freq = frame_freq
+        self.b_button = (button if button is not None else get_driver().button)['B']
+        self.capture_buffer = CaptureBuffer()
+        self.capturing = False  # Whether B is held and a gesture is being captured.
+        self.frame_count = 0  # Frames seen since B was pressed.
+
+    # Returns the remote's position in the array of remotes (0 for the first remote).
+    def get_remote_index(self):
+        return self.remote_index
+
+    # Drops any gesture part way through being captured.
+    def reset(self):
+        self.capturing = False
+        self.frame_count = 0
+
+    # Reads one of the remote's samples.
+    # Returns:  The gesture performed, once B is released.  None otherwise.
+    def update(self, sample):
+        if not self.capturing and sample.is_held(self.b_button):
+            self.capturing = True
+            self.frame_count = 0
+            self.capture_buffer.reset()
+
+        if self.capturing and sample.is_held(self.b_button):
+            # Only add every nth frame to the gesture.
+            if self.frame_count % self.frame_freq == 0:
+                self.capture_buffer.append(sample.get_frame(), sample.get_timestamp())
+            self.frame_count += 1
+
+        if self.capturing and sample.is_released(self.b_button):
+            self.capturing = False
+            # Copy the frames out of the buffer, which the remote's next gesture overwrites.
+            return PerformedGesture(self.capture_buffer.get_frames().copy(),
+                                    self.capture_buffer.get_timestamps().copy())
+
+        return None
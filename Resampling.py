@@ -0,0 +1,38 @@
+# Functions for putting gestures performed at different speeds on a common time base, by
+# resampling their frames to a given number of frames with linear interpolation.
+
+import numpy as np
+
+# The number of frames every gesture is resampled to for resampled recognition, however
+# long B was held and however many frames were skipped while capturing it.
+RESAMPLED_LENGTH = 64
+
+
+# Returns frames resampled to length frames, as a (length x readings) array.
+# The first and last frames are kept; frames in between are interpolated linearly.
+def resample_frames(frames, length):
+    frames = np.asarray(frames, dtype=np.float64)
+    if len(frames) == length:
+        return frames
+    if len(frames) == 0:
+        return np.zeros((length,) + frames.shape[1:])
+    if len(frames) == 1:
+        return np.repeat(frames, length, axis=0)
+
+    positions = np.linspace(0, len(frames) - 1, length)
+    before = np.minimum(positions.astype(np.int64), len(frames) - 2)
+    fraction = (positions - before)[:, np.newaxis]
+    return frames[before] * (1 - fraction) + frames[before + 1] * fraction
+
+
+# Returns the frame-by-frame average of several iterations of a gesture, after resampling
+# each to length frames.  The average length of the iterations if length isn't given.
+def average_frames(iterations, length=None):
+    if length is None:
+        length = int(round(np.mean([len(frames) for frames in iterations])))
+
+    total = np.zeros((length, np.shape(iterations[0])[1]))
+    for frames in iterations:
+        total += resample_frames(frames, length)
+
+    return total / len(iterations)
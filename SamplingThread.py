@@ -0,0 +1,163 @@
+# This class polls the remotes on a thread of its own, at a fixed rate, so that nothing else has
+# to spin polling them.  Each report is taken as a Sample:  the remote's buttons and readings,
+# stamped with the time on a monotonic clock.  Samples are handed over through a bounded queue;
+# if a consumer falls behind, the oldest samples are dropped.  Consumers block on get, so the
+# program uses next to no CPU while it waits.
+#
+# Each remote's readings are read straight into a preallocated ring of frames, twice as long as the
+# queue, so polling allocates no arrays.  A sample's frame is a view of its row in the ring, and is
+# overwritten once max_samples more reports have been read from the remote after it was taken:
+# copy frames before keeping them (CaptureBuffer.append does).
+
+from WiimoteDriver import get_driver
+from FrameReader import FrameReader
+from Clock import monotonic
+from Metrics import get_metrics
+from TemplateTensor import NUM_CHANNELS
+import numpy as np
+import threading
+import Queue
+import time
+
+# Seconds a consumer waits on the queue at a time.  A get waiting on the queue with no timeout
+# can't be interrupted with Ctrl-C on Python 2, so consumers always wait in slices this long.
+WAIT_SLICE = 0.1
+
+
+class Sample(object):
+    __slots__ = ('remote_index', 'timestamp', 'btns', 'btns_held', 'btns_released', 'frame')
+
+    def __init__(self, remote_index, timestamp, btns, btns_held, btns_released, frame):
+        self.remote_index = remote_index  # The remote's position in the array of remotes.
+        self.timestamp = timestamp  # Seconds on the monotonic clock when the remote was read.
+        self.btns = btns  # Bitmasks of the buttons down, held since the last report, and released.
+        self.btns_held = btns_held
+        self.btns_released = btns_released
+        self.frame = frame  # The readings:  roll, pitch, x, y, z.  A view of the sampler's ring of frames.
+
+    def get_remote_index(self):
+        return self.remote_index
+
+    def get_timestamp(self):
+        return self.timestamp
+
+    def get_frame(self):
+        return self.frame
+
+    # The button tests below match wiiuse's, for the buttons as they were when sampled.
+    def is_pressed(self, btn):
+        return (self.btns & btn) == btn
+
+    def is_held(self, btn):
+        return (self.btns_held & btn) == btn
+
+    def is_just_pressed(self, btn):
+        return self.is_pressed(btn) and not self.is_held(btn)
+
+    def is_released(self, btn):
+        return (self.btns_released & btn) == btn
+
+    # Returns the button that was just pressed, or None.
+    def get_pressed_button(self):
+        for btn_name, btn in get_driver().button.items():
+            if self.is_just_pressed(btn):
+                return btn
+
+
+class SamplingThread:
+
+    # rate:  Polls per second.
+    # max_samples:  The most samples kept waiting for consumers.
+    # driver:  The WiimoteDriver to poll the remotes with.  The default driver if not given.
+    def __init__(self, wiimotes, num_motes, rate=100, max_samples=256, driver=None):
+        self.driver = driver if driver is not None else get_driver()
+        self.wiimotes = wiimotes
+        self.num_motes = num_motes
+        self.interval = 1.0 / rate
+        self.samples = Queue.Queue(max_samples)
+        self.readers = [FrameReader(wiimotes[i][0]) for i in range(0, num_motes)]
+        # Each remote's ring of frames, and the row its next frame is read into.
+        self.frames = [np.zeros((2 * max_samples, NUM_CHANNELS), dtype=reader.get_dtype()) for reader in self.readers]
+        self.heads = [0] * num_motes
+        self.stopping = threading.Event()
+        self.finished = threading.Event()  # Set once the driver has no more reports, and all are queued.
+        self.thread = None
+        self.num_dropped = 0
+
+    # Starts polling.
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    # Stops polling, and waits for the thread to finish.
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # Returns the next sample, or None if none arrives within timeout seconds, or none ever will
+    # (a replayed trace has ended, and every sample from it has been taken).
+    # timeout:  Seconds to wait.  None to wait until a sample arrives.
+    def get(self, timeout=None):
+        while True:
+            try:
+                return self.samples.get(True, WAIT_SLICE if timeout is None else timeout)
+            except Queue.Empty:
+                if timeout is not None or self.is_finished():
+                    return None
+
+    # Returns whether there will be no more samples:  a replayed trace has ended, and every sample
+    # from it has been taken.
+    def is_finished(self):
+        return self.finished.is_set() and self.samples.empty()
+
+    # Drops every sample waiting, e.g. before starting to capture a gesture.
+    def clear(self):
+        while True:
+            try:
+                self.samples.get_nowait()
+            except Queue.Empty:
+                return
+
+    # Polling loop:  Polls every interval seconds, on a fixed schedule, until stopped.
+    def run(self):
+        metrics = get_metrics()
+        next_poll = monotonic()
+        while not self.stopping.is_set():
+            with metrics.time('poll'):
+                polled = self.driver.poll(self.wiimotes, self.num_motes)
+            if polled != 0:
+                timestamp = monotonic()
+                for i in range(0, self.num_motes):
+                    remote = self.wiimotes[i][0]
+                    # A remote's event is WIIUSE_NONE (0) when a poll had nothing from it.
+                    if getattr(remote, 'event', 1) != 0:
+                        frame = self.readers[i].read(self.frames[i][self.heads[i]])
+                        self.heads[i] = (self.heads[i] + 1) % len(self.frames[i])
+                        self.put(Sample(i, timestamp, remote.btns, remote.btns_held, remote.btns_released, frame))
+            if self.driver.is_finished():
+                self.finished.set()
+
+            next_poll += self.interval
+            delay = next_poll - monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_poll = monotonic()  # Fell behind:  don't try to catch up.
+
+    # Queues a sample, dropping the oldest if the queue is full.
+    def put(self, sample):
+        while True:
+            try:
+                self.samples.put_nowait(sample)
+                return
+            except Queue.Full:
+                try:
+                    self.samples.get_nowait()
+                    self.num_dropped += 1
+                    get_metrics().count('samples_dropped')
+                except Queue.Empty:
+                    pass
@@ -0,0 +1,235 @@
+# This driver stands in for real remotes by replaying a trace of their reports, so the whole
+# program runs, and can be load tested and profiled, on a machine with no remote or Bluetooth.
+#
+# A trace is a file of JSON records, one report per line:
+#   {"time": 0.01, "remote": 0, "buttons": ["B"], "orient": [roll, pitch, yaw], "gforce": [x, y, z]}
+# time is seconds from the start of the trace, and buttons are the buttons down, by name (or as a
+# bitmask).  Which buttons were held and released is worked out from the remote's previous report.
+# Traces are replayed at speed times real time.  Each poll gives each remote at most one report,
+# so a slow poller falls behind the trace rather than skipping reports.  When a trace ends, the
+# program gives up whatever it was waiting for (a gesture, a confirmation), saving nothing
+# half done, and exits from its main prompt.
+#
+# TraceRecorder records a trace from any driver, e.g. from real remotes, for replaying later.
+
+from WiimoteDriver import WiimoteDriver, BUTTONS
+from Clock import monotonic
+import json
+
+
+class Orientation(object):
+    __slots__ = ('roll', 'pitch', 'yaw')
+
+    def __init__(self):
+        self.roll = 0.0
+        self.pitch = 0.0
+        self.yaw = 0.0
+
+
+class GForce(object):
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self):
+        self.x = 0.0
+        self.y = 0.0
+        self.z = 0.0
+
+
+class SimulatedRemote(object):
+    __slots__ = ('event', 'btns', 'btns_held', 'btns_released', 'orient', 'gforce')
+
+    def __init__(self):
+        self.event = 0
+        self.btns = 0
+        self.btns_held = 0
+        self.btns_released = 0
+        self.orient = Orientation()
+        self.gforce = GForce()
+
+
+class SimulatedDriver(WiimoteDriver):
+
+    # records:  The trace's records, as read by read_trace.
+    # speed:  How many times faster than real time to replay the trace.
+    def __init__(self, records, speed=1.0):
+        if speed <= 0:
+            raise ValueError("SimulatedDriver: speed must be positive.")
+
+        self.records = sorted(records, key=lambda record: record['time'])
+        self.speed = speed
+        self.next_record = 0  # The position in the trace of the next report to give.
+        self.start = None  # When the first poll was made.
+
+    def init(self, num_motes):
+        return [[SimulatedRemote()] for i in range(0, num_motes)]
+
+    def find(self, wiimotes, num_motes, timeout):
+        return num_motes
+
+    def connect(self, wiimotes, num_motes):
+        return num_motes
+
+    # Gives each remote its next report, if the trace has reached it.
+    def poll(self, wiimotes, num_motes):
+        now = monotonic()
+        if self.start is None:
+            self.start = now
+        trace_time = (now - self.start) * self.speed
+
+        for i in range(0, num_motes):
+            wiimotes[i][0].event = 0
+
+        num_events = 0
+        while self.next_record < len(self.records):
+            record = self.records[self.next_record]
+            remote_index = record.get('remote', 0)
+            if record['time'] > trace_time:
+                break
+            if remote_index < num_motes and wiimotes[remote_index][0].event != 0:
+                break  # This remote already has a report this poll.
+
+            self.next_record += 1
+            if remote_index < num_motes:
+                apply_record(wiimotes[remote_index][0], record)
+                num_events += 1
+
+        return num_events
+
+    def is_finished(self):
+        return self.next_record >= len(self.records)
+
+    # A trace is replayed at its own pace, not the program's:  while the program pauses (its
+    # prompts and sleeps are not sped up), later reports are queued before it waits for them.
+    # Each press in a trace was meant for the program, so none are dropped.
+    def drops_stale_presses(self):
+        return False
+
+
+class TraceRecorder(WiimoteDriver):
+
+    # driver:  The driver to record the reports of.
+    # trace_file:  The file to write the trace to.
+    def __init__(self, driver, trace_file):
+        self.driver = driver
+        self.button = driver.button
+        self.trace = open(trace_file, 'w')
+        self.start = None
+
+    def init(self, num_motes):
+        return self.driver.init(num_motes)
+
+    def find(self, wiimotes, num_motes, timeout):
+        return self.driver.find(wiimotes, num_motes, timeout)
+
+    def connect(self, wiimotes, num_motes):
+        return self.driver.connect(wiimotes, num_motes)
+
+    # Polls the driver, and writes the report of every remote that had something new.
+    def poll(self, wiimotes, num_motes):
+        num_events = self.driver.poll(wiimotes, num_motes)
+        if num_events == 0:
+            return num_events
+
+        now = monotonic()
+        if self.start is None:
+            self.start = now
+        for i in range(0, num_motes):
+            remote = wiimotes[i][0]
+            if getattr(remote, 'event', 1) != 0:
+                record = make_record(now - self.start, i, button_names(remote.btns, self.button),
+                                     (remote.orient.roll, remote.orient.pitch, remote.orient.yaw),
+                                     (remote.gforce.x, remote.gforce.y, remote.gforce.z))
+                self.trace.write(json.dumps(record) + '\n')
+        return num_events
+
+    def set_leds(self, wm, remote_index):
+        self.driver.set_leds(wm, remote_index)
+
+    def motion_sensing(self, wm, enabled):
+        self.driver.motion_sensing(wm, enabled)
+
+    def set_ir(self, wm, enabled):
+        self.driver.set_ir(wm, enabled)
+
+    def disconnect(self, wm):
+        self.driver.disconnect(wm)
+        self.trace.flush()
+
+    def is_finished(self):
+        return self.driver.is_finished()
+
+    def drops_stale_presses(self):
+        return self.driver.drops_stale_presses()
+
+    def is_pressed(self, remote, btn):
+        return self.driver.is_pressed(remote, btn)
+
+    def is_held(self, remote, btn):
+        return self.driver.is_held(remote, btn)
+
+    def is_just_pressed(self, remote, btn):
+        return self.driver.is_just_pressed(remote, btn)
+
+    def is_released(self, remote, btn):
+        return self.driver.is_released(remote, btn)
+
+    def using_acc(self, remote):
+        return self.driver.using_acc(remote)
+
+
+# Sets a simulated remote's buttons and readings to a trace record's.
+def apply_record(remote, record):
+    btns = button_mask(record.get('buttons', 0))
+    remote.btns_held = remote.btns & btns
+    remote.btns_released = remote.btns & ~btns
+    remote.btns = btns
+    remote.event = 1
+
+    orient = record.get('orient')
+    if orient is not None:
+        remote.orient.roll, remote.orient.pitch, remote.orient.yaw = orient
+    gforce = record.get('gforce')
+    if gforce is not None:
+        remote.gforce.x, remote.gforce.y, remote.gforce.z = gforce
+
+
+# Returns the bitmask of the buttons in a record:  a list of button names, or a bitmask already.
+def button_mask(buttons):
+    if isinstance(buttons, (int, long)):
+        return buttons
+
+    btns = 0
+    for btn_name in buttons:
+        btns |= BUTTONS[btn_name]
+    return btns
+
+
+# Returns the names of the buttons in a bitmask.
+def button_names(btns, button=BUTTONS):
+    return sorted(btn_name for btn_name, btn in button.items() if (btns & btn) == btn)
+
+
+# Returns a trace record.
+# orient:  (roll, pitch, yaw).
+# gforce:  (x, y, z).
+def make_record(time, remote_index, buttons, orient, gforce):
+    return {'time': time, 'remote': remote_index, 'buttons': list(buttons),
+            'orient': [float(reading) for reading in orient],
+            'gforce': [float(reading) for reading in gforce]}
+
+
+# Returns the records of a trace file.
+def read_trace(trace_file):
+    records = []
+    with open(trace_file) as trace:
+        for line in trace:
+            if line.strip():
+                records.append(json.loads(line))
+    return records
+
+
+# Writes records to a trace file.
+def write_trace(records, trace_file):
+    with open(trace_file, 'w') as trace:
+        for record in records:
+            trace.write(json.dumps(record) + '\n')
@@ -0,0 +1,78 @@
+# This class makes up gestures, for measuring recognition without anyone performing them.
+#
+# Each made-up gesture is a smooth random curve on every sensor reading:  a sum of a few sine
+# waves of random frequency and phase, within the readings' ranges.  Performances of a gesture
+# are made from it the way a person's repetitions differ:  played back unevenly in time (time
+# warp), with each reading's movement larger or smaller (amplitude), and with sensor noise.
+# Given the same seed, the same gestures and performances are made every time.
+
+import numpy as np
+from LearnedGesture import LearnedGesture
+from PerformedGesture import PerformedGesture
+from Resampling import resample_frames
+from TemplateTensor import NUM_CHANNELS
+
+# The largest magnitude of each of roll, pitch, X, Y, and Z that made-up gestures reach.
+CHANNEL_RANGES = (90.0, 90.0, 3.0, 3.0, 3.0)
+NUM_WAVES = 3  # Sine waves summed to make each reading of a gesture.
+
+
+class SyntheticGestures:
+
+    # noise:  Standard deviation of the sensor noise, as a fraction of each reading's range.
+    # time_warp:  How unevenly performances are played back:  up to this fraction faster or slower
+    # at any point, and up to this fraction longer or shorter overall.
+    # amplitude:  Up to this fraction larger or smaller a movement each reading of a performance makes.
+    # seed:  Seeds the random numbers, so the same gestures are made every time.
+    def __init__(self, noise=0.05, time_warp=0.2, amplitude=0.2, seed=0):
+        self.noise = noise
+        self.time_warp = time_warp
+        self.amplitude = amplitude
+        self.random = np.random.RandomState(seed)
+        self.ranges = np.array(CHANNEL_RANGES)
+
+    # Returns the (length x readings) frames of a new made-up gesture.
+    def make_frames(self, length):
+        t = np.linspace(0, 1, length)[:, np.newaxis, np.newaxis]
+        frequencies = self.random.uniform(0.5, 3, (NUM_WAVES, NUM_CHANNELS))
+        phases = self.random.uniform(0, 2 * np.pi, (NUM_WAVES, NUM_CHANNELS))
+        weights = self.random.uniform(-1, 1, (NUM_WAVES, NUM_CHANNELS))
+
+        waves = (weights * np.sin(2 * np.pi * frequencies * t + phases)).sum(axis=1)
+        return waves / NUM_WAVES * self.ranges
+
+    # Returns the frames of one performance of a gesture's frames.
+    def perform_frames(self, frames):
+        frames = np.asarray(frames, dtype=np.float64)
+        length = max(2, int(round(len(frames) * (1 + self.random.uniform(-self.time_warp, self.time_warp)))))
+
+        # Play the gesture back unevenly:  the speed along it varies smoothly, but it always moves forwards.
+        speeds = 1 + self.time_warp * np.sin(2 * np.pi * (self.random.uniform(0.5, 2) * np.linspace(0, 1, length) +
+                                                          self.random.uniform(0, 1)))
+        positions = np.cumsum(speeds)
+        positions = (positions - positions[0]) / (positions[-1] - positions[0]) * (len(frames) - 1)
+        fine = resample_frames(frames, len(frames) * 4)
+        performed = fine[np.minimum(np.round(positions * 4).astype(np.int64), len(fine) - 1)]
+
+        performed = performed * (1 + self.random.uniform(-self.amplitude, self.amplitude, NUM_CHANNELS))
+        performed += self.random.normal(0, 1, performed.shape) * self.noise * self.ranges
+        return performed
+
+    # Returns a vocabulary of num_gestures made-up learned gestures, each length frames long,
+    # named 'synthetic0', 'synthetic1', and so on.
+    def make_vocabulary(self, num_gestures, length):
+        vocabulary = []
+        for i in range(0, num_gestures):
+            frames = self.make_frames(length)
+            vocabulary.append(LearnedGesture('synthetic' + str(i), frames, ['true'], 0, 0, [frames]))
+        return vocabulary
+
+    # Returns num_performances performances of gestures picked at random from the vocabulary,
+    # as a list of (name of the gesture performed, PerformedGesture) pairs.
+    def make_performances(self, vocabulary, num_performances):
+        performances = []
+        for i in range(0, num_performances):
+            gesture = vocabulary[self.random.randint(len(vocabulary))]
+            performances.append((gesture.get_name(), PerformedGesture(self.perform_frames(gesture.get_frames()))))
+        return performances
+
@@ -0,0 +1,218 @@
+# This class packs the known LearnedGestures into a single padded NumPy array,
+# so that the GestureMatcher can compare a performed gesture against every
+# learned gesture at once, rather than one gesture and one frame at a time.
+
+import numpy as np
+from Resampling import RESAMPLED_LENGTH
+
+NUM_CHANNELS = 5  # Roll, pitch, X, Y and Z readings in every frame.
+BLOCK_SIZE = 8  # Frames averaged into each frame of the coarse (piecewise aggregate) gestures.
+
+
+class TemplateTensor:
+
+    # frames:  The gestures' frames, already packed.  Packed from the gestures if not given.
+    def __init__(self, gestures, frames=None):
+        self.gestures = list(gestures)  # The learned gestures, in the order they were given.
+        self.names = [g.get_name() for g in self.gestures]
+        self.lengths = np.array([g.get_length() for g in self.gestures], dtype=np.int64)
+
+        max_length = int(self.lengths.max()) if len(self.gestures) > 0 else 0
+        if frames is None:
+            frames = np.zeros((len(self.gestures), max_length, NUM_CHANNELS))
+            for row, g in enumerate(self.gestures):
+                pack_gesture(frames, row, g)
+
+        # (gestures x frames x channels) readings, zero padded past the end of each gesture.
+        # No longer than the longest gesture, so some gesture has a frame at every index.
+        self.frames = frames[:, :max_length]
+
+        # True where a gesture actually has a frame at that index.
+        self.mask = np.arange(self.frames.shape[1])[np.newaxis, :] < self.lengths[:, np.newaxis]
+
+        # Each gesture's channel weights, (gestures x channels).
+        self.weights = np.zeros((len(self.gestures), NUM_CHANNELS))
+        for row, g in enumerate(self.gestures):
+            self.weights[row] = g.get_weights()[:NUM_CHANNELS]
+
+        # Every gesture resampled to RESAMPLED_LENGTH frames, flattened into one row per gesture,
+        # and the squared length of each row.  (Each gesture keeps its own resampled frames, so
+        # only changed gestures are resampled again.)
+        self.resampled = np.zeros((len(self.gestures), RESAMPLED_LENGTH * NUM_CHANNELS))
+        for row, g in enumerate(self.gestures):
+            self.resampled[row] = g.get_resampled()[:, :NUM_CHANNELS].ravel()
+        self.resampled_norms = (self.resampled ** 2).sum(axis=1)
+
+        # Every gesture averaged over blocks of BLOCK_SIZE frames (its piecewise aggregate
+        # approximation), and the number of whole blocks in each gesture.
+        # Blocks past the end of a gesture are zeroed, and the running total of the squared
+        # averages kept, so the coarse comparison is mostly a single matrix-vector product.
+        self.coarse_lengths = self.lengths // BLOCK_SIZE
+        coarse_mask = np.arange(self.frames.shape[1] // BLOCK_SIZE)[np.newaxis, :] < self.coarse_lengths[:, np.newaxis]
+        self.coarse_frames = block_means(self.frames) * coarse_mask[:, :, np.newaxis]
+        self.coarse_square_totals = np.zeros((len(self.gestures), coarse_mask.shape[1] + 1))
+        self.coarse_square_totals[:, 1:] = (self.coarse_frames ** 2).sum(axis=2).cumsum(axis=1)
+
+        # Running totals of each gesture's squared readings, (gestures x frames + 1), for comparing
+        # batches of gestures at once.  Worked out the first time a batch is compared.
+        self.square_totals = None
+
+    # Returns a tensor with the given gesture packed in place of the gesture of the same name,
+    # or added at the end if there is none.  Only that gesture is packed again.  This tensor is
+    # left as it is, so anything still scoring against it is not disturbed.
+    def with_gesture(self, gesture):
+        gestures = list(self.gestures)
+        if gesture.get_name() in self.names:
+            row = self.names.index(gesture.get_name())
+            gestures[row] = gesture
+        else:
+            row = len(gestures)
+            gestures.append(gesture)
+
+        max_length = max(self.get_max_length(), gesture.get_length())
+        frames = np.zeros((len(gestures), max_length, NUM_CHANNELS))
+        frames[:self.get_size(), :self.get_max_length()] = self.frames
+        frames[row] = 0.0
+        pack_gesture(frames, row, gesture)
+
+        return TemplateTensor(gestures, frames)
+
+    # Returns a tensor without the gesture by the given name.  This tensor is left as it is.
+    def without_gesture(self, g_name):
+        if g_name not in self.names:
+            return self
+
+        row = self.names.index(g_name)
+        gestures = self.gestures[:row] + self.gestures[row + 1:]
+        return TemplateTensor(gestures, np.delete(self.frames, row, axis=0))
+
+    # Returns the number of gestures packed into the tensor.
+    def get_size(self):
+        return len(self.gestures)
+
+    # Returns the length of the longest packed gesture, in frames.
+    def get_max_length(self):
+        return self.frames.shape[1]
+
+    # Returns the gesture at the given row of the tensor.
+    def get_gesture(self, row):
+        return self.gestures[row]
+
+    # Returns the squared difference of every packed frame from the performed frames,
+    # covering only the frame indices both could possibly share.
+    # rows:  The rows of the gestures to compare, or None for every gesture.
+    # Returns: (squared differences, mask), shaped (gestures x frames x channels) and (gestures x frames).
+    def squared_differences(self, performed_frames, rows=None):
+        frames, mask = self.frames, self.mask
+        if rows is not None:
+            frames, mask = frames[rows], mask[rows]
+
+        length = min(len(performed_frames), self.get_max_length())
+        performed = np.asarray(performed_frames, dtype=np.float64)[:length, :NUM_CHANNELS]
+        differences = (frames[:, :length, :] - performed[np.newaxis, :, :]) ** 2
+        return differences, mask[:, :length]
+
+    # Returns the total variance (squared difference) of each gesture from the performed
+    # frames, over the frames both gestures share.  One total per gesture.
+    # rows:  The rows of the gestures to compare, or None for every gesture.
+    def total_variances(self, performed_frames, rows=None):
+        differences, mask = self.squared_differences(performed_frames, rows)
+        return (differences.sum(axis=2) * mask).sum(axis=1)
+
+    # Returns a lower bound on the total variance of each gesture from the performed frames,
+    # from their coarse versions alone.  Over any block of frames, the total squared difference
+    # is at least the block size times the squared difference of the block averages, so the
+    # bound adds that up over the whole blocks both gestures share.  BLOCK_SIZE times less
+    # work than total_variances.
+    def coarse_lower_bounds(self, performed_frames):
+        performed = block_means(np.asarray(performed_frames, dtype=np.float64)[np.newaxis, :, :NUM_CHANNELS])[0]
+        num_blocks = min(len(performed), self.coarse_frames.shape[1])
+        if num_blocks == 0:
+            return np.zeros(self.get_size())
+
+        # Over the shared blocks:  sum((template - performed)^2) = sum(template^2) - 2 sum(template * performed)
+        # + sum(performed^2).  Blocks past the end of each template are zero, so they add nothing to the middle term.
+        shared_blocks = np.minimum(self.coarse_lengths, num_blocks)
+        template_squares = self.coarse_square_totals[np.arange(self.get_size()), shared_blocks]
+        products = self.coarse_frames[:, :num_blocks].reshape(self.get_size(), -1).dot(performed[:num_blocks].ravel())
+        performed_squares = np.concatenate([[0.0], (performed[:num_blocks] ** 2).sum(axis=1).cumsum()])[shared_blocks]
+
+        # Take off a margin for rounding in the expansion, so the bound is never above the true variance.
+        margin = 1e-9 * (template_squares + performed_squares)
+        totals = np.maximum(template_squares - 2 * products + performed_squares - margin, 0)
+        return BLOCK_SIZE * totals
+
+    # Returns the squared distance of every resampled gesture from the performed frames, resampled
+    # to RESAMPLED_LENGTH frames.  All gestures are compared in a single matrix-vector product.
+    def resampled_distances(self, resampled_frames):
+        performed = np.asarray(resampled_frames, dtype=np.float64)[:, :NUM_CHANNELS].ravel()
+        return self.resampled_norms - 2 * self.resampled.dot(performed) + performed.dot(performed)
+
+    # Returns the total variance of each gesture from each of a batch of performed gestures, as
+    # total_variances does for one, shaped (performed gestures x gestures).  Over the frames a gesture
+    # and a performed gesture share, sum((template - performed)^2) = sum(template^2) -
+    # 2 sum(template * performed) + sum(performed^2).  The padding past the end of both is zero, so
+    # the middle term for the whole batch is a single matrix product, and the others are looked up
+    # in running totals.
+    # performed_batch:  (performed gestures x frames x channels) frames, zero padded past each gesture's end.
+    # performed_lengths:  The length of each performed gesture, in frames.
+    def batch_total_variances(self, performed_batch, performed_lengths):
+        if self.square_totals is None:
+            self.square_totals = np.zeros((self.get_size(), self.get_max_length() + 1))
+            self.square_totals[:, 1:] = (self.frames ** 2).sum(axis=2).cumsum(axis=1)
+
+        # Pad or cut the batch to the length of the longest gesture, so the packed frames can be used as they are.
+        max_length = self.get_max_length()
+        performed = np.zeros((len(performed_batch), max_length, NUM_CHANNELS))
+        length = min(np.shape(performed_batch)[1], max_length)
+        performed[:, :length] = np.asarray(performed_batch, dtype=np.float64)[:, :length, :NUM_CHANNELS]
+
+        products = performed.reshape(len(performed), -1).dot(self.frames.reshape(self.get_size(), -1).T)
+        performed_square_totals = np.zeros((len(performed), max_length + 1))
+        performed_square_totals[:, 1:] = (performed ** 2).sum(axis=2).cumsum(axis=1)
+
+        shared = np.minimum(self.lengths[np.newaxis, :], np.minimum(performed_lengths, max_length)[:, np.newaxis])
+        template_squares = self.square_totals[np.arange(self.get_size())[np.newaxis, :], shared]
+        performed_squares = performed_square_totals[np.arange(len(performed))[:, np.newaxis], shared]
+        return np.maximum(template_squares - 2 * products + performed_squares, 0)
+
+    # Returns the squared distance of every resampled gesture from each of a batch of performed
+    # gestures resampled to RESAMPLED_LENGTH frames, shaped (performed gestures x gestures).
+    # The whole batch is compared in a single matrix product.
+    def batch_resampled_distances(self, resampled_batch):
+        performed = np.asarray(resampled_batch, dtype=np.float64)[:, :, :NUM_CHANNELS].reshape(len(resampled_batch), -1)
+        return (self.resampled_norms[np.newaxis, :] - 2 * performed.dot(self.resampled.T) +
+                (performed ** 2).sum(axis=1)[:, np.newaxis])
+
+    # Returns the number of times each gesture was the closest to the performed frames,
+    # per channel.  At every frame index, the gesture with the lowest squared difference
+    # in a channel receives a count for that channel.  Gestures too short to have a frame
+    # at that index are never closest.  Ties go to the earliest gesture.
+    # Returns: A (gestures x channels) array of counts.
+    def closest_counts(self, performed_frames):
+        differences, mask = self.squared_differences(performed_frames)
+        counts = np.zeros((differences.shape[0], NUM_CHANNELS))
+        if differences.shape[1] == 0:
+            return counts
+
+        differences[~mask] = np.inf
+        closest = differences.argmin(axis=0)  # (frames x channels) row of the closest gesture.
+
+        for channel in range(0, NUM_CHANNELS):
+            counts[:, channel] = np.bincount(closest[:, channel], minlength=differences.shape[0])
+
+        return counts
+
+
+# Packs the frames of a gesture into the given row of a (gestures x frames x channels) array.
+def pack_gesture(frames, row, gesture):
+    if gesture.get_length() > 0:
+        frames[row, :gesture.get_length()] = np.asarray(gesture.get_frames(), dtype=np.float64)[:, :NUM_CHANNELS]
+
+
+# Returns the average of every block of BLOCK_SIZE frames of (gestures x frames x channels)
+# frames, shaped (gestures x blocks x channels).  Frames past the last whole block are left out.
+def block_means(frames):
+    num_blocks = frames.shape[1] // BLOCK_SIZE
+    blocks = frames[:, :num_blocks * BLOCK_SIZE].reshape(frames.shape[0], num_blocks, BLOCK_SIZE, frames.shape[2])
+    return blocks.mean(axis=2)
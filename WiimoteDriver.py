@@ -0,0 +1,123 @@
+# Drivers find, connect, and poll remotes.  Everything that talks to a remote goes through the
+# driver returned by get_driver:  a WiiuseDriver, for real remotes over Bluetooth, or a stand-in
+# such as a SimulatedDriver, which replays recorded readings without any remote at all.
+#
+# A driver's remotes look like wiiuse's:  init returns an array whose entries each hold a remote
+# at index 0, with the bitmasks btns, btns_held and btns_released, event (0 when the last poll had
+# nothing from it), and orient (roll, pitch, yaw) and gforce (x, y, z) readings.
+
+# The driver used by the sampling thread and button handling.
+default_driver = None
+
+# The bitmask of each button, as wiiuse defines them.
+BUTTONS = {'2': 0x0001, '1': 0x0002, 'B': 0x0004, 'A': 0x0008, '-': 0x0010, 'Home': 0x0080,
+           'Left': 0x0100, 'Right': 0x0200, 'Down': 0x0400, 'Up': 0x0800, '+': 0x1000}
+
+
+# Returns the driver remotes are read through, connecting to real remotes with wiiuse if no other driver was set.
+def get_driver():
+    global default_driver
+    if default_driver is None:
+        default_driver = WiiuseDriver()
+    return default_driver
+
+
+# Sets the driver remotes are read through.
+def set_driver(driver):
+    global default_driver
+    default_driver = driver
+
+
+class WiimoteDriver:
+    button = BUTTONS
+
+    # Returns an array of num_motes remotes, not yet connected.
+    def init(self, num_motes):
+        raise NotImplementedError
+
+    # Looks for remotes for up to timeout seconds.  Returns how many were found.
+    def find(self, wiimotes, num_motes, timeout):
+        raise NotImplementedError
+
+    # Connects to the remotes found.  Returns how many were connected.
+    def connect(self, wiimotes, num_motes):
+        raise NotImplementedError
+
+    # Reads the remotes' latest reports into them.  Returns the number of remotes with something new.
+    def poll(self, wiimotes, num_motes):
+        raise NotImplementedError
+
+    # Lights the LED that numbers the remote at remote_index.
+    def set_leds(self, wm, remote_index):
+        pass
+
+    def motion_sensing(self, wm, enabled):
+        pass
+
+    def set_ir(self, wm, enabled):
+        pass
+
+    def disconnect(self, wm):
+        pass
+
+    # Returns whether the driver has no more reports to give.  Real remotes never run out.
+    def is_finished(self):
+        return False
+
+    # Returns whether presses made before the program waits for one should be ignored.  A person
+    # presses buttons while the program is busy, e.g. answering a prompt, and doesn't mean them
+    # for whatever the program asks next.
+    def drops_stale_presses(self):
+        return True
+
+    # The button tests below match wiiuse's, on the remote's state after the last poll.
+    def is_pressed(self, remote, btn):
+        return (remote.btns & btn) == btn
+
+    def is_held(self, remote, btn):
+        return (remote.btns_held & btn) == btn
+
+    def is_just_pressed(self, remote, btn):
+        return self.is_pressed(remote, btn) and not self.is_held(remote, btn)
+
+    def is_released(self, remote, btn):
+        return (remote.btns_released & btn) == btn
+
+    def using_acc(self, remote):
+        return True
+
+
+class WiiuseDriver(WiimoteDriver):
+
+    def __init__(self):
+        # Imported here, so that stand-in drivers run where wiiuse isn't installed.
+        import wiiuse
+        self.wiiuse = wiiuse
+        self.button = wiiuse.button
+
+    def init(self, num_motes):
+        return self.wiiuse.init(num_motes)
+
+    def find(self, wiimotes, num_motes, timeout):
+        return self.wiiuse.find(wiimotes, num_motes, timeout)
+
+    def connect(self, wiimotes, num_motes):
+        return self.wiiuse.connect(wiimotes, num_motes)
+
+    def poll(self, wiimotes, num_motes):
+        return self.wiiuse.poll(wiimotes, num_motes)
+
+    def set_leds(self, wm, remote_index):
+        self.wiiuse.set_leds(wm, self.wiiuse.LED[remote_index])
+
+    def motion_sensing(self, wm, enabled):
+        self.wiiuse.motion_sensing(wm, enabled)
+
+    def set_ir(self, wm, enabled):
+        self.wiiuse.set_ir(wm, enabled)
+
+    def disconnect(self, wm):
+        self.wiiuse.disconnect(wm)
+
+    def using_acc(self, remote):
+        return self.wiiuse.using_acc(remote)
@@ -4,6 +4,7 @@
 # in the LearnGesture method.
 
 from ast import literal_eval
+from collections import OrderedDict
 from LearnedGesture import LearnedGesture
 import os
 
@@ -15,98 +16,137 @@ class GestureWriterReader:
         if not os.path.isfile(self.gesture_file):
             f = open(self.gesture_file, 'a')
             f.close()
+        # Gestures by name as last read from the gestures file, and the stamp of the file
+        # when they were read.  The file is only read again once its stamp changes.
+        self.gesture_index = None
+        self.index_stamp = None
 
     #  Writes a gesture to the gestures file.
     def write_gesture(self, gesture):
-        f = open(self.gesture_file, 'a')  # Open gesture file for appending.
-        str_gesture = str(gesture.get_gesture())
-        f.write(str_gesture+"\n")
-        f.close()
+        self.write_gestures([gesture])
+
+    # Returns the gesture tuple of a gesture as it is written to the gestures file,
+    # with every frame as a tuple of plain floats, followed by the gesture's channel weights.
+    # (Frames may be arrays when the gesture was read from a binary gestures file.)
+    @staticmethod
+    def format_gesture(gesture):
+        name, frames, action, attempts, successes, iterations = gesture.get_gesture()
+        frames = [tuple(float(reading) for reading in frame) for frame in frames]
+        iterations = [[tuple(float(reading) for reading in frame) for frame in iteration]
+                      for iteration in iterations]
+        weights = [float(weight) for weight in gesture.get_weights()]
+
+        return name, frames, action, attempts, successes, iterations, weights
 
     #  Returns the gestures from the gestures.txt file. (Learned gestures.)
     def get_learned_gestures(self):
+        return [g.copy() for g in self.get_index().values()]
+
+    # Returns the known gestures by name, in the order they are stored.
+    # The gestures file is only parsed again if it has changed since it was last parsed.
+    def get_index(self):
+        stamp = self.get_file_stamp()
+        if self.gesture_index is None or stamp != self.index_stamp:
+            self.gesture_index = OrderedDict((g.get_name(), g) for g in self.read_gestures())
+            self.index_stamp = stamp
+
+        return self.gesture_index
+
+    #  Reads the gestures from the gestures.txt file.
+    def read_gestures(self):
         f = open(self.gesture_file, 'r')
         known_gestures = []
         for line in f:
             gesture = line
             gesture = literal_eval(gesture)
-            # Append a gesture with name, frames, action, attempts, successes, and iterations.
-            known_gestures.append(LearnedGesture(gesture[0], gesture[1], gesture[2], gesture[3], gesture[4], gesture[5]))
+            # Append a gesture with name, frames, action, attempts, successes, iterations, and
+            # channel weights.  (Gestures written before weights were kept have none.)
+            weights = gesture[6] if len(gesture) > 6 else None
+            known_gestures.append(LearnedGesture(gesture[0], gesture[1], gesture[2], gesture[3], gesture[4], gesture[5],
+                                                 weights))
         f.close()
 
         return known_gestures
 
+    # Returns the (inode, modification time, size) of the gestures file, which changes whenever the file does.
+    def get_file_stamp(self):
+        stat = os.stat(self.gesture_file)
+        return stat.st_ino, stat.st_mtime, stat.st_size
+
     #  Deletes the contents of the gestures.txt file.
     def delete_gestures(self):
-        f = open(self.gesture_file, 'w')
-        f.seek(0)
-        f.truncate()
-        f.close()
+        self.overwrite_gestures([])
 
     # Deletes a gesture by the name g_name.  Does not update currently known gestures.
     def delete_gesture(self, g_name):
-        known_gestures = self.get_learned_gestures()
+        known_gestures = self.get_index()
 
         # Make sure the gesture is actually known before trying to remove it.
-        if self.get_gesture_from_name(g_name) is None:
+        if g_name not in known_gestures:
             print "Delete_gesture: Gesture doesn't exist!"
             return
 
-        for g in known_gestures:
-            if g.get_name() == g_name:
-                # Remove the gesture by the given name
-                known_gestures.remove(g)
-
-        # Format the file to contain nothing
-        f = open(self.gesture_file, 'w')
-        f.seek(0)
-        f.truncate()
-        f.close()
-
         # Write known gestures back to the file, without the named gesture.
-        self.write_gestures(known_gestures)
+        self.overwrite_gestures([g for name, g in known_gestures.items() if name != g_name])
 
     # Appends a list of gestures to the gestures file.
     def write_gestures(self, gestures):
-        for g in gestures:
-            self.write_gesture(g)
+        self.write_lines(gestures, 'a')
 
     # Overwrites the current gestures file to contain a new list of gestures.
     def overwrite_gestures(self, gestures):
-        # Delete all gestures.
-        self.delete_gestures()
-        # Append a new list of gestures to the empty file.
-        self.write_gestures(gestures)
+        self.write_lines(gestures, 'w')
+
+    # Writes a list of gestures to the gestures file in a single write, either appending
+    # them (mode 'a') or replacing the contents of the file (mode 'w').
+    # The index is updated to match, unless the file was changed elsewhere since it was read.
+    def write_lines(self, gestures, mode):
+        gestures = list(gestures)
+        index_up_to_date = self.gesture_index is not None and self.get_file_stamp() == self.index_stamp
+
+        f = open(self.gesture_file, mode)
+        f.write(''.join(str(self.format_gesture(g)) + "\n" for g in gestures))
+        f.close()
+
+        if not index_up_to_date:
+            self.gesture_index = None
+            return
+
+        if mode == 'w':
+            self.gesture_index = OrderedDict()
+        for g in gestures:
+            self.gesture_index[g.get_name()] = g.copy()
+        self.index_stamp = self.get_file_stamp()
 
     # Returns a list of gesture names currently known.
     def get_gesture_names(self):
-        names = []
-        for g in self.get_learned_gestures():
-            names.append(g.get_name())
-
-        return names
+        return list(self.get_index().keys())
 
+    # Returns the gesture by the name g_name, or None if there is no such gesture.
     def get_gesture_from_name(self, g_name):
-        for g in self.get_learned_gestures():
-            if g_name == g.get_name():
-                return g
+        gesture = self.get_index().get(g_name)
+        if gesture is None:
+            return None
 
-        return None
+        return gesture.copy()
 
+    # Saves a changed gesture, or adds it if it isn't stored yet.
     def update_gesture(self, gesture):
-        self.delete_gesture(gesture.get_name())
+        if gesture.get_name() in self.get_index():
+            self.delete_gesture(gesture.get_name())
         self.write_gesture(gesture)
 
     # Prints all currently known gestures.
     def print_gestures(self):
 
+        known_gestures = self.get_index().values()
         print "Gestures from " + self.gesture_file + ":"
-        if not self.get_learned_gestures():
+        if not known_gestures:
             print "None! (Teach a gesture.)"
         else:
             print "Name".ljust(25) + "Action"
             print ''.ljust(31, '=') + "\n"
-            for g in self.get_learned_gestures():
+            for g in known_gestures:
                 action_str = ' '.join(g.get_action())
                 print (g.get_name() + ":").ljust(25) + action_str
 
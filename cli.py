@@ -0,0 +1,203 @@
+#!/usr/bin/python
+# Looks after gestures without a remote:  lists them, shows their statistics, imports and exports
+# them, averages them again from their stored iterations, and recognizes performed gestures read
+# from a file.  Nothing connects to a remote, and wiiuse is never imported, so these work on
+# machines with no Bluetooth.  Each command imports only what it needs, and reads only the files
+# it works on, so it starts straight away.
+#
+# Usage:  python cli.py <command> [arguments] [--gestures gestures.bin] [--stats gesture_stats.txt]
+#
+# Commands:
+#   list:                      Lists the gestures, with their actions and statistics.
+#   stats:                     Shows the gesture statistics, as the statistics screen does.
+#   import <file>:             Adds the gestures in another gestures file, replacing any of the same name.
+#                              With --replace, replaces every gesture instead.
+#   export <file>:             Writes the gestures to another gestures file, replacing its contents.
+#   re-average [name ...]:     Averages the named gestures (or every gesture) again from their iterations.
+#   recognize <log file>:      Recognizes each gesture in a log of performed gestures or a trace (see
+#                              BatchRecognizer), with --method (closest unless given).
+#
+# Gestures files ending in .bin are binary; any other is a text gestures file.
+
+import getopt
+import sys
+import os
+
+GESTURES_FILE = 'gestures.bin'
+STATS_FILE = 'gesture_stats.txt'
+RECOGNITION_METHOD = 'closest'
+
+USAGE = "Usage: python cli.py list|stats|import <file>|export <file>|re-average [name ...]|recognize <log file> " \
+        "[--gestures gestures.bin] [--stats gesture_stats.txt] [--replace] [--method closest]"
+
+
+# Returns a writer-reader for an existing gestures file, or None (after saying so) if there is no such file.
+def open_existing_store(gestures_file):
+    if not os.path.isfile(gestures_file):
+        print "Error:  There is no gestures file " + gestures_file + "."
+        return None
+
+    from GestureStore import open_gesture_store
+    return open_gesture_store(gestures_file)
+
+
+# Lists the gestures, with their lengths, iterations, statistics and actions.
+def list_gestures(gestures_file):
+    store = open_existing_store(gestures_file)
+    if store is None:
+        return 1
+
+    gestures = store.get_learned_gestures()
+    print str(len(gestures)) + " gesture(s) in " + gestures_file + ":"
+    if len(gestures) == 0:
+        return 0
+
+    print "\n" + "Name".ljust(25) + "Frames".ljust(9) + "Iterations".ljust(12) + "Successes".ljust(11) + \
+          "Attempts".ljust(10) + "Action"
+    for g in gestures:
+        print g.get_name().ljust(25) + str(g.get_length()).ljust(9) + str(len(g.get_iterations())).ljust(12) + \
+              str(g.get_successes()).ljust(11) + str(g.get_attempts()).ljust(10) + ' '.join(g.get_action())
+    return 0
+
+
+# Shows the gesture statistics.
+def show_stats(gestures_file, stats_file):
+    if not os.path.isfile(gestures_file):
+        print "Error:  There is no gestures file " + gestures_file + "."
+        return 1
+    if not os.path.isfile(stats_file):
+        print "Error:  There is no statistics file " + stats_file + "."
+        return 1
+
+    from GeStat import GeStat
+    GeStat(stats_file, gestures_file).print_stats()
+    return 0
+
+
+# Adds the gestures in source_file, replacing any of the same name.
+# replace:  Whether to replace every gesture with those in source_file instead.
+def import_gestures(gestures_file, source_file, replace=False):
+    source = open_existing_store(source_file)
+    if source is None:
+        return 1
+
+    from GestureStore import open_gesture_store
+    store = open_gesture_store(gestures_file)
+    gestures = source.get_learned_gestures()
+    if replace:
+        store.overwrite_gestures(gestures)
+    else:
+        for g in gestures:
+            store.update_gesture(g)
+
+    print "Imported " + str(len(gestures)) + " gesture(s) from " + source_file + " into " + gestures_file + "."
+    return 0
+
+
+# Writes the gestures to destination_file, replacing its contents.
+def export_gestures(gestures_file, destination_file):
+    store = open_existing_store(gestures_file)
+    if store is None:
+        return 1
+
+    from GestureStore import open_gesture_store
+    gestures = store.get_learned_gestures()
+    open_gesture_store(destination_file).overwrite_gestures(gestures)
+
+    print "Exported " + str(len(gestures)) + " gesture(s) from " + gestures_file + " to " + destination_file + "."
+    return 0
+
+
+# Averages gestures again from their stored iterations, and saves them.  Gestures averaged one
+# iteration at a time (or with a decay) can drift from the plain average of their iterations.
+# names:  The gestures to average.  Every gesture if empty.
+def reaverage_gestures(gestures_file, names):
+    store = open_existing_store(gestures_file)
+    if store is None:
+        return 1
+
+    gestures = store.get_learned_gestures()
+    known_names = [g.get_name() for g in gestures]
+    for name in names:
+        if name not in known_names:
+            print "Error:  No gesture named " + name + "."
+            return 1
+
+    averaged = []
+    for g in gestures:
+        if len(names) > 0 and g.get_name() not in names:
+            continue
+        if len(g.get_iterations()) == 0 or min(len(frames) for frames in g.get_iterations()) == 0:
+            print "Skipped " + g.get_name() + ":  It has no iterations to average."
+            continue
+
+        g.set_frames(g.average_gesture())
+        averaged.append(g)
+
+    for g in averaged:
+        store.update_gesture(g)
+    print "Averaged " + str(len(averaged)) + " gesture(s) again."
+    return 0
+
+
+# Recognizes each gesture in a log of performed gestures, and prints the gesture it was recognized as.
+def recognize_gestures(gestures_file, log_file, method):
+    from RecognitionBenchmark import MATCHERS
+    from LeaveOneOutEvaluator import METHODS
+    if method not in METHODS:
+        print "Error:  No method named " + method + ".  Choose from " + ', '.join(METHODS) + "."
+        return 1
+
+    store = open_existing_store(gestures_file)
+    if store is None:
+        return 1
+    if not os.path.isfile(log_file):
+        print "Error:  There is no log file " + log_file + "."
+        return 1
+
+    from BatchRecognizer import read_gesture_log
+    from GestureMatcher import GestureMatcher
+    from GestureList import GestureList
+    matcher = GestureMatcher(GestureList(store.get_learned_gestures()))
+
+    logged = read_gesture_log(log_file)
+    print "Index".ljust(7) + "Label".ljust(25) + "Recognized as"
+    for index, (label, performed_gesture) in enumerate(logged):
+        matched_gesture = MATCHERS[method](matcher, performed_gesture)
+        print str(index).ljust(7) + str(label if label is not None else '').ljust(25) + \
+              ("(none)" if matched_gesture is None else matched_gesture.get_name())
+    return 0
+
+
+def main(argv):
+    try:
+        options, arguments = getopt.gnu_getopt(argv, '', ['gestures=', 'stats=', 'replace', 'method='])
+    except getopt.GetoptError as e:
+        print "Error:  " + str(e)
+        return 1
+    options = dict(options)
+    if len(arguments) == 0:
+        print USAGE
+        return 1
+
+    command, arguments = arguments[0], arguments[1:]
+    gestures_file = options.get('--gestures', GESTURES_FILE)
+    if command == 'list' and len(arguments) == 0:
+        return list_gestures(gestures_file)
+    elif command == 'stats' and len(arguments) == 0:
+        return show_stats(gestures_file, options.get('--stats', STATS_FILE))
+    elif command == 'import' and len(arguments) == 1:
+        return import_gestures(gestures_file, arguments[0], '--replace' in options)
+    elif command == 'export' and len(arguments) == 1:
+        return export_gestures(gestures_file, arguments[0])
+    elif command == 're-average':
+        return reaverage_gestures(gestures_file, arguments)
+    elif command == 'recognize' and len(arguments) == 1:
+        return recognize_gestures(gestures_file, arguments[0], options.get('--method', RECOGNITION_METHOD))
+
+    print USAGE
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
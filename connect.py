@@ -1,54 +1,137 @@
 #!/usr/bin/python
 
-import wiiuse
+import getopt
 import sys
 import time
 import os
 from PerformedGesture import PerformedGesture
-from WriterReader import GestureWriterReader
+from GestureStore import open_gesture_store, migrate_if_needed
+from GestureRegistry import get_registry
 from ButtonHandler import ButtonHandler
 from GestureMatcher import GestureMatcher
 from GestureCreator import GestureCreator
 from GeStat import GeStat
+from GestureSpotter import GestureSpotter
+from ActionExecutor import ActionExecutor, set_executor
+from PersistenceWorker import get_persistence_worker
+from RemoteSession import RemoteSession
+from RecognitionPool import RecognitionPool
+from SamplingThread import SamplingThread
+from WiimoteDriver import WiiuseDriver, set_driver
+from SimulatedDriver import SimulatedDriver, TraceRecorder, read_trace
+from Metrics import Metrics, set_metrics
+from Clock import monotonic
 
 test_gesture = PerformedGesture(
     [(1, 1, 1, 1, 1), (2, 2, 2, 2, 2), (3, 3, 3, 3, 3), (4, 4, 4, 4, 4), (6, 5, 5, 5, 5)])  # Performed test gesture.
 testing = False
-num_motes = 1  # Number of wiimotes
+NUM_MOTES = 1  # Number of wiimotes to connect, up to 4.  With more than one, Home starts multi-remote mode.
+num_motes = NUM_MOTES
+SAMPLE_RATE = 100  # How many times a second the wiimotes are polled.
 FRAME_FREQ = 1  # The rate for capturing frames of information. Larger number = less frames captured
 # i.e., every nth frame is captured and stored.
 REPETITION_LIMIT = 5
+# How far a confirmed gesture moves its learned gesture towards it (0 to 1), as an exponential
+# moving average.  None to average the gesture's stored iterations equally.
+TEMPLATE_DECAY = None
+# How a performed gesture is recognized:
+#   'closest':    The gesture with the most closest readings, scored while it is performed.
+#   'dtw':        Dynamic Time Warping, which tolerates gestures performed faster or slower.
+#   'resampled':  The closest gesture once both are resampled to the same length.
+#   'features':   As 'resampled', but only among the gestures with the nearest features,
+#                 looked up in an index.  For large numbers of gestures.
+#   'cascade':    The gesture with the least total variance, found by comparing most gestures only
+#                 coarsely.  The same gesture as comparing every gesture in full.  For large numbers of gestures.
+RECOGNITION_METHOD = 'closest'
+DTW_BAND = 10  # How many frames DTW may warp a gesture by.
 STANDARD_SLEEP_TIME = 0.1
-
-gestures_file = 'gestures.txt'
-stats_file = 'gesture_stats.txt'
-if len(sys.argv) > 2:
-    if sys.argv[1] == 't':
-        testing = True
+ACTION_WORKERS = 4  # The most gesture actions that run at once.
+ACTION_TIMEOUT = None  # Seconds a gesture action may run before it is stopped.  None for no limit.
+# Whether to time each stage from releasing B to a gesture's action, and count dropped samples.
+# The timings are shown with the statistics, and appended to METRICS_FILE every METRICS_INTERVAL seconds.
+METRICS_ENABLED = False
+METRICS_FILE = 'metrics.jsonl'
+METRICS_INTERVAL = 60
+
+# Options:
+#   --replay TRACE:  Replay a trace of remote reports instead of connecting to remotes.
+#   --speed N:       Replay the trace N times faster than it was recorded.
+#   --record TRACE:  Record the remotes' reports to a trace, for replaying later.
+#   --metrics FILE:  Turn metrics on, and append them to FILE.
+# Arguments:  <gestures file> <stats file>, or t for testing.
+def setup(argv):
+    global testing, driver, wiimotes, metrics, persistence_worker, writer_reader, stat, full_writer_reader, \
+        sampler, button_handler, gesture_matcher, gesture_creator, gesture_spotter, remote_sessions, action_executor
+
+    try:
+        options, arguments = getopt.gnu_getopt(argv, '', ['replay=', 'speed=', 'record=', 'metrics='])
+    except getopt.GetoptError as e:
+        print "Error:  " + str(e)
+        sys.exit(1)
+    options = dict(options)
+    replay_speed = float(options.get('--speed', 1.0))
+
+    gestures_file = 'gestures.bin'
+    stats_file = 'gesture_stats.txt'
+    if len(arguments) > 1:
+        if arguments[0] == 't':
+            testing = True
+        else:
+            gestures_file = str(arguments[0])
+            stats_file = str(arguments[1])
     else:
-        gestures_file = str(sys.argv[1])
-        stats_file = str(sys.argv[2])
-
-full_gestures_file = 'full_' + gestures_file
-
-writer_reader = GestureWriterReader(
-    gestures_file)  # Initializes the writer-reader to the either general use or testing.
-stat = GeStat(stats_file, gestures_file)
-full_writer_reader = GestureWriterReader(full_gestures_file)  # writer-reader for full gestures.
-wiimotes = wiiuse.init(num_motes)
-first_wm = wiimotes[0]
-# Handles button press events of the wiimote.
-button_handler = ButtonHandler(wiimotes, first_wm, num_motes)
-# Object to perform gesture comparison.
-gesture_matcher = GestureMatcher(writer_reader)
-# Object that creates gesture objects.
-gesture_creator = GestureCreator(gestures_file, wiimotes, first_wm, num_motes, FRAME_FREQ)
+        # Gestures used to be stored as text.  Convert them to the binary gestures file the first time.
+        if migrate_if_needed('gestures.txt', gestures_file):
+            print "Converted gestures.txt to " + gestures_file + "."
+
+    full_gestures_file = 'full_' + gestures_file
+
+    # Times the stages every gesture passes through.  Off unless turned on, when they cost next to nothing.
+    metrics = Metrics(METRICS_ENABLED or '--metrics' in options)
+    set_metrics(metrics)
+    metrics.start_dumping(options.get('--metrics', METRICS_FILE), METRICS_INTERVAL)
+
+    # Saves gesture and statistics changes in the background, so reading the Wiimote never waits on a file.
+    persistence_worker = get_persistence_worker()
+    # The gestures shared by every object below.  Changes made through it reach them all.
+    writer_reader = get_registry(
+        gestures_file)  # Initializes the writer-reader to the either general use or testing.
+    stat = GeStat(stats_file, gestures_file)
+    full_writer_reader = open_gesture_store(full_gestures_file)  # writer-reader for full gestures.
+    # Reads the wiimotes:  real ones through wiiuse, or a replayed trace of them.
+    if '--replay' in options:
+        driver = SimulatedDriver(read_trace(options['--replay']), replay_speed)
+    else:
+        driver = WiiuseDriver()
+    if '--record' in options:
+        driver = TraceRecorder(driver, options['--record'])
+    set_driver(driver)
+    wiimotes = driver.init(num_motes)
+    first_wm = wiimotes[0]
+    # Polls the wiimotes at SAMPLE_RATE on a thread of its own, and timestamps their readings.  Started once connected.
+    # A trace replayed faster is polled faster, so no report is missed.
+    sampler = SamplingThread(wiimotes, num_motes, SAMPLE_RATE * (replay_speed if '--replay' in options else 1))
+    # Handles button press events of the wiimote.
+    button_handler = ButtonHandler(wiimotes, first_wm, num_motes, sampler)
+    # Object to perform gesture comparison.
+    gesture_matcher = GestureMatcher(writer_reader, DTW_BAND)
+    # Object that creates gesture objects.
+    gesture_creator = GestureCreator(gestures_file, wiimotes, first_wm, num_motes, FRAME_FREQ, sampler)
+    # Spots gestures in the stream of sensor readings for hands-free mode.
+    gesture_spotter = GestureSpotter(gesture_matcher)
+    # The capture state of each remote, for multi-remote mode.
+    remote_sessions = [RemoteSession(i, FRAME_FREQ) for i in range(0, num_motes)]
+    # Runs the actions of recognized gestures.  Repeated gestures don't start an action that is still running.
+    action_executor = ActionExecutor(ACTION_WORKERS, ACTION_TIMEOUT)
+    set_executor(action_executor)
 
 
 # The main prompt of the program
 def main_prompt():
     print "\n\n**********************"
-    print "\nHold B: perform a gesture \n2: Teach a gesture \nA: list all gestures.\nDown: Show gesture statistics \nTo quit, press the + button."
+    print "\nHold B: perform a gesture \n1: Hands-free mode \n2: Teach a gesture \nA: list all gestures.\nDown: Show gesture statistics \nTo quit, press the + button."
+    if num_motes > 1:
+        print "Home: Multi-remote mode"
     print "To erase all gestures, press the - button."
     print "**********************\n\n"
 
@@ -57,6 +140,56 @@ def test(gesture):
     print gesture_matcher.evaluation_function(gesture)
 
 
+# Returns the learned gesture matching a performed gesture, by RECOGNITION_METHOD, without the
+# scores kept while a gesture is performed.  Safe to call from several threads at once.
+def recognize(performed_gesture):
+    if RECOGNITION_METHOD == 'dtw':
+        return gesture_matcher.dtw_recognition(performed_gesture)
+    elif RECOGNITION_METHOD == 'resampled':
+        return gesture_matcher.resampled_recognition(performed_gesture)
+    elif RECOGNITION_METHOD == 'features':
+        return gesture_matcher.feature_recognition(performed_gesture)
+    elif RECOGNITION_METHOD == 'cascade':
+        return gesture_matcher.cascade_variance_recognition(performed_gesture)
+    else:
+        return gesture_matcher.greatest_closest_recognition(performed_gesture)
+
+
+# Lets every connected remote perform gestures at once.  Each remote captures its own gestures,
+# which are recognized on a pool of threads, and their actions called, until Home is pressed.
+def multi_remote_mode():
+    recognition_pool = RecognitionPool(recognize, num_motes)
+    for session in remote_sessions:
+        session.reset()
+
+    finished = False
+    while not finished:
+        # Wait a moment at most, so recognized gestures are reported while the remotes are still.
+        sample = sampler.get(STANDARD_SLEEP_TIME)
+        if sample is None and sampler.is_finished():
+            # A replayed trace has ended.  Report the gestures still being recognized, then stop.
+            recognition_pool.shutdown(True)
+            finished = True
+        if sample is not None:
+            if sample.is_just_pressed(driver.button['Home']):
+                recognition_pool.shutdown()
+                return
+
+            session = remote_sessions[sample.get_remote_index()]
+            performed_gesture = session.update(sample)
+            if performed_gesture is not None and performed_gesture.get_length() > 0:
+                recognition_pool.submit(session.get_remote_index(), performed_gesture)
+
+        for remote_index, performed_gesture, matched_gesture, seconds in recognition_pool.get_results():
+            if matched_gesture is None:
+                print "Remote " + str(remote_index + 1) + ":  No match.  (Teach a gesture first.)"
+            else:
+                print "Remote " + str(remote_index + 1) + ":  " + matched_gesture.get_name() + \
+                      "  (" + "%.3f" % seconds + "s)"
+                metrics.record('recognition', seconds)
+                matched_gesture.call_action()
+
+
 # Pretty star wave to stdout.
 def star_wave(repetitions=1):
     """
@@ -79,18 +212,19 @@ def intro_prompt():
         time.sleep(STANDARD_SLEEP_TIME)
         print "*************************************\n"
         time.sleep(STANDARD_SLEEP_TIME)
-        print "Press 1 & 2 to connect"
+        print "Press 1 & 2 to connect" + (" each remote" if num_motes > 1 else "")
 
-        found_motes = wiiuse.find(wiimotes, num_motes, 1)  # Find one remote, and wait up to 1 second to find it.
+        # Find the remotes, waiting up to 1 second (5 seconds for several remotes) to find them.
+        found_motes = driver.find(wiimotes, num_motes, 1 if num_motes == 1 else 5)
 
         # If no remotes are found...
         if not found_motes:
             print "No remotes found!  Exiting."
             sys.exit(1)
         else:
-            print "... Found remote."
+            print "... Found " + str(found_motes) + " remote(s)."
 
-        connected = wiiuse.connect(wiimotes, num_motes)
+        connected = driver.connect(wiimotes, num_motes)
 
         if connected:
             print 'Connected to %i wiimotes!' % connected
@@ -98,16 +232,20 @@ def intro_prompt():
             print "Failed to connect.  Exiting."
             sys.exit(1)
 
-        wiiuse.set_leds(first_wm, wiiuse.LED[0])
+        # Light each remote's own LED, so players can tell which remote is which.
+        for i in range(0, num_motes):
+            driver.set_leds(wiimotes[i], i)
 
         print "Enabling motion sense..."
         time.sleep(STANDARD_SLEEP_TIME)
-        wiiuse.motion_sensing(first_wm, 1)  # Enable motion sensing.
+        for i in range(0, num_motes):
+            driver.motion_sensing(wiimotes[i], 1)  # Enable motion sensing.
         time.sleep(STANDARD_SLEEP_TIME)
 
         print "Enabling IR...\n"
         time.sleep(STANDARD_SLEEP_TIME)
-        wiiuse.set_ir(first_wm, 1)  # Enable IR (No sensor bar yet.)
+        for i in range(0, num_motes):
+            driver.set_ir(wiimotes[i], 1)  # Enable IR (No sensor bar yet.)
         time.sleep(STANDARD_SLEEP_TIME)
 
         print "*************************************"
@@ -129,8 +267,6 @@ def recommend_relearn(gesture):
     if confirm.lower() == 'y':
         writer_reader.delete_gesture(gesture.get_name())
         gesture_creator.learn_gesture(REPETITION_LIMIT)
-        gesture_matcher.update_known_gestures()
-        gesture_creator.update_gestures()
     else:
         return
 
@@ -141,163 +277,202 @@ def recommend_relearn(gesture):
 #
 ################################################################
 
-done = False
-i = 0
+def main(argv):
+    setup(argv)
 
-intro_prompt()
-main_prompt()
+    done = False
+    i = 0
 
-# Main usage loop
-while not done:
-    # Poll the wiimotes for button/motion events
-    r = wiiuse.poll(wiimotes, num_motes)
+    intro_prompt()
+    sampler.start()
+    main_prompt()
 
-    if r != 0:
-        # If there are any events, check for a pressed button
-        button_pressed = button_handler.press_event()
+    # Main usage loop
+    while not done:
+        # Wait for a button to be pressed.  (The sampling thread polls the wiimotes.)
+        sample = button_handler.next_press(timeout=1)
+        if sample is None and sampler.is_finished():
+            # A replayed trace has run out.
+            print "End of trace.  Exiting!"
+            done = True
 
-        if button_pressed == wiiuse.button['B']:
-            os.system('clear')
-            print "\nRecognizing gesture...\n"
+        if sample is not None:
+            button_pressed = sample.get_pressed_button()
+
+            if button_pressed == driver.button['B']:
+                os.system('clear')
+                print "\nRecognizing gesture...\n"
+
+                # Collect data from the user's performed gesture, scoring it as it is performed.
+                performed_gesture = gesture_creator.perform_gesture(gesture_matcher)
+
+                if performed_gesture is None and sampler.is_finished():
+                    continue  # A replayed trace ended part way through the gesture.
+                if performed_gesture is None:
+                    # If the gesture has no length, prompt the user to try again
+                    time.sleep(STANDARD_SLEEP_TIME * 5)
+                    print "..."
+                    time.sleep(STANDARD_SLEEP_TIME * 5)
+                    print "Uh-oh!  That gesture had no length.  Try again."
+                    time.sleep(STANDARD_SLEEP_TIME * 5)
+                    main_prompt()
+                    continue
 
-            # Collect data from the user's performed gesture.
-            performed_gesture = gesture_creator.perform_gesture()
+                # if testing:
+                #     performed_gesture = test_gesture
+                #     test(performed_gesture)
+
+                recognition_start = monotonic()
+                if RECOGNITION_METHOD == 'closest':
+                    # Match the performed gesture to the closest learned gesture,
+                    # from the scores kept while it was performed.
+                    matched_gesture = gesture_matcher.incremental_closest_recognition()
+                else:
+                    matched_gesture = recognize(performed_gesture)
+                metrics.record('recognition', monotonic() - recognition_start)
+                # The time from releasing B to knowing the gesture, including taking the last samples.
+                metrics.record('release_to_match', monotonic() - gesture_creator.get_release_time())
+                if matched_gesture is None:
+                    # If there is no matched gesture, then none are known.  Prompt the user to teach a gesture.
+                    print "\nNo known gestures!  Teach a gesture to use gesture recognition.\n"
+                    continue
 
-            if performed_gesture is None:
-                # If the gesture has no length, prompt the user to try again
-                time.sleep(STANDARD_SLEEP_TIME * 5)
-                print "..."
-                time.sleep(STANDARD_SLEEP_TIME * 5)
-                print "Uh-oh!  That gesture had no length.  Try again."
-                time.sleep(STANDARD_SLEEP_TIME * 5)
+                print "Did you mean to perform", matched_gesture.get_name() + "?"
+                print "Press A to confirm, B if you meant something else, or + to cancel."
+                confirmed = False
+
+                while not confirmed:
+                    confirm_sample = button_handler.next_press()
+                    if confirm_sample is None:
+                        break  # A replayed trace ended at the prompt.  Leave the gesture as it is.
+                    confirm_button = confirm_sample.get_pressed_button()
+                    if confirm_button == driver.button['+']:
+                        confirmed = True
+                        continue
+                    elif confirm_button == driver.button['A']:
+                        # If the user performed the correct action
+                        print "\nSuccess! Performing action...\n"
+                        matched_gesture.call_action()
+
+                        # Update gesture statistics with a success.  (Written to disk below, with the new average.)
+                        stat.confirm(matched_gesture, True, False)
+                        # Factor the successful gesture into the gesture's average
+                        matched_gesture.update_and_average(performed_gesture.get_frames(), TEMPLATE_DECAY)
+                        # Update the matched gesture on disk
+                        writer_reader.update_gesture(matched_gesture)
+                        confirmed = True
+                    elif confirm_button == driver.button['B']:
+                        while not confirmed:
+                            intended_gesture_name = raw_input("Whoops!  What was your intended gesture?:")
+                            intended_gesture = writer_reader.get_gesture_from_name(intended_gesture_name)
+                            if intended_gesture is not None:
+                                confirmed = True
+                                stat.confirm(intended_gesture, False, False)
+
+                                # If failed gesture, instead update the INTENDED
+                                # gesture with the performed gesture iteration
+                                intended_gesture.update_and_average(performed_gesture.get_frames(), TEMPLATE_DECAY)
+
+                                # Suggest that the user re-teach a gesture that is inconsistently successful.
+                                if (stat.get_gesture_success_rate(intended_gesture) < 0.6 and
+                                        intended_gesture.get_attempts() > 5):
+                                    recommend_relearn(intended_gesture)
+
+                                # Print statistics regarding the intended gesture
+                                print "\n" + (intended_gesture.get_name() + " success rate:").ljust(30) + str(
+                                    stat.get_gesture_success_rate(intended_gesture))
+                                # Update the intended gesture on disk.
+                                writer_reader.update_gesture(intended_gesture)
+
+                # Print statistics regarding the matched gesture and total statistics.
+                print "\n" + (matched_gesture.get_name() + " success rate:").ljust(30) + str(
+                    stat.get_gesture_success_rate(matched_gesture))
+                print "Total success rate:".ljust(30) + str(stat.get_total_success_rate())
                 main_prompt()
-                continue
 
-            # if testing:
-            #     performed_gesture = test_gesture
-            #     test(performed_gesture)
+            elif button_pressed == driver.button['1']:
+                os.system('clear')
+                print "\nHands-free mode.  Perform gestures without holding B.  Press 1 to stop.\n"
+                gesture_spotter.reset_candidate()
+
+                while True:
+                    # Wait for a gesture to be spotted in the stream of readings.
+                    spotted_gesture = gesture_creator.spot_gesture(gesture_spotter)
+                    if spotted_gesture is None:
+                        break
+
+                    print "Spotted", spotted_gesture.get_name() + "!  Performing action..."
+                    spotted_gesture.call_action()
+
+                main_prompt()
+
+            elif button_pressed == driver.button['Home'] and num_motes > 1:
+                os.system('clear')
+                print "\nMulti-remote mode.  Hold B on any remote to perform a gesture.  Press Home to stop.\n"
+                multi_remote_mode()
+                main_prompt()
+
+            elif button_pressed == driver.button['2']:
+                os.system('clear')
+                print "\nLearning gesture.\n"
+                # Learn the gesture.  (The registry updates the gestures in memory.)
+                gesture_creator.learn_gesture(REPETITION_LIMIT)
+                main_prompt()
+
+            elif button_pressed == driver.button['-']:
+                os.system('clear')
+                print "Are you sure you want to delete all your gestures?  Press A to confirm, or B to cancel."
+                confirmed = False
+                while not confirmed:
+                    confirm_sample = button_handler.next_press()
+                    if confirm_sample is None:
+                        break  # A replayed trace ended at the prompt.  Keep the gestures.
+                    confirm_button = confirm_sample.get_pressed_button()
+                    if confirm_button == driver.button['A']:
+                        print "Okay! Deleting gestures!"
+                        time.sleep(0.5)
+                        confirmed = True
+                        writer_reader.delete_gestures()  # Delete gestures from the gesture file.
+                        full_writer_reader.delete_gestures()  # Delete full gestures from its file
+                        stat.reset_all_stats()  # Reset statistics to no attempts, and no successes.
+                    elif confirm_button == driver.button['B']:
+                        print "Canceled! (Phew)"
+                        confirmed = True
+
+                main_prompt()
+
+            elif button_pressed == driver.button['A']:
+                os.system('clear')
+                writer_reader.print_gestures()
+                main_prompt()
+
+            elif button_pressed == driver.button['+']:
+                os.system('clear')
+                print "Exiting!"
+                persistence_worker.shutdown()  # Save every change before exiting.
+                time.sleep(2 * STANDARD_SLEEP_TIME)
+                done = True
+
+            elif button_pressed == driver.button['Up']:
+                os.system('clear')
+                stat.reset_all_stats()
+                stat.print_stats()
+                main_prompt()
+            elif button_pressed == driver.button['Down']:
+                os.system('clear')
+                stat.print_stats()
+                main_prompt()
+
+    # Disconnect the wiimote and exit.
+    stat.print_stats()
+    action_executor.print_latencies()
+    action_executor.shutdown()
+    sampler.stop()
+    metrics.stop_dumping()  # Dumps the metrics one last time.
+    for i in range(0, num_motes):
+        driver.disconnect(wiimotes[i])
+    return 1
 
-            # Weight the sensor readings based on how important they are to the gesture.
-            gesture_matcher.evaluation_function(performed_gesture)
-            # Otherwise, match the performed gesture to the closest learned gesture.
-            matched_gesture = gesture_matcher.greatest_closest_recognition(performed_gesture)
-            if matched_gesture is None:
-                # If there is no matched gesture, then none are known.  Prompt the user to teach a gesture.
-                print "\nNo known gestures!  Teach a gesture to use gesture recognition.\n"
-                continue
-
-            print "Did you mean to perform", matched_gesture.get_name() + "?"
-            print "Press A to confirm, B if you meant something else, or + to cancel."
-            confirmed = False
-
-            while not confirmed:
-                r = wiiuse.poll(wiimotes, num_motes)
-                confirm_button = button_handler.press_event()
-                if confirm_button == wiiuse.button['+']:
-                    confirmed = True
-                    continue
-                elif confirm_button == wiiuse.button['A']:
-                    # If the user performed the correct action
-                    print "\nSuccess! Performing action...\n"
-                    matched_gesture.call_action()
-
-                    stat.confirm(matched_gesture, True)  # Update gesture statistics with a success.
-                    # Factor the successful gesture into the gesture's average
-                    matched_gesture.update_and_average(performed_gesture.get_frames())
-                    # Update the matched gesture on disk
-                    writer_reader.update_gesture(matched_gesture)
-                    confirmed = True
-                elif confirm_button == wiiuse.button['B']:
-                    while not confirmed:
-                        intended_gesture_name = raw_input("Whoops!  What was your intended gesture?:")
-                        intended_gesture = writer_reader.get_gesture_from_name(intended_gesture_name)
-                        if intended_gesture is not None:
-                            confirmed = True
-                            stat.confirm(intended_gesture, False)
-
-                            # If failed gesture, instead update the INTENDED
-                            # gesture with the performed gesture iteration
-                            intended_gesture.update_and_average(performed_gesture.get_frames())
-
-                            # Suggest that the user re-teach a gesture that is inconsistently successful.
-                            if (stat.get_gesture_success_rate(intended_gesture) < 0.6 and
-                                    intended_gesture.get_attempts() > 5):
-                                recommend_relearn(intended_gesture)
-
-                            # Print statistics regarding the intended gesture
-                            print "\n" + (intended_gesture.get_name() + " success rate:").ljust(30) + str(
-                                stat.get_gesture_success_rate(intended_gesture))
-                            # Update the intended gesture on disk.
-                            writer_reader.update_gesture(intended_gesture)
-
-            # Update gestures in memory as necessary.
-            gesture_creator.update_gestures()
-            gesture_matcher.update_known_gestures()
-
-            # Print statistics regarding the matched gesture and total statistics.
-            print "\n" + (matched_gesture.get_name() + " success rate:").ljust(30) + str(
-                stat.get_gesture_success_rate(matched_gesture))
-            print "Total success rate:".ljust(30) + str(stat.get_total_success_rate())
-            main_prompt()
-
-        elif button_pressed == wiiuse.button['2']:
-            os.system('clear')
-            print "\nLearning gesture.\n"
-            # Learn the gesture.
-            gesture_creator.learn_gesture(REPETITION_LIMIT)
-            # Update gestures in memory as necessary.
-            gesture_matcher.update_known_gestures()
-            gesture_creator.update_gestures()
-            main_prompt()
-
-        elif button_pressed == wiiuse.button['-']:
-            os.system('clear')
-            print "Are you sure you want to delete all your gestures?  Press A to confirm, or B to cancel."
-            confirmed = False
-            while not confirmed:
-                r = wiiuse.poll(wiimotes, num_motes)
-                confirm_button = button_handler.press_event()
-                if confirm_button == wiiuse.button['A']:
-                    print "Okay! Deleting gestures!"
-                    time.sleep(0.5)
-                    confirmed = True
-                    writer_reader.delete_gestures()  # Delete gestures from the gesture file.
-                    full_writer_reader.delete_gestures()  # Delete full gestures from its file
-                    gesture_matcher.update_known_gestures()  # Update the currently known gestures in gesture matcher
-                    gesture_creator.update_gestures()  # Update the currently known gestures in gesture creator.
-                    stat.reset_all_stats()  # Reset statistics to no attempts, and no successes.
-                elif confirm_button == wiiuse.button['B']:
-                    print "Canceled! (Phew)"
-                    confirmed = True
-
-            main_prompt()
-
-        elif button_pressed == wiiuse.button['A']:
-            os.system('clear')
-            writer_reader.print_gestures()
-            main_prompt()
-
-        elif button_pressed == wiiuse.button['+']:
-            os.system('clear')
-            print "Exiting!"
-            time.sleep(2 * STANDARD_SLEEP_TIME)
-            done = True
 
-        elif button_pressed == wiiuse.button['Up']:
-            os.system('clear')
-            stat.reset_all_stats()
-            stat.print_stats()
-            gesture_creator.update_gestures()  # Update the gestures in memory
-            gesture_matcher.update_known_gestures()  # Update the gestures in memory
-            main_prompt()
-        elif button_pressed == wiiuse.button['Down']:
-            os.system('clear')
-            stat.print_stats()
-            main_prompt()
-
-# Disconnect the wiimote and exit.
-gesture_creator.update_gestures()
-gesture_matcher.update_known_gestures()
-stat.print_stats()
-wiiuse.disconnect(first_wm)
-sys.exit(1)
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))